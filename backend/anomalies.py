@@ -0,0 +1,253 @@
+"""
+Spending anomaly detection for Expense Tracker
+Running statistics per category and per merchant, updated in O(1) as each
+expense arrives, flag unusually large transactions at ingest time; monthly
+category totals with running sums flag spending spikes
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from dates import from_day, month_key, period_label
+from fx import fx_table
+from merchants import normalize_merchant
+from money import from_cents
+
+
+class RunningStats:
+    """Welford mean/variance plus an exponentially weighted mean
+
+    Removing a value reverses its Welford update exactly; the weighted
+    mean only ever moves forward and is left as is.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'ewma')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma: Optional[float] = None
+
+    def add(self, value: float, alpha: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.ewma = value if self.ewma is None else alpha * value + (1 - alpha) * self.ewma
+
+    def remove(self, value: float):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(0.0, self.m2 - (value - mean) * (value - self.mean))
+        self.mean = mean
+        self.count -= 1
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class AnomalyDetector:
+    """Flags expenses far above their category's or merchant's history
+
+    An expense is scored against the statistics of what came before it,
+    then folded into them, so ingest costs the same however long the
+    history is. Spending is roughly log-normal, so the statistics are kept
+    over log amounts: a z-score there is a multiple of the typical
+    (geometric mean) amount rather than something one rent payment skews.
+    Like the budget counters, the state is tagged with the data file
+    fingerprint; a rebuild replays history in date order and finds the same
+    anomalies streaming ingest would have. Amounts are in the base currency.
+    """
+
+    def __init__(self, z_threshold: float = 3.0, min_samples: int = 10, ewma_alpha: float = 0.1,
+                 spike_min_months: int = 3, max_anomalies: int = 1000):
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.ewma_alpha = ewma_alpha
+        self.spike_min_months = spike_min_months
+        self.max_anomalies = max_anomalies
+        self._lock = threading.Lock()
+        self._stats: Dict[tuple, RunningStats] = {}
+        # Per category: month -> total, and [months with spend, sum, sum of squares] of those totals
+        self._months: Dict[str, Dict[int, int]] = {}
+        self._month_sums: Dict[str, List[int]] = {}
+        self._anomalies: "OrderedDict[str, Dict]" = OrderedDict()
+        self._stamp = None
+        self.rebuilds = 0
+
+    def _keys(self, t: Dict) -> List[tuple]:
+        keys = [('category', t['category'])]
+        merchant = normalize_merchant(t.get('merchant_name'))
+        if merchant is not None:
+            keys.append(('merchant', merchant))
+        return keys
+
+    def _base_amount(self, t: Dict) -> int:
+        return fx_table.convert_one(t['amount_cents'], t.get('currency', fx_table.base), t['day'], fx_table.base)
+
+    def _score(self, t: Dict, amount: int) -> Optional[Dict]:
+        value = math.log(max(amount, 1))
+        reasons = []
+        for scope, key in self._keys(t):
+            stats = self._stats.get((scope, key))
+            if stats is None or stats.count < self.min_samples:
+                continue
+            std = stats.std
+            if std == 0:
+                continue
+            # Against all history, then against the recent (exponentially weighted) level
+            for rule, centre in (('typical', stats.mean), ('recent', stats.ewma)):
+                zscore = (value - centre) / std
+                if zscore >= self.z_threshold:
+                    reasons.append({"scope": scope, "key": key, "rule": rule,
+                                    "expected": from_cents(round(math.exp(centre))), "zscore": round(zscore, 2)})
+                    break
+        if not reasons:
+            return None
+        return {
+            "transaction_id": t['id'],
+            "date": t['date'],
+            "category": t['category'],
+            "merchant_name": t.get('merchant_name'),
+            "description": t.get('description'),
+            "amount": from_cents(amount),
+            "currency": fx_table.base,
+            "reasons": reasons,
+            "detected_at": datetime.now().isoformat(),
+        }
+
+    def _add_month(self, category: str, month: int, amount: int):
+        months = self._months.setdefault(category, {})
+        sums = self._month_sums.setdefault(category, [0, 0, 0])
+        old = months.get(month, 0)
+        new = old + amount
+        sums[0] += (new != 0) - (old != 0)
+        sums[1] += amount
+        sums[2] += new * new - old * old
+        if new:
+            months[month] = new
+        else:
+            months.pop(month, None)
+
+    def _ingest(self, t: Dict, amount: int) -> Optional[Dict]:
+        if t['type'] != 'expense':
+            return None
+        anomaly = self._score(t, amount)
+        if anomaly is not None:
+            self._anomalies[t['id']] = anomaly
+            while len(self._anomalies) > self.max_anomalies:
+                self._anomalies.popitem(last=False)
+        value = math.log(max(amount, 1))
+        for key in self._keys(t):
+            self._stats.setdefault(key, RunningStats()).add(value, self.ewma_alpha)
+        self._add_month(t['category'], month_key(t['day']), amount)
+        return anomaly
+
+    def _remove(self, t: Dict, amount: int):
+        if t['type'] != 'expense':
+            return
+        self._anomalies.pop(t['id'], None)
+        for key in self._keys(t):
+            stats = self._stats.get(key)
+            if stats is not None:
+                stats.remove(math.log(max(amount, 1)))
+        self._add_month(t['category'], month_key(t['day']), -amount)
+
+    def rebuild(self, transactions: List[Dict], stamp):
+        """Replay every transaction, oldest first"""
+        amounts = fx_table.converted(None, transactions, fx_table.base)
+        if amounts is None:
+            amounts = [t['amount_cents'] for t in transactions]
+        # New rows are inserted at the front, so later positions are older within a day
+        order = sorted(range(len(transactions)), key=lambda i: (transactions[i]['day'], -i))
+        with self._lock:
+            self._stats, self._months, self._month_sums = {}, {}, {}
+            self._anomalies = OrderedDict()
+            for i in order:
+                self._ingest(transactions[i], amounts[i])
+            self._stamp = stamp
+            self.rebuilds += 1
+
+    def ensure(self, stamp, load_transactions):
+        """Rebuild from ``load_transactions()`` unless already at ``stamp``"""
+        if stamp is None or stamp != self._stamp:
+            self.rebuild(load_transactions(), stamp)
+
+    def apply_changes(self, before, after, removed: Iterable[Dict] = (),
+                      added: Iterable[Dict] = ()) -> List[Dict]:
+        """Move the statistics from fingerprint ``before`` to ``after``; returns new anomalies"""
+        with self._lock:
+            if before is None or self._stamp != before:
+                self._stamp = None
+                return []
+            for t in removed:
+                self._remove(t, self._base_amount(t))
+            found = [a for a in (self._ingest(t, self._base_amount(t)) for t in added) if a is not None]
+            self._stamp = after
+            return found
+
+    def reset(self):
+        """Drop the statistics so the next read rebuilds them"""
+        with self._lock:
+            self._stamp = None
+
+    def anomalies(self, limit: int = 50, since_day: Optional[int] = None) -> List[Dict]:
+        """Flagged transactions, most recent date first"""
+        with self._lock:
+            found = list(self._anomalies.values())
+        if since_day is not None:
+            found = [a for a in found if a['date'] >= from_day(since_day)]
+        found.sort(key=lambda a: a['date'], reverse=True)
+        return found[:limit]
+
+    def spikes(self, months: int = 3, today: Optional[int] = None) -> List[Dict]:
+        """Categories whose spend in one of the last ``months`` months stands out
+
+        Each month is compared with the category's other months that had
+        any spend, using the running sums, so this never touches rows.
+        """
+        current = month_key(datetime.now().toordinal() if today is None else today)
+        found = []
+        with self._lock:
+            for category, totals in self._months.items():
+                count, total_sum, total_squares = self._month_sums[category]
+                for month in range(current - months + 1, current + 1):
+                    total = totals.get(month)
+                    if total is None or count - 1 < self.spike_min_months:
+                        continue
+                    others = count - 1
+                    mean = (total_sum - total) / others
+                    variance = max(0.0, (total_squares - total * total) / others - mean * mean)
+                    std = math.sqrt(variance)
+                    if std > 0 and (total - mean) / std >= self.z_threshold:
+                        found.append({
+                            "category": category,
+                            "month": period_label('month', month),
+                            "total": from_cents(total),
+                            "average": from_cents(round(mean)),
+                            "std": from_cents(round(std)),
+                            "zscore": round((total - mean) / std, 2),
+                            "currency": fx_table.base,
+                        })
+        found.sort(key=lambda s: (s['month'], s['zscore']), reverse=True)
+        return found
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "categories": sum(1 for scope, _ in self._stats if scope == 'category'),
+                "merchants": sum(1 for scope, _ in self._stats if scope == 'merchant'),
+                "anomalies": len(self._anomalies),
+                "rebuilds": self.rebuilds,
+            }
+
+
+# Global anomaly detector for the JSON store
+anomaly_detector = AnomalyDetector()
@@ -1,15 +1,76 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import wraps
+import fcntl
+import heapq
+import itertools
 import json
+import threading
 import uuid
 import os
 
+from aggregation import aggregator, merge_partials, summed_partial
+from anomalies import anomaly_detector
+from archive import archive_store, year_start
+from blockchain_database import blockchain_db
+from budgets import budget_engine, budget_from_api, budget_to_api
+from categorize import categorizer, rule_from_api
+import compression
+from change_feed import FeedCursor, aggregate_delta, change_feed
+from dates import from_day, month_key, period_label, to_day
+from fx import fx_table, normalize_currency
+from gas_analytics import format_wei
+from jobs import job_queue
+from ledger import fiat_key, iter_ledger, iter_stored, ledger_page
+import metrics
+from metrics import record_rows, timed
+from money import from_cents, savings_rate, to_cents
+from response_cache import cached_response, response_cache
+from rollups import all_rollups, rollups_for
+from single_flight import single_flight
+from snapshot import snapshot_store
+from sync import MAX_SYNC_LIMIT, bump, changes_since, init_sync, restart, tombstone
+from portfolio import price_table
+
 app = Flask(__name__)
 CORS(app)
+metrics.init_app(app)
+compression.init_app(app)
+metrics.metrics.register_gauges(
+    lambda: {f"expense_response_cache_{k}": v for k, v in response_cache.stats().items()}
+)
+metrics.metrics.register_gauges(
+    lambda: {f"expense_single_flight_{k}": v for k, v in single_flight.stats().items()}
+)
+metrics.metrics.register_gauges(
+    lambda: {f"expense_report_aggregator_{k}": v for k, v in aggregator.stats().items()}
+)
+metrics.metrics.register_gauges(
+    lambda: {f"expense_snapshot_{k}": v for k, v in snapshot_store.stats().items()}
+)
+metrics.metrics.register_gauges(
+    lambda: {f"expense_compression_{k}": v for k, v in compression.compressor.stats().items()}
+)
 
 # Data storage file path
-DATA_FILE = os.path.join(os.path.dirname(__file__), 'data.json')
+DATA_FILE = os.environ.get('DATA_FILE', os.path.join(os.path.dirname(__file__), 'data.json'))
+
+# Version of the data.json layout; 2 stores amounts as integer cents,
+# 3 adds integer day ordinals, 4 adds sync versions and tombstones
+DATA_SCHEMA_VERSION = 4
+
+# Optional transaction fields kept as given, as on the Transaction model
+OPTIONAL_TRANSACTION_FIELDS = ('merchant_name', 'location', 'payment_method', 'bank_account_id',
+                               'bank_transaction_id', 'is_auto_sync', 'category_source')
+
+# Free-text transaction fields that categorization and merchant matching read
+TEXT_FIELDS = ('description', 'merchant_name')
+
+# Transaction fields a ``fields=`` projection can ask for
+TRANSACTION_FIELDS = ('id', 'type', 'amount', 'currency', 'category', 'description', 'date', 'created_at',
+                      'version', 'updated_at', *OPTIONAL_TRANSACTION_FIELDS)
 
 # Default categories
 DEFAULT_CATEGORIES = [
@@ -27,90 +88,307 @@ DEFAULT_CATEGORIES = [
     {"id": "12", "name": "Other Expense", "type": "expense", "color": "#71717a", "icon": "package"},
 ]
 
-# Sample transactions for demo
+# Sample transactions for demo (amounts in cents)
 SAMPLE_TRANSACTIONS = [
-    {"id": "1", "type": "income", "amount": 5000, "category": "Salary", "description": "Monthly salary", "date": "2025-11-01", "created_at": "2025-11-01T09:00:00Z"},
-    {"id": "2", "type": "income", "amount": 1200, "category": "Freelance", "description": "Web project", "date": "2025-11-05", "created_at": "2025-11-05T14:30:00Z"},
-    {"id": "3", "type": "expense", "amount": 150, "category": "Food & Dining", "description": "Grocery shopping", "date": "2025-11-03", "created_at": "2025-11-03T10:15:00Z"},
-    {"id": "4", "type": "expense", "amount": 80, "category": "Transportation", "description": "Gas refill", "date": "2025-11-04", "created_at": "2025-11-04T16:00:00Z"},
-    {"id": "5", "type": "expense", "amount": 200, "category": "Bills & Utilities", "description": "Electricity bill", "date": "2025-11-06", "created_at": "2025-11-06T11:00:00Z"},
-    {"id": "6", "type": "expense", "amount": 50, "category": "Entertainment", "description": "Movie tickets", "date": "2025-11-08", "created_at": "2025-11-08T19:30:00Z"},
-    {"id": "7", "type": "income", "amount": 300, "category": "Investments", "description": "Dividend payout", "date": "2025-11-10", "created_at": "2025-11-10T08:00:00Z"},
-    {"id": "8", "type": "expense", "amount": 120, "category": "Shopping", "description": "New clothes", "date": "2025-11-12", "created_at": "2025-11-12T15:45:00Z"},
-    {"id": "9", "type": "expense", "amount": 45, "category": "Healthcare", "description": "Pharmacy", "date": "2025-11-14", "created_at": "2025-11-14T09:30:00Z"},
-    {"id": "10", "type": "expense", "amount": 250, "category": "Education", "description": "Online course", "date": "2025-11-15", "created_at": "2025-11-15T12:00:00Z"},
-    {"id": "11", "type": "income", "amount": 800, "category": "Freelance", "description": "Design work", "date": "2025-11-18", "created_at": "2025-11-18T14:00:00Z"},
-    {"id": "12", "type": "expense", "amount": 180, "category": "Food & Dining", "description": "Restaurant dinner", "date": "2025-11-20", "created_at": "2025-11-20T20:00:00Z"},
+    {"id": "1", "type": "income", "amount_cents": 500000, "category": "Salary", "description": "Monthly salary", "date": "2025-11-01", "created_at": "2025-11-01T09:00:00Z"},
+    {"id": "2", "type": "income", "amount_cents": 120000, "category": "Freelance", "description": "Web project", "date": "2025-11-05", "created_at": "2025-11-05T14:30:00Z"},
+    {"id": "3", "type": "expense", "amount_cents": 15000, "category": "Food & Dining", "description": "Grocery shopping", "date": "2025-11-03", "created_at": "2025-11-03T10:15:00Z"},
+    {"id": "4", "type": "expense", "amount_cents": 8000, "category": "Transportation", "description": "Gas refill", "date": "2025-11-04", "created_at": "2025-11-04T16:00:00Z"},
+    {"id": "5", "type": "expense", "amount_cents": 20000, "category": "Bills & Utilities", "description": "Electricity bill", "date": "2025-11-06", "created_at": "2025-11-06T11:00:00Z"},
+    {"id": "6", "type": "expense", "amount_cents": 5000, "category": "Entertainment", "description": "Movie tickets", "date": "2025-11-08", "created_at": "2025-11-08T19:30:00Z"},
+    {"id": "7", "type": "income", "amount_cents": 30000, "category": "Investments", "description": "Dividend payout", "date": "2025-11-10", "created_at": "2025-11-10T08:00:00Z"},
+    {"id": "8", "type": "expense", "amount_cents": 12000, "category": "Shopping", "description": "New clothes", "date": "2025-11-12", "created_at": "2025-11-12T15:45:00Z"},
+    {"id": "9", "type": "expense", "amount_cents": 4500, "category": "Healthcare", "description": "Pharmacy", "date": "2025-11-14", "created_at": "2025-11-14T09:30:00Z"},
+    {"id": "10", "type": "expense", "amount_cents": 25000, "category": "Education", "description": "Online course", "date": "2025-11-15", "created_at": "2025-11-15T12:00:00Z"},
+    {"id": "11", "type": "income", "amount_cents": 80000, "category": "Freelance", "description": "Design work", "date": "2025-11-18", "created_at": "2025-11-18T14:00:00Z"},
+    {"id": "12", "type": "expense", "amount_cents": 18000, "category": "Food & Dining", "description": "Restaurant dinner", "date": "2025-11-20", "created_at": "2025-11-20T20:00:00Z"},
 ]
 
 
-def load_data():
-    """Load data from JSON file or initialize with defaults"""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
+def read_data_file():
+    """Parse the data file; returns ``(data, fingerprint)``, or ``(None, None)`` when there is none
+
+    The fingerprint is taken from the open file, so it describes exactly
+    the contents that were parsed.
+    """
+    try:
+        with open(DATA_FILE, 'r') as f:
+            stat = os.fstat(f.fileno())
+            return json.load(f), (stat.st_mtime_ns, stat.st_size)
+    except (json.JSONDecodeError, IOError):
+        return None, None
+
+
+@timed('load_data')
+def read_data():
+    """Load data plus the state fingerprint of the file it came from (None for the defaults)
+
+    Writers take their ``before`` stamp from here, so a write by another
+    worker cannot land between the stamp and the data it describes.
+    """
+    data, fingerprint = read_data_file()
+    if data is not None and data.get('schema_version', 1) < DATA_SCHEMA_VERSION:
+        with data_lock():
+            # Another worker may have migrated (and written) since the read
+            data, fingerprint = read_data_file()
+            if data is not None and data.get('schema_version', 1) < DATA_SCHEMA_VERSION:
+                data = migrate_data(data)
+                return data, save_data(data)
+    if data is not None:
+        return data, state_of(fingerprint)
     
-    return {
-        "transactions": SAMPLE_TRANSACTIONS.copy(),
-        "categories": DEFAULT_CATEGORIES.copy()
+    data = {
+        "schema_version": DATA_SCHEMA_VERSION,
+        "transactions": [transaction_from_api(t) for t in SAMPLE_TRANSACTIONS],
+        "categories": [dict(c) for c in DEFAULT_CATEGORIES],
+        "budgets": []
     }
+    init_sync(data)
+    return data, None
+
+
+def load_data():
+    """Load data from JSON file or initialize with defaults"""
+    return read_data()[0]
 
 
-def save_data(data):
-    """Save data to JSON file"""
+def migrate_data(data):
+    """Upgrade a data.json payload to integer cents, day ordinals and sync versions"""
+    data['transactions'] = [transaction_from_api(t) for t in data['transactions']]
+    init_sync(data)
+    data['schema_version'] = DATA_SCHEMA_VERSION
+    return data
+
+
+@timed('save_data')
+def save_data(data, delta=None):
+    """Save data to JSON file and return the state fingerprint of what was written
+
+    The file is written beside DATA_FILE and atomically replaced, so
+    readers in any worker see either the previous or the new data, never a
+    partial file. ``delta`` is the ``(removed, added)`` transactions of a
+    write (both empty when it changed none); it is journaled for the
+    snapshot before the new file becomes visible. Saves without one
+    (imports, migrations, archiving) make the snapshot rewrite itself.
+    """
     os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    tmp_path = f"{DATA_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        stat = os.stat(tmp_path)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        if delta is not None:
+            snapshot_store.record_change(data_fingerprint(), fingerprint, *delta)
+        os.replace(tmp_path, DATA_FILE)
+        return state_of(fingerprint)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Depth of data_lock() held by the current thread
+_data_lock_depth = threading.local()
+
+
+@contextmanager
+def data_lock():
+    """Exclusive lock on the data file across threads and worker processes
+
+    Taken around every read-modify-write of data.json, so two writes can
+    never both start from the same data and lose one another. Re-entrant
+    within a thread.
+    """
+    depth = getattr(_data_lock_depth, 'value', 0)
+    if depth:
+        _data_lock_depth.value = depth + 1
+        try:
+            yield
+        finally:
+            _data_lock_depth.value = depth
+        return
+    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
+    with open(f"{DATA_FILE}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _data_lock_depth.value = 1
+        try:
+            yield
+        finally:
+            _data_lock_depth.value = 0
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def writes_data(fn):
+    """Run a view or job that rewrites data.json while holding ``data_lock``"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with data_lock():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def load_history():
+    """Hot data with the archive's daily sums appended to its transactions, for rebuilding aggregates"""
+    data = load_data()
+    data['transactions'] = data['transactions'] + archive_store.daily_rows()
+    return data
 
 
-def calculate_summary(transactions):
+def data_fingerprint():
+    """Identify the current state of the data file, including writes by other workers"""
+    try:
+        stat = os.stat(DATA_FILE)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def state_of(fingerprint):
+    """Data file fingerprint plus the FX rates version, for anything holding converted amounts"""
+    return None if fingerprint is None else (fingerprint, fx_table.version)
+
+
+def state_fingerprint():
+    """State fingerprint of the data file as it is now"""
+    return state_of(data_fingerprint())
+
+
+def display_currency():
+    """Currency requested for report amounts, the base currency by default"""
+    currency = normalize_currency(request.args.get('currency', fx_table.base))
+    if not fx_table.supports(currency):
+        raise ValueError(f"No FX rates for {currency}")
+    return currency
+
+
+def carry_changes(before, after, removed=(), added=()):
+    """Move the in-process rollups, budget counters, anomaly statistics and categorizer across a write
+
+    ``before`` and ``after`` are the state fingerprints of the file the
+    write read and of the file it saved.
+    """
+    for series in all_rollups():
+        series.apply_changes(before, after, removed=removed, added=added)
+    for alert in budget_engine.apply_changes(before, after, removed=removed, added=added):
+        change_feed.publish('alert', 'budget', alert)
+    for anomaly in anomaly_detector.apply_changes(before, after, removed=removed, added=added):
+        change_feed.publish('anomaly', 'transaction', anomaly)
+    categorizer.apply_changes(before, after, removed=removed, added=added)
+
+
+def publish_change(event_type, resource, row=None, removed=(), added=()):
+    """Publish a write to the change feed, with the aggregate delta of transaction writes"""
+    delta = aggregate_delta(removed, added) if removed or added else None
+    change_feed.publish(event_type, resource, row, delta)
+
+
+def transaction_to_api(t, fields=None):
+    """Convert a stored transaction (integer cents, day ordinal) into its API shape
+
+    With ``fields``, only those API fields are built (absent ones are skipped).
+    """
+    if fields is not None:
+        return {f: (from_cents(t['amount_cents']) if f == 'amount' else t.get(f, fx_table.base))
+                for f in fields if f in t or f == 'currency' or (f == 'amount' and 'amount_cents' in t)}
+    api = {('amount' if k == 'amount_cents' else k): (from_cents(v) if k == 'amount_cents' else v)
+           for k, v in t.items() if k != 'day'}
+    api.setdefault('currency', fx_table.base)
+    return api
+
+
+def requested_fields():
+    """Transaction fields named by the ``fields`` query parameter, None for all of them"""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in TRANSACTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}; expected some of {', '.join(TRANSACTION_FIELDS)}")
+    return fields
+
+
+def check_text_fields(t):
+    """Reject a description or merchant name that is not a string"""
+    for field in TEXT_FIELDS:
+        if t.get(field) is not None and not isinstance(t[field], str):
+            raise ValueError(f"{field} must be a string")
+
+
+def transaction_from_api(t):
+    """Convert an API transaction (decimal amount, ISO date) into its stored shape"""
+    check_text_fields(t)
+    stored = {('amount_cents' if k == 'amount' else k): (to_cents(v) if k == 'amount' else v)
+              for k, v in t.items() if k != 'day'}
+    if 'date' in stored:
+        stored['day'] = to_day(stored['date'])
+    if 'currency' in stored:
+        stored['currency'] = normalize_currency(stored['currency'])
+        if not fx_table.supports(stored['currency']):
+            raise ValueError(f"No FX rates for {stored['currency']}")
+    return stored
+
+
+def amounts_of(transactions, amounts=None):
+    """Per-row amounts in cents: converted ``amounts`` if given, else stored ones"""
+    return amounts if amounts is not None else [t['amount_cents'] for t in transactions]
+
+
+def calculate_summary(transactions, amounts=None):
     """Calculate financial summary from transactions"""
-    total_income = sum(t['amount'] for t in transactions if t['type'] == 'income')
-    total_expenses = sum(t['amount'] for t in transactions if t['type'] == 'expense')
+    total_income = total_expenses = 0
+    for t, amount in zip(transactions, amounts_of(transactions, amounts)):
+        if t['type'] == 'income':
+            total_income += amount
+        else:
+            total_expenses += amount
     
     return {
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "balance": total_income - total_expenses,
-        "transaction_count": len(transactions),
-        "savings_rate": round((total_income - total_expenses) / total_income * 100, 1) if total_income > 0 else 0
+        "total_income": from_cents(total_income),
+        "total_expenses": from_cents(total_expenses),
+        "balance": from_cents(total_income - total_expenses),
+        "transaction_count": sum(t.get('count', 1) for t in transactions),
+        "savings_rate": savings_rate(total_income, total_expenses)
     }
 
 
-def get_category_breakdown(transactions):
+def get_category_breakdown(transactions, amounts=None):
     """Get breakdown of amounts by category"""
     breakdown = {}
-    for t in transactions:
+    for t, amount in zip(transactions, amounts_of(transactions, amounts)):
         cat = t['category']
         if cat not in breakdown:
             breakdown[cat] = {"income": 0, "expense": 0, "count": 0}
         
         if t['type'] == 'income':
-            breakdown[cat]['income'] += t['amount']
+            breakdown[cat]['income'] += amount
         else:
-            breakdown[cat]['expense'] += t['amount']
-        breakdown[cat]['count'] += 1
+            breakdown[cat]['expense'] += amount
+        breakdown[cat]['count'] += t.get('count', 1)
     
+    for totals in breakdown.values():
+        totals['income'] = from_cents(totals['income'])
+        totals['expense'] = from_cents(totals['expense'])
     return breakdown
 
 
-def get_monthly_data(transactions):
+def get_monthly_data(transactions, amounts=None):
     """Get monthly income and expense totals"""
     monthly = {}
-    for t in transactions:
-        month = t['date'][:7]
+    for t, amount in zip(transactions, amounts_of(transactions, amounts)):
+        month = month_key(t['day'])
         if month not in monthly:
             monthly[month] = {"income": 0, "expense": 0}
         
         if t['type'] == 'income':
-            monthly[month]['income'] += t['amount']
+            monthly[month]['income'] += amount
         else:
-            monthly[month]['expense'] += t['amount']
+            monthly[month]['expense'] += amount
     
-    return monthly
+    return {period_label('month', month): {"income": from_cents(totals['income']),
+                                           "expense": from_cents(totals['expense'])}
+            for month, totals in sorted(monthly.items())}
 
 
 # ============== API ROUTES ==============
@@ -122,98 +400,252 @@ def health_check():
 
 
 @app.route('/api/transactions', methods=['GET'])
+@cached_response('transactions', fingerprint=state_fingerprint)
 def get_transactions():
-    """Get all transactions with summary data"""
-    data = load_data()
+    """Get hot transactions, or every transaction in a date range, with summary data
+
+    Without a range the summary covers all history, archived years
+    included through their stored daily sums. A range reaching into
+    archived years reads those rows back from the archive.
+    """
+    try:
+        currency = display_currency()
+        fields = requested_fields()
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start_day = to_day(start_date) if start_date else None
+        end_day = to_day(end_date) if end_date else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    data, stamp = read_data()
     transactions = data['transactions']
-    transactions.sort(key=lambda x: x['date'], reverse=True)
+    if start_day is None and end_day is None:
+        sums = archive_store.daily_rows()
+        rows = transactions + sums
+        amounts = (amounts_of(transactions, fx_table.converted(stamp, transactions, currency))
+                   + amounts_of(sums, fx_table.converted(None, sums, currency)))
+    else:
+        transactions = [t for t in transactions
+                        if (start_day is None or t['day'] >= start_day) and (end_day is None or t['day'] <= end_day)]
+        transactions += archive_store.rows(start_day, end_day)
+        rows = transactions
+        amounts = fx_table.converted(None, transactions, currency)
+    summary = calculate_summary(rows, amounts)
+    category_breakdown = get_category_breakdown(rows, amounts)
+    monthly_data = get_monthly_data(rows, amounts)
+    
+    transactions.sort(key=lambda x: x['day'], reverse=True)
+    record_rows(scanned=len(rows), serialized=len(transactions))
+    archived_through = archive_store.archived_through()
     
     return jsonify({
-        "transactions": transactions,
-        "summary": calculate_summary(transactions),
-        "categoryBreakdown": get_category_breakdown(transactions),
-        "monthlyData": get_monthly_data(transactions)
+        "transactions": [transaction_to_api(t, fields) for t in transactions],
+        "currency": currency,
+        "summary": summary,
+        "categoryBreakdown": category_breakdown,
+        "monthlyData": monthly_data,
+        "archivedThrough": from_day(archived_through) if archived_through is not None else None
     })
 
 
-@app.route('/api/transactions', methods=['POST'])
-def add_transaction():
-    """Add a new transaction"""
-    data = load_data()
-    body = request.get_json()
-    
+def new_transaction_from_body(body):
+    """Validate an API transaction and build its stored row with a fresh id"""
     required = ['type', 'amount', 'category', 'description', 'date']
     for field in required:
         if field not in body:
-            return jsonify({"error": f"Missing required field: {field}"}), 400
+            raise ValueError(f"Missing required field: {field}")
     
     if body['type'] not in ['income', 'expense']:
-        return jsonify({"error": "Type must be 'income' or 'expense'"}), 400
+        raise ValueError("Type must be 'income' or 'expense'")
+    check_text_fields(body)
     
     try:
-        amount = float(body['amount'])
-        if amount <= 0:
+        amount_cents = to_cents(body['amount'])
+        if amount_cents <= 0:
             raise ValueError()
     except (ValueError, TypeError):
-        return jsonify({"error": "Amount must be a positive number"}), 400
+        raise ValueError("Amount must be a positive number")
+    
+    day = to_day(body['date'])
+    currency = normalize_currency(body.get('currency', fx_table.base))
+    if not fx_table.supports(currency):
+        raise ValueError(f"No FX rates for {currency}")
     
-    new_transaction = {
+    return {
         "id": str(uuid.uuid4()),
         "type": body['type'],
-        "amount": amount,
+        "amount_cents": amount_cents,
+        "currency": currency,
         "category": body['category'],
         "description": body['description'],
         "date": body['date'],
-        "created_at": datetime.now().isoformat()
+        "day": day,
+        "created_at": datetime.now().isoformat(),
+        **{field: body[field] for field in OPTIONAL_TRANSACTION_FIELDS if body.get(field) is not None}
     }
+
+
+@app.route('/api/transactions', methods=['POST'])
+@writes_data
+def add_transaction():
+    """Add a new transaction"""
+    data, before = read_data()
+    body = request.get_json()
     
+    try:
+        new_transaction = new_transaction_from_body(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Score the new row as it lands, even when another worker wrote last
+    anomaly_detector.ensure(before, lambda: data['transactions'])
+    bump(data, new_transaction)
     data['transactions'].insert(0, new_transaction)
-    save_data(data)
+    after = save_data(data, delta=((), [new_transaction]))
+    response_cache.invalidate('transactions')
+    publish_change('insert', 'transaction', transaction_to_api(new_transaction), added=[new_transaction])
+    carry_changes(before, after, added=[new_transaction])
     
-    return jsonify(new_transaction), 201
+    return jsonify(transaction_to_api(new_transaction)), 201
+
+
+@app.route('/api/transactions/batch', methods=['POST'])
+@writes_data
+def add_transactions_batch():
+    """Add a batch of transactions, e.g. from a bank sync
+
+    Rows whose ``bank_transaction_id`` is already stored are skipped, so
+    a sync can be retried safely. Rows without a category are categorized
+    automatically. The batch is validated as a whole and written in one save.
+    """
+    data, before = read_data()
+    body = request.get_json() or {}
+    rows = body.get('transactions')
+    if not isinstance(rows, list):
+        return jsonify({"error": "transactions must be a list"}), 400
+    
+    if not all(isinstance(row, dict) for row in rows):
+        return jsonify({"error": "Every transaction must be an object"}), 400
+    for index, row in enumerate(rows):
+        try:
+            check_text_fields(row)
+        except ValueError as e:
+            return jsonify({"error": f"Transaction {index}: {e}"}), 400
+    
+    uncategorized = [row for row in rows if not row.get('category')]
+    if uncategorized:
+        categorizer.ensure(before, lambda: data)
+        for row, decision in zip(uncategorized, categorizer.categorize(uncategorized, data['categories'])):
+            row['category'] = decision['category']
+            row['category_source'] = 'auto'
+    
+    seen = {t['bank_transaction_id'] for t in data['transactions'] if t.get('bank_transaction_id')}
+    added = []
+    skipped = 0
+    for index, row in enumerate(rows):
+        if row.get('bank_transaction_id') and row['bank_transaction_id'] in seen:
+            skipped += 1
+            continue
+        try:
+            new_transaction = new_transaction_from_body(row)
+        except ValueError as e:
+            return jsonify({"error": f"Transaction {index}: {e}"}), 400
+        if new_transaction.get('bank_transaction_id'):
+            seen.add(new_transaction['bank_transaction_id'])
+        added.append(new_transaction)
+    
+    if added:
+        anomaly_detector.ensure(before, lambda: data['transactions'])
+        for t in added:
+            bump(data, t)
+        data['transactions'][:0] = reversed(added)
+        after = save_data(data, delta=((), added))
+        response_cache.invalidate('transactions')
+        publish_change('batch', 'transaction', {"ids": [t['id'] for t in added]}, added=added)
+        carry_changes(before, after, added=added)
+    
+    return jsonify({
+        "added": len(added),
+        "skipped": skipped,
+        "categorized": sum(1 for t in added if t.get('category_source') == 'auto'),
+        "transactions": [transaction_to_api(t) for t in added]
+    }), 201
+
+
+def transaction_not_found(transaction_id):
+    """404 for an unknown id, or 409 when the transaction is in a read-only archive segment"""
+    if archive_store.find(transaction_id) is not None:
+        return jsonify({"error": "Transaction is archived; archived transactions cannot be changed"}), 409
+    return jsonify({"error": "Transaction not found"}), 404
 
 
 @app.route('/api/transactions/<transaction_id>', methods=['DELETE'])
+@writes_data
 def delete_transaction(transaction_id):
     """Delete a transaction by ID"""
-    data = load_data()
-    original_length = len(data['transactions'])
+    data, before = read_data()
+    removed = [t for t in data['transactions'] if t['id'] == transaction_id]
     
     data['transactions'] = [t for t in data['transactions'] if t['id'] != transaction_id]
     
-    if len(data['transactions']) == original_length:
-        return jsonify({"error": "Transaction not found"}), 404
+    if not removed:
+        return transaction_not_found(transaction_id)
     
-    save_data(data)
+    tombstone(data, 'transaction', transaction_id)
+    after = save_data(data, delta=(removed, ()))
+    response_cache.invalidate('transactions')
+    publish_change('delete', 'transaction', {"id": transaction_id}, removed=removed)
+    carry_changes(before, after, removed=removed)
     return jsonify({"success": True, "message": "Transaction deleted"})
 
 
 @app.route('/api/transactions/<transaction_id>', methods=['PUT'])
+@writes_data
 def update_transaction(transaction_id):
     """Update a transaction by ID"""
-    data = load_data()
+    data, before = read_data()
     body = request.get_json()
+    for key in ('amount_cents', 'version', 'updated_at', 'category_source'):
+        body.pop(key, None)
+    
+    try:
+        updates = transaction_from_api(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     for i, t in enumerate(data['transactions']):
         if t['id'] == transaction_id:
-            data['transactions'][i] = {**t, **body, "id": transaction_id}
-            save_data(data)
-            return jsonify(data['transactions'][i])
+            if updates.get('category', t['category']) != t['category']:
+                # A user-chosen category; the categorizer learns from it
+                updates['category_source'] = 'user'
+            anomaly_detector.ensure(before, lambda: data['transactions'])
+            data['transactions'][i] = {**t, **updates, "id": transaction_id}
+            bump(data, data['transactions'][i])
+            after = save_data(data, delta=([t], [data['transactions'][i]]))
+            response_cache.invalidate('transactions')
+            publish_change('update', 'transaction', transaction_to_api(data['transactions'][i]),
+                           removed=[t], added=[data['transactions'][i]])
+            carry_changes(before, after, removed=[t], added=[data['transactions'][i]])
+            return jsonify(transaction_to_api(data['transactions'][i]))
     
-    return jsonify({"error": "Transaction not found"}), 404
+    return transaction_not_found(transaction_id)
 
 
 @app.route('/api/categories', methods=['GET'])
+@cached_response('categories', fingerprint=data_fingerprint)
 def get_categories():
     """Get all categories"""
     data = load_data()
+    record_rows(scanned=len(data['categories']), serialized=len(data['categories']))
     return jsonify(data['categories'])
 
 
 @app.route('/api/categories', methods=['POST'])
+@writes_data
 def add_category():
     """Add a new category"""
-    data = load_data()
+    data, before = read_data()
     body = request.get_json()
     
     required = ['name', 'type', 'color']
@@ -229,17 +661,42 @@ def add_category():
         "icon": body.get('icon', 'circle')
     }
     
+    bump(data, new_category)
     data['categories'].append(new_category)
-    save_data(data)
+    after = save_data(data, delta=((), ()))
+    response_cache.invalidate('categories')
+    publish_change('insert', 'category', new_category)
+    carry_changes(before, after)
     
     return jsonify(new_category), 201
 
 
-@app.route('/api/reports', methods=['GET'])
-def get_reports():
-    """Get financial reports with period filtering"""
-    data = load_data()
-    period = request.args.get('period', 'month')
+def snapshot_rows():
+    """Hot transactions and the data file fingerprint they were read at, for snapshot rewrites"""
+    data, stamp = read_data()
+    return data['transactions'], stamp and stamp[0]
+
+
+def current_snapshot(fingerprint, load_transactions=snapshot_rows):
+    """The snapshot of the data file at ``fingerprint``; None without a data file or when it will not fit"""
+    try:
+        return snapshot_store.get(fingerprint, load_transactions)
+    except ValueError:
+        # More categories or currencies than the snapshot's columns can code
+        return None
+
+
+def build_report(period='month', currency=None, job=None):
+    """Financial report since the start of ``period`` with amounts in ``currency``
+
+    Aggregates come from the memory-mapped snapshot of data.json; the rows
+    are only parsed when there is no data file yet or the snapshot cannot
+    hold them, and then aggregated by the process pool when there are many.
+    """
+    currency = currency or fx_table.base
+    snapshot = current_snapshot(data_fingerprint())
+    if job is not None:
+        job.progress(0.2, "Aggregating")
     
     today = datetime.now()
     if period == 'week':
@@ -251,44 +708,280 @@ def get_reports():
     else:
         start_date = '1970-01-01'
     
-    filtered = [t for t in data['transactions'] if t['date'] >= start_date]
+    start_day = to_day(start_date)
+    transactions = stamp = None
+    if snapshot is None:
+        data, stamp = read_data()
+        transactions = data['transactions']
+    hot_rows = snapshot.count if snapshot is not None else len(transactions)
+    archived = []
+    sums = candidates = []
+    if archive_store.segments(start_day):
+        # Archived years contribute their stored sums and top-N candidates
+        sums = archive_store.daily_rows(start_day)
+        candidates = (archive_store.top_candidates('income', start_day, currency, 5)
+                      + archive_store.top_candidates('expense', start_day, currency, 5))
+        archived.append(summed_partial(sums, amounts_of(sums, fx_table.converted(None, sums, currency)),
+                                       candidates, amounts_of(candidates, fx_table.converted(None, candidates, currency)),
+                                       hot_rows, top_n=5))
+    if snapshot is not None:
+        totals = merge_partials([snapshot.partial(start_day, currency, top_n=5), *archived], top_n=5)
+    else:
+        amounts = amounts_of(transactions, fx_table.converted(stamp, transactions, currency))
+        totals = aggregator.aggregate(transactions, amounts, start_day, top_n=5, extra=archived)
     
-    summary = calculate_summary(filtered)
-    category_breakdown = get_category_breakdown(filtered)
-    monthly_data = get_monthly_data(filtered)
+    def row(i):
+        if i >= hot_rows:
+            return candidates[i - hot_rows]
+        return snapshot.record(i) if snapshot is not None else transactions[i]
     
-    expenses = [t for t in filtered if t['type'] == 'expense']
-    expenses.sort(key=lambda x: x['amount'], reverse=True)
-    top_expenses = expenses[:5]
+    summary = {
+        "total_income": from_cents(totals['income']),
+        "total_expenses": from_cents(totals['expense']),
+        "balance": from_cents(totals['income'] - totals['expense']),
+        "transaction_count": totals['count'],
+        "savings_rate": savings_rate(totals['income'], totals['expense'])
+    }
+    category_breakdown = {name: {"income": from_cents(income), "expense": from_cents(expense), "count": count}
+                          for name, (income, expense, count) in totals['categories'].items()}
+    monthly_data = {period_label('month', month): {"income": from_cents(income), "expense": from_cents(expense)}
+                    for month, (income, expense) in sorted(totals['months'].items())}
     
-    income = [t for t in filtered if t['type'] == 'income']
-    income.sort(key=lambda x: x['amount'], reverse=True)
-    top_income = income[:5]
+    top_expenses = [{**transaction_to_api(row(i)), "display_amount": from_cents(amount)}
+                    for amount, i in totals['top_expense']]
+    top_income = [{**transaction_to_api(row(i)), "display_amount": from_cents(amount)}
+                  for amount, i in totals['top_income']]
+    record_rows(scanned=hot_rows + len(sums), serialized=len(top_expenses) + len(top_income))
     
-    return jsonify({
+    return {
         "period": period,
         "start_date": start_date,
         "end_date": today.strftime('%Y-%m-%d'),
+        "currency": currency,
         "summary": summary,
         "category_breakdown": category_breakdown,
         "monthly_data": monthly_data,
         "top_expenses": top_expenses,
         "top_income": top_income,
-        "transaction_count": len(filtered)
-    })
+        "transaction_count": totals['count']
+    }
 
 
-@app.route('/api/export', methods=['GET'])
-def export_data():
-    """Export all data as JSON"""
+def build_export(job=None, include_archived=True, fields=None):
+    """Every transaction, category and budget in their API shapes
+
+    ``fields`` projects the transactions to just those API fields.
+    """
     data = load_data()
-    return jsonify({
+    transactions = data['transactions']
+    if include_archived:
+        if job is not None:
+            job.progress(0.1, "Reading archived years")
+        transactions = archive_store.rows() + transactions
+    if job is not None:
+        job.progress(0.3, "Converting transactions")
+    rows = len(transactions) + len(data['categories'])
+    record_rows(scanned=rows, serialized=rows)
+    return {
         "exported_at": datetime.now().isoformat(),
-        "data": data
-    })
+        "data": {**data,
+                 "transactions": [transaction_to_api(t, fields) for t in transactions],
+                 "budgets": [budget_to_api(b) for b in data.get('budgets', [])]}
+    }
+
+
+def app_job(run):
+    """Wrap a job handler so it runs inside an application context, like a request"""
+    def handler(params, job):
+        with app.app_context():
+            return run(params, job)
+    return handler
+
+
+@writes_data
+def archive_history(before_day=None, job=None):
+    """Move transactions of the closed years before ``before_day`` into the archive
+
+    ``before_day`` is rounded down to January 1st, so a year still open is
+    never split, and defaults to the start of the current year. Raises
+    ValueError for a day past that.
+    """
+    this_year = year_start(datetime.now().year)
+    if before_day is None:
+        before_day = this_year
+    before_day = year_start(date.fromordinal(before_day).year)
+    if before_day > this_year:
+        raise ValueError("Only closed years can be archived")
+    
+    data = load_data()
+    if job is not None:
+        job.progress(0.1, "Writing segments")
+    kept, segments = archive_store.archive(data['transactions'], before_day)
+    # Rows a previous, interrupted run already archived are dropped too
+    if len(kept) < len(data['transactions']):
+        data['transactions'] = kept
+        after = save_data(data)
+        response_cache.invalidate('transactions')
+        # Compacting hot storage is also when the snapshot is rewritten
+        current_snapshot(after[0], lambda: (kept, after[0]))
+    return {
+        "archived": sum(s['rows'] for s in segments),
+        "segments": [s['id'] for s in segments],
+        "hot_transactions": len(kept),
+    }
+
+
+@writes_data
+def recategorize_transactions(job=None):
+    """Run auto-categorization again over the rows it categorized, e.g. after adding rules
+
+    Categories a user chose are kept, and archived years are read-only.
+    """
+    data, before = read_data()
+    indexes = [i for i, t in enumerate(data['transactions']) if t.get('category_source') == 'auto']
+    if job is not None:
+        job.progress(0.1, "Categorizing transactions")
+    categorizer.ensure(before, lambda: data)
+    decisions = categorizer.categorize([data['transactions'][i] for i in indexes], data['categories'])
+    if job is not None:
+        job.progress(0.8, "Saving categories")
+    
+    anomaly_detector.ensure(before, lambda: data['transactions'])
+    removed, added = [], []
+    for i, decision in zip(indexes, decisions):
+        t = data['transactions'][i]
+        if decision['category'] != t['category']:
+            data['transactions'][i] = {**t, "category": decision['category']}
+            bump(data, data['transactions'][i])
+            removed.append(t)
+            added.append(data['transactions'][i])
+    if added:
+        after = save_data(data, delta=(removed, added))
+        response_cache.invalidate('transactions')
+        publish_change('batch', 'transaction', {"ids": [t['id'] for t in added]}, removed=removed, added=added)
+        carry_changes(before, after, removed=removed, added=added)
+    return {"checked": len(indexes), "recategorized": len(added)}
+
+
+job_queue.register('export', app_job(lambda params, job: build_export(
+    job, params.get('include_archived', True), tuple(params['fields']) if params.get('fields') else None)))
+job_queue.register('report', app_job(lambda params, job: build_report(params.get('period', 'month'),
+                                                                      params.get('currency'), job)))
+job_queue.register('archive', app_job(lambda params, job: archive_history(
+    to_day(params['before']) if params.get('before') else None, job)))
+job_queue.register('recategorize', app_job(lambda params, job: recategorize_transactions(job)))
+
+
+@app.route('/api/reports', methods=['GET'])
+@cached_response('transactions', fingerprint=state_fingerprint)
+def get_reports():
+    """Get financial reports with period filtering"""
+    try:
+        currency = display_currency()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(build_report(request.args.get('period', 'month'), currency))
+
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    """Export all data as JSON, archived years included unless ``archived=false``"""
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(build_export(include_archived=request.args.get('archived', 'true').lower() != 'false',
+                                fields=fields))
+
+
+@app.route('/api/archive', methods=['GET'])
+def get_archive():
+    """Get the archived segments and their day ranges"""
+    return jsonify(archive_store.summary())
+
+
+@app.route('/api/archive', methods=['POST'])
+def archive_transactions():
+    """Archive the closed years before a date (by default, every closed year)"""
+    body = request.get_json(silent=True) or {}
+    try:
+        before_day = to_day(body['before']) if body.get('before') else None
+    except ValueError:
+        return jsonify({"error": "Invalid before date"}), 400
+    
+    try:
+        return jsonify(archive_history(before_day))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a background export, report, archive or recategorization; poll its status and fetch the result later"""
+    body = request.get_json() or {}
+    params = body.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({"error": "params must be an object"}), 400
+    
+    try:
+        if 'currency' in params:
+            params['currency'] = normalize_currency(params['currency'])
+            if not fx_table.supports(params['currency']):
+                raise ValueError(f"No FX rates for {params['currency']}")
+        if 'fields' in params and (not isinstance(params['fields'], list)
+                                   or any(f not in TRANSACTION_FIELDS for f in params['fields'])):
+            raise ValueError(f"fields must be a list of {', '.join(TRANSACTION_FIELDS)}")
+        job = job_queue.submit(body.get('kind'), params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(job), 202
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """Get the most recently submitted jobs"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({"error": "Limit must be an integer"}), 400
+    return jsonify(job_queue.list(limit))
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a job's status and progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Download a finished job's JSON result"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job['status'] != 'succeeded':
+        return jsonify({"error": f"Job is {job['status']}", "job": job}), 409
+    path = job_queue.result_path(job_id)
+    if path is None:
+        return jsonify({"error": "Job result has expired"}), 410
+    return send_file(path, mimetype='application/json', as_attachment=True, download_name=f"{job['kind']}-{job_id}.json")
+
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
 
 @app.route('/api/import', methods=['POST'])
+@writes_data
 def import_data():
     """Import data from JSON"""
     body = request.get_json()
@@ -301,10 +994,412 @@ def import_data():
     if 'transactions' not in imported or 'categories' not in imported:
         return jsonify({"error": "Invalid data format"}), 400
     
+    previous = load_data().get('sync')
+    try:
+        imported = migrate_data({k: v for k, v in imported.items() if k != 'sync'})
+        imported['budgets'] = [budget_from_api(b) for b in imported.get('budgets', [])]
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid transaction or budget amount, date or currency"}), 400
+    if any('amount_cents' not in t or 'day' not in t for t in imported['transactions']):
+        return jsonify({"error": "Invalid data format"}), 400
+    
+    restart(imported, previous)
     save_data(imported)
+    # The import holds the full history, archived years included
+    archive_store.clear()
+    response_cache.invalidate('transactions', 'categories')
+    for series in all_rollups():
+        series.reset()
+    budget_engine.reset()
+    anomaly_detector.reset()
+    categorizer.reset()
+    change_feed.publish('reset', 'import')
     return jsonify({"success": True, "message": "Data imported successfully"})
 
 
+@app.route('/api/budgets', methods=['GET'])
+def get_budgets():
+    """Get every budget with its spend for the current period"""
+    budget_engine.ensure(state_fingerprint(), load_history)
+    return jsonify(budget_engine.statuses())
+
+
+@app.route('/api/budgets', methods=['POST'])
+@writes_data
+def add_budget():
+    """Add a per-category or overall budget"""
+    data, before = read_data()
+    body = request.get_json()
+    body.pop('id', None)
+    body.pop('amount_cents', None)
+    
+    try:
+        budget = budget_from_api(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    data.setdefault('budgets', []).append(budget)
+    after = save_data(data, delta=((), ()))
+    publish_change('insert', 'budget', budget_to_api(budget))
+    carry_changes(before, after)
+    budget_engine.reset()
+    budget_engine.ensure(after, load_history)
+    
+    return jsonify(budget_engine.status(budget['id'])), 201
+
+
+@app.route('/api/budgets/alerts', methods=['GET'])
+def get_budget_alerts():
+    """Get budget threshold crossings after the given alert id
+
+    Alerts are read back from the change feed every worker publishes them
+    to, and are identified by their event id there.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({"error": "since must be an integer"}), 400
+    
+    alerts = []
+    cursor = FeedCursor(change_feed, since)
+    while True:
+        events = cursor.poll()
+        if not events:
+            break
+        alerts.extend({**event['data'], "id": event['id']} for event in events
+                      if (event['type'], event['resource']) == ('alert', 'budget'))
+    return jsonify(alerts)
+
+
+@app.route('/api/budgets/<budget_id>', methods=['GET'])
+def get_budget(budget_id):
+    """Get one budget's spend for the period containing ``date`` (default today)"""
+    try:
+        day = to_day(request.args['date']) if request.args.get('date') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    budget_engine.ensure(state_fingerprint(), load_history)
+    status = budget_engine.status(budget_id, day)
+    if status is None:
+        return jsonify({"error": "Budget not found"}), 404
+    return jsonify(status)
+
+
+@app.route('/api/budgets/<budget_id>', methods=['PUT'])
+@writes_data
+def update_budget(budget_id):
+    """Update a budget by ID"""
+    data, before = read_data()
+    body = request.get_json()
+    body.pop('amount_cents', None)
+    
+    for i, budget in enumerate(data.get('budgets', [])):
+        if budget['id'] == budget_id:
+            try:
+                data['budgets'][i] = budget_from_api({**body, "id": budget_id}, existing=budget)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            after = save_data(data, delta=((), ()))
+            publish_change('update', 'budget', budget_to_api(data['budgets'][i]))
+            carry_changes(before, after)
+            budget_engine.reset()
+            budget_engine.ensure(after, load_history)
+            return jsonify(budget_engine.status(budget_id))
+    
+    return jsonify({"error": "Budget not found"}), 404
+
+
+@app.route('/api/budgets/<budget_id>', methods=['DELETE'])
+@writes_data
+def delete_budget(budget_id):
+    """Delete a budget by ID"""
+    data, before = read_data()
+    budgets = data.get('budgets', [])
+    data['budgets'] = [b for b in budgets if b['id'] != budget_id]
+    
+    if len(data['budgets']) == len(budgets):
+        return jsonify({"error": "Budget not found"}), 404
+    
+    after = save_data(data, delta=((), ()))
+    publish_change('delete', 'budget', {"id": budget_id})
+    carry_changes(before, after)
+    budget_engine.reset()
+    return jsonify({"success": True, "message": "Budget deleted"})
+
+
+@app.route('/api/timeseries', methods=['GET'])
+@cached_response('transactions', fingerprint=state_fingerprint)
+def get_timeseries():
+    """Get income/expense/net series for charts from precomputed rollups"""
+    granularity = request.args.get('granularity', 'auto')
+    category = request.args.get('category') or None
+    
+    try:
+        max_points = int(request.args.get('max_points', 366))
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start_day = to_day(start_date) if start_date else None
+        end_day = to_day(end_date) if end_date else None
+        currency = display_currency()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    series_rollups = rollups_for(currency)
+    series_rollups.ensure(state_fingerprint(), lambda: load_history()['transactions'])
+    bounds = series_rollups.bounds(category)
+    if start_day is None or end_day is None:
+        if bounds is None:
+            today = datetime.now().toordinal()
+            bounds = (today, today)
+        start_day = bounds[0] if start_day is None else start_day
+        end_day = bounds[1] if end_day is None else end_day
+    if start_day > end_day:
+        return jsonify({"error": "start_date must not be after end_date"}), 400
+    
+    if granularity == 'auto':
+        granularity = series_rollups.choose_granularity(start_day, end_day, max_points)
+    try:
+        series = series_rollups.series(granularity, start_day, end_day, category=category, max_points=max_points)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    record_rows(scanned=len(series['periods']) * series['bucket_size'], serialized=len(series['periods']))
+    
+    return jsonify({
+        "start_date": from_day(start_day),
+        "end_date": from_day(end_day),
+        "category": category,
+        "currency": currency,
+        **series
+    })
+
+
+@app.route('/api/categorize', methods=['POST'])
+def categorize_transactions():
+    """Suggest categories for transactions without storing anything"""
+    body = request.get_json() or {}
+    rows = body.get('transactions')
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        return jsonify({"error": "transactions must be a list of objects"}), 400
+    for index, row in enumerate(rows):
+        try:
+            check_text_fields(row)
+        except ValueError as e:
+            return jsonify({"error": f"Transaction {index}: {e}"}), 400
+    data, stamp = read_data()
+    categorizer.ensure(stamp, lambda: data)
+    return jsonify(categorizer.categorize(rows, data['categories']))
+
+
+@app.route('/api/categorize/rules', methods=['GET'])
+def get_categorization_rules():
+    """Get the keyword rules auto-categorization applies first"""
+    return jsonify(load_data().get('categorization_rules', []))
+
+
+@app.route('/api/categorize/rules', methods=['POST'])
+@writes_data
+def add_categorization_rule():
+    """Add a keyword rule, e.g. {"pattern": "netflix", "category": "Entertainment"}"""
+    data, before = read_data()
+    try:
+        rule = rule_from_api(request.get_json() or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not any(c['name'] == rule['category'] and c['type'] == rule['type'] for c in data['categories']):
+        return jsonify({"error": f"No {rule['type']} category named {rule['category']!r}"}), 400
+    
+    data.setdefault('categorization_rules', []).append(rule)
+    after = save_data(data, delta=((), ()))
+    carry_changes(before, after)
+    categorizer.reset()
+    return jsonify(rule), 201
+
+
+@app.route('/api/categorize/rules/<rule_id>', methods=['DELETE'])
+@writes_data
+def delete_categorization_rule(rule_id):
+    """Delete a keyword rule"""
+    data, before = read_data()
+    rules = data.get('categorization_rules', [])
+    data['categorization_rules'] = [r for r in rules if r['id'] != rule_id]
+    if len(data['categorization_rules']) == len(rules):
+        return jsonify({"error": "Rule not found"}), 404
+    
+    after = save_data(data, delta=((), ()))
+    carry_changes(before, after)
+    categorizer.reset()
+    return jsonify({"success": True, "message": "Rule deleted"})
+
+
+@app.route('/api/anomalies', methods=['GET'])
+def get_anomalies():
+    """Get unusually large expenses and monthly category spending spikes"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 1000)
+        months = min(int(request.args.get('months', 3)), 24)
+        since = request.args.get('since')
+        since_day = to_day(since) if since else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    anomaly_detector.ensure(state_fingerprint(), lambda: load_data()['transactions'])
+    return jsonify({
+        "currency": fx_table.base,
+        "anomalies": anomaly_detector.anomalies(limit, since_day),
+        "spikes": anomaly_detector.spikes(months),
+        "tracked": anomaly_detector.stats()
+    })
+
+
+@app.route('/api/currencies', methods=['GET'])
+def get_currencies():
+    """Get the currencies reports can be displayed in"""
+    return jsonify({"base": fx_table.base, "currencies": fx_table.currencies()})
+
+
+def ledger_rows(before=None):
+    """The JSON store's transactions newest first, after an optional ``(date, id)`` cursor
+
+    Hot rows come from the snapshot's date index, so a page decodes only
+    the rows it returns; data.json is parsed and sorted only when there is
+    no snapshot. Archived years are merged in, each decompressed only once
+    the ledger stream reaches it.
+    """
+    years = sorted({s['year'] for s in archive_store.segments()
+                    if before is None or s['year'] <= int(before[0][:4])}, reverse=True)
+    archived = itertools.chain.from_iterable(
+        iter_stored(archive_store.rows(year_start(year), year_start(year + 1) - 1), before) for year in years
+    )
+    snapshot = current_snapshot(data_fingerprint())
+    hot = snapshot.iter_by_date(before) if snapshot is not None else iter_stored(load_data()['transactions'], before)
+    return heapq.merge(hot, archived, key=fiat_key, reverse=True)
+
+
+@app.route('/api/ledger', methods=['GET'])
+def get_ledger():
+    """Get fiat and on-chain transactions as one chronological ledger
+
+    ``address`` narrows the ledger to one wallet's on-chain transactions.
+    """
+    cursor = request.args.get('cursor')
+    address = request.args.get('address')
+    
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({"error": "Limit must be an integer"}), 400
+    
+    try:
+        if request.args.get('stream') == 'true':
+            entries = iter_ledger(ledger_rows, blockchain_db, cursor=cursor, address=address)
+            lines = (json.dumps(entry) + '\n' for entry in entries)
+            return Response(lines, mimetype='application/x-ndjson')
+        
+        return jsonify(ledger_page(ledger_rows, blockchain_db, cursor=cursor, limit=limit, address=address))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route('/api/sync', methods=['GET'])
+def get_sync():
+    """Get transactions, categories and deletions written after sync version ``since``"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = max(1, min(int(request.args.get('limit', 1000)), MAX_SYNC_LIMIT))
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    
+    data = load_data()
+    archived = archive_store.changed_since(since)
+    delta = changes_since(data, since, limit, archived)
+    delta['transactions'] = [transaction_to_api(t) for t in delta['transactions']]
+    record_rows(scanned=len(data['transactions']) + len(data['categories']) + len(archived),
+                serialized=len(delta['transactions']) + len(delta['categories']) + len(delta['deleted']))
+    return jsonify(delta)
+
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """Get change feed events after the given event id"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 100)), 500)
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+    
+    events, reset = change_feed.read_since(since, limit)
+    return jsonify({
+        "events": events,
+        "last_id": events[-1]['id'] if events else since,
+        "reset": reset,
+    })
+
+
+@app.route('/api/changes/stream', methods=['GET'])
+def stream_changes():
+    """Stream change feed events as server-sent events, resuming after Last-Event-ID"""
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id', 0))
+        timeout = min(float(request.args.get('timeout', 300)), 3600)
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID and timeout must be numbers"}), 400
+    
+    return Response(change_feed.stream(last_id, timeout=timeout), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get response cache hit/miss/eviction and request coalescing counters"""
+    return jsonify({**response_cache.stats(), "single_flight": single_flight.stats()})
+
+
+# ============== BLOCKCHAIN ROUTES ==============
+
+@app.route('/api/blockchain/portfolio', methods=['GET'])
+def get_portfolio():
+    """Value token balances across wallets and chains in USD"""
+    wallets = request.args.get('wallets')
+    wallets = [w for w in wallets.split(',') if w] if wallets else None
+    chain_id = request.args.get('chain_id')
+    
+    valuation = blockchain_db.get_portfolio_valuation(price_table, wallets=wallets, chain_id=chain_id)
+    return jsonify(valuation)
+
+
+@app.route('/api/blockchain/gas/analytics', methods=['GET'])
+def get_gas_analytics():
+    """Get gas spend over time and the most expensive transactions"""
+    address = request.args.get('address')
+    chain_id = request.args.get('chain_id')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "Limit must be an integer"}), 400
+    
+    gas = blockchain_db.gas
+    try:
+        most_expensive = gas.most_expensive(address, chain_id, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "address": address,
+        "chain_id": chain_id,
+        "total": gas.total(address, chain_id),
+        "daily": gas.daily(address, chain_id, start_date, end_date),
+        "by_category": gas.by_category(address, chain_id),
+        "most_expensive": [
+            {**tx.to_dict(), "gas_fee_eth": format_wei(tx.gas_fee_wei)["eth"]}
+            for tx in most_expensive
+        ]
+    })
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("       EXPENSE TRACKER - Python Backend Server")
@@ -316,6 +1411,7 @@ if __name__ == '__main__':
     print("  GET    /api/health              Health check")
     print("  GET    /api/transactions        Get all transactions")
     print("  POST   /api/transactions        Add transaction")
+    print("  POST   /api/transactions/batch  Add a bank sync batch")
     print("  PUT    /api/transactions/<id>   Update transaction")
     print("  DELETE /api/transactions/<id>   Delete transaction")
     print("  GET    /api/categories          Get categories")
@@ -323,6 +1419,30 @@ if __name__ == '__main__':
     print("  GET    /api/reports             Get reports")
     print("  GET    /api/export              Export data")
     print("  POST   /api/import              Import data")
+    print("  GET    /api/archive             Archived segments")
+    print("  POST   /api/archive             Archive closed years")
+    print("  POST   /api/jobs                Queue background export/report")
+    print("  GET    /api/jobs/<id>           Job status and progress")
+    print("  GET    /api/jobs/<id>/result    Download job result")
+    print("  DELETE /api/jobs/<id>           Cancel job")
+    print("  GET    /api/budgets             Budgets with spend to date")
+    print("  POST   /api/budgets             Add budget")
+    print("  PUT    /api/budgets/<id>        Update budget")
+    print("  DELETE /api/budgets/<id>        Delete budget")
+    print("  GET    /api/budgets/alerts      Budget threshold crossings")
+    print("  GET    /api/timeseries          Chart series with downsampling")
+    print("  POST   /api/categorize          Suggest categories")
+    print("  GET    /api/categorize/rules    Auto-categorization rules")
+    print("  GET    /api/anomalies           Unusual expenses and spending spikes")
+    print("  GET    /api/currencies          Supported display currencies")
+    print("  GET    /api/ledger              Unified fiat + on-chain ledger")
+    print("  GET    /api/sync                Delta sync since a version")
+    print("  GET    /api/changes             Change feed events since an id")
+    print("  GET    /api/changes/stream      Change feed over server-sent events")
+    print("  GET    /api/cache/stats         Response cache counters")
+    print("  GET    /api/metrics             Prometheus metrics")
+    print("  GET    /api/blockchain/portfolio Portfolio valuation")
+    print("  GET    /api/blockchain/gas/analytics Gas spend analytics")
     print("=" * 60)
     
     app.run(debug=True, port=5000, host='0.0.0.0')
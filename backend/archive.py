@@ -0,0 +1,337 @@
+"""
+Cold history archive for Expense Tracker
+Closed years of transactions moved out of hot storage into immutable,
+compressed segment files, each published with pre-aggregates so reports
+and charts never have to decompress it
+"""
+
+import base64
+import fcntl
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from dates import from_day
+from fx import fx_table
+
+CODECS = {'lzma': ('.json.xz', lzma.open), 'gzip': ('.json.gz', gzip.open)}
+
+# Largest rows per type kept as top-N candidates in a segment's manifest entry
+TOP_CANDIDATES = 20
+
+# Bloom filter sizing for a segment's ids: about 1% false positives
+ID_FILTER_BITS_PER_ROW = 10
+ID_FILTER_HASHES = 7
+
+
+def year_start(year: int) -> int:
+    """Day ordinal of January 1st"""
+    return date(year, 1, 1).toordinal()
+
+
+def segment_aggregates(rows: List[Dict]) -> Tuple[List[list], Optional[Dict[str, List[Dict]]]]:
+    """Daily ``[day, category, type, currency, amount_cents, count]`` sums and top rows
+
+    Top candidates are only kept for single-currency segments, and only
+    used when reporting in that currency, where no conversion can reorder them.
+    """
+    daily: Dict[tuple, List[int]] = {}
+    for t in rows:
+        key = (t['day'], t['category'], t['type'], t.get('currency', fx_table.base))
+        totals = daily.setdefault(key, [0, 0])
+        totals[0] += t['amount_cents']
+        totals[1] += 1
+    entries = [[*key, amount, count] for key, (amount, count) in sorted(daily.items(), key=lambda kv: kv[0][0])]
+
+    top = None
+    if len({t.get('currency', fx_table.base) for t in rows}) == 1:
+        top = {}
+        for kind in ('income', 'expense'):
+            matching = [t for t in rows if t['type'] == kind]
+            matching.sort(key=lambda t: t['amount_cents'], reverse=True)
+            top[kind] = matching[:TOP_CANDIDATES]
+    return entries, top
+
+
+def _id_bits(row_id: str, size: int) -> List[int]:
+    digest = hashlib.blake2b(row_id.encode(), digest_size=16).digest()
+    first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+    return [(first + i * second) % size for i in range(ID_FILTER_HASHES)]
+
+
+def id_filter(ids: Iterable[str], count: int) -> str:
+    """Base64 Bloom filter of a segment's row ids, for the manifest"""
+    size = max(64, count * ID_FILTER_BITS_PER_ROW)
+    bits = bytearray((size + 7) // 8)
+    for row_id in ids:
+        for bit in _id_bits(row_id, size):
+            bits[bit >> 3] |= 1 << (bit & 7)
+    return base64.b64encode(bytes(bits)).decode('ascii')
+
+
+def may_contain(segment: Dict, row_id: str) -> bool:
+    """False only when the segment certainly does not hold ``row_id``
+
+    Segments written before the manifest carried id filters always may.
+    """
+    encoded = segment.get('ids')
+    if encoded is None:
+        return True
+    bits = base64.b64decode(encoded)
+    size = max(64, segment['rows'] * ID_FILTER_BITS_PER_ROW)
+    return all(bits[bit >> 3] & (1 << (bit & 7)) for bit in _id_bits(row_id, size))
+
+
+class ArchiveStore:
+    """Immutable compressed segments plus a manifest of their aggregates
+
+    The manifest (cached in memory by mtime) holds, per segment, its day
+    range, row count, checksum, daily sums by category/type/currency,
+    top-N candidate rows and a Bloom filter of its ids. Decompressed segments are kept in a small LRU
+    since they never change once written.
+    """
+
+    def __init__(self, path: str, codec: str = 'lzma', max_cached_segments: int = 4):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown archive codec: {codec!r}")
+        self.path = path
+        self.codec = codec
+        self.max_cached_segments = max_cached_segments
+        self._manifest_path = os.path.join(path, 'manifest.json')
+        self._manifest: Dict = {"segments": []}
+        self._mtime: Optional[int] = None
+        self._rows: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.segments_read = 0
+
+    def manifest(self) -> Dict:
+        """The current manifest, re-read when another process rewrote it"""
+        with self._lock:
+            try:
+                mtime = os.stat(self._manifest_path).st_mtime_ns
+            except OSError:
+                self._manifest, self._mtime = {"segments": []}, None
+                return self._manifest
+            if mtime != self._mtime:
+                with open(self._manifest_path, 'r') as f:
+                    self._manifest = json.load(f)
+                self._mtime = mtime
+            return self._manifest
+
+    @property
+    def version(self):
+        """Changes whenever segments are added or removed"""
+        self.manifest()
+        return self._mtime
+
+    def segments(self, start_day: Optional[int] = None, end_day: Optional[int] = None) -> List[Dict]:
+        """Manifest entries of segments overlapping an inclusive day range"""
+        return [s for s in self.manifest()['segments']
+                if (start_day is None or s['end_day'] >= start_day)
+                and (end_day is None or s['start_day'] <= end_day)]
+
+    def archived_through(self) -> Optional[int]:
+        """Last day covered by the archive, None when it is empty"""
+        segments = self.manifest()['segments']
+        return max(s['end_day'] for s in segments) if segments else None
+
+    def read_segment(self, segment: Dict) -> List[Dict]:
+        """Decompress a segment's rows, verifying its checksum"""
+        with self._lock:
+            if segment['id'] in self._rows:
+                self._rows.move_to_end(segment['id'])
+                return self._rows[segment['id']]
+        _, opener = CODECS[segment['codec']]
+        with open(os.path.join(self.path, segment['file']), 'rb') as f:
+            raw = f.read()
+        if hashlib.sha256(raw).hexdigest() != segment['sha256']:
+            raise ValueError(f"Archive segment {segment['id']} is corrupt")
+        with opener(os.path.join(self.path, segment['file']), 'rt') as f:
+            rows = json.load(f)
+        self.segments_read += 1
+        with self._lock:
+            self._rows[segment['id']] = rows
+            while len(self._rows) > self.max_cached_segments:
+                self._rows.popitem(last=False)
+        return rows
+
+    def rows(self, start_day: Optional[int] = None, end_day: Optional[int] = None) -> List[Dict]:
+        """Archived rows within an inclusive day range, decompressing only overlapping segments"""
+        rows = []
+        for segment in self.segments(start_day, end_day):
+            rows.extend(t for t in self.read_segment(segment)
+                        if (start_day is None or t['day'] >= start_day)
+                        and (end_day is None or t['day'] <= end_day))
+        return rows
+
+    def changed_since(self, version: int) -> List[Dict]:
+        """Archived rows whose sync version is after ``version``
+
+        Segments whose newest row is not after it are skipped without
+        decompressing, so an up-to-date replica costs a manifest read.
+        """
+        rows = []
+        for segment in self.manifest()['segments']:
+            if segment.get('max_version', version + 1) > version:
+                rows.extend(t for t in self.read_segment(segment) if t.get('version', 1) > version)
+        return rows
+
+    def find(self, row_id: str) -> Optional[Dict]:
+        """The archived row with id ``row_id``, None when it is not archived
+
+        Only segments whose id filter matches are decompressed, so an
+        unknown id usually costs a manifest read.
+        """
+        for segment in self.manifest()['segments']:
+            if not may_contain(segment, row_id):
+                continue
+            for t in self.read_segment(segment):
+                if t['id'] == row_id:
+                    return t
+        return None
+
+    def _archived_ids(self, segments: Iterable[Dict]) -> Set[str]:
+        return {t['id'] for segment in segments for t in self.read_segment(segment)}
+
+    def daily_rows(self, start_day: Optional[int] = None) -> List[Dict]:
+        """Daily sums as pseudo-transactions (with a ``count``), without decompressing
+
+        Anything that only sums amounts by day, category, type and currency
+        (rollups, budgets, report totals) can consume these like rows.
+        """
+        return [{"day": day, "category": category, "type": kind, "currency": currency,
+                 "amount_cents": amount, "count": count}
+                for segment in self.segments(start_day)
+                for day, category, kind, currency, amount, count in segment['daily']
+                if start_day is None or day >= start_day]
+
+    def top_candidates(self, kind: str, start_day: int, currency: str, top_n: int) -> List[Dict]:
+        """Archived rows that can rank in a top-``top_n`` list since ``start_day``
+
+        Uses the manifest's candidates where they are sufficient and
+        decompresses a segment only when they are not (mixed currencies, or
+        too few candidates left after the day filter).
+        """
+        candidates = []
+        for segment in self.segments(start_day):
+            top = segment.get('top')
+            usable = top is not None and segment['currencies'] == [currency]
+            if usable:
+                in_range = [t for t in top[kind] if t['day'] >= start_day]
+                if len(in_range) >= top_n or len(top[kind]) < TOP_CANDIDATES:
+                    candidates.extend(in_range)
+                    continue
+            candidates.extend(t for t in self.read_segment(segment)
+                              if t['type'] == kind and t['day'] >= start_day)
+        return candidates
+
+    def _write_manifest(self, manifest: Dict):
+        tmp_path = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    def archive(self, rows: List[Dict], before_day: int) -> Tuple[List[Dict], List[Dict]]:
+        """Write rows dated before ``before_day`` into one new segment per year
+
+        Returns ``(kept, segments)``. Segments are written and published in
+        the manifest before the caller drops the rows from hot storage, so a
+        crash in between leaves rows in both places; archiving again skips
+        the rows a segment already holds, so they are never counted twice.
+        """
+        by_year: Dict[int, List[Dict]] = {}
+        kept = []
+        for t in rows:
+            if t['day'] < before_day:
+                by_year.setdefault(date.fromordinal(t['day']).year, []).append(t)
+            else:
+                kept.append(t)
+        if not by_year:
+            return rows, []
+
+        os.makedirs(self.path, exist_ok=True)
+        suffix, opener = CODECS[self.codec]
+        with open(os.path.join(self.path, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = json.loads(json.dumps(self.manifest()))
+            created = []
+            for year, year_rows in sorted(by_year.items()):
+                existing = [s for s in manifest['segments'] if s['year'] == year]
+                if existing:
+                    archived = self._archived_ids(existing)
+                    year_rows = [t for t in year_rows if t['id'] not in archived]
+                    if not year_rows:
+                        continue
+                seq = 1 + len(existing)
+                segment_id = f"{year}-{seq}"
+                file_name = f"{segment_id}{suffix}"
+                tmp_path = os.path.join(self.path, f"{file_name}.tmp")
+                with opener(tmp_path, 'wt') as f:
+                    json.dump(year_rows, f, separators=(',', ':'))
+                os.replace(tmp_path, os.path.join(self.path, file_name))
+                with open(os.path.join(self.path, file_name), 'rb') as f:
+                    raw = f.read()
+                daily, top = segment_aggregates(year_rows)
+                segment = {
+                    "id": segment_id,
+                    "year": year,
+                    "file": file_name,
+                    "codec": self.codec,
+                    "start_day": min(t['day'] for t in year_rows),
+                    "end_day": max(t['day'] for t in year_rows),
+                    "rows": len(year_rows),
+                    "max_version": max(t.get('version', 1) for t in year_rows),
+                    "bytes": len(raw),
+                    "sha256": hashlib.sha256(raw).hexdigest(),
+                    "currencies": sorted({t.get('currency', fx_table.base) for t in year_rows}),
+                    "created_at": datetime.now().isoformat(),
+                    "daily": daily,
+                    "top": top,
+                    "ids": id_filter((t['id'] for t in year_rows), len(year_rows)),
+                }
+                manifest['segments'].append(segment)
+                created.append(segment)
+            if created:
+                self._write_manifest(manifest)
+        return kept, created
+
+    def clear(self) -> int:
+        """Remove every segment (a wholesale import replaces archived history too)"""
+        segments = self.manifest()['segments']
+        if not segments:
+            return 0
+        self._write_manifest({"segments": []})
+        for segment in segments:
+            try:
+                os.remove(os.path.join(self.path, segment['file']))
+            except OSError:
+                pass
+        with self._lock:
+            self._rows.clear()
+        return len(segments)
+
+    def summary(self) -> Dict:
+        """Segments without their aggregates, for the API"""
+        segments = [{k: v for k, v in s.items() if k not in ('daily', 'top', 'ids')} for s in self.manifest()['segments']]
+        for s in segments:
+            s['start_date'], s['end_date'] = from_day(s.pop('start_day')), from_day(s.pop('end_day'))
+        return {
+            "segments": segments,
+            "rows": sum(s['rows'] for s in segments),
+            "bytes": sum(s['bytes'] for s in segments),
+            "archived_through": from_day(self.archived_through()) if segments else None,
+        }
+
+
+def archive_directory(name: str) -> str:
+    return os.path.join(os.environ.get('ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), 'archive')), name)
+
+
+# Archive of the JSON store's history
+archive_store = ArchiveStore(archive_directory('json'), codec=os.environ.get('ARCHIVE_CODEC', 'lzma'))
@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Expense Tracker backend
+Run from the backend directory with ``python -m benchmarks.run``
+"""
@@ -0,0 +1,327 @@
+"""
+Concurrent load test against gunicorn
+Starts the app under gunicorn with a synthetic ledger, drives mixed
+read/write traffic from many client threads and verifies data integrity
+
+Usage (from the backend directory):
+    python -m benchmarks.loadtest --workers 4 --threads 2 --clients 32 --duration 30
+    python -m benchmarks.loadtest --url http://localhost:5000 --clients 16
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.synthetic import LedgerGenerator
+
+# Default traffic mix (relative weights)
+DEFAULT_MIX = {"list": 30, "report": 30, "add": 20, "update": 10, "delete": 8, "import": 2}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class Client:
+    """Minimal JSON HTTP client over urllib"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, Optional[Dict]]:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, json.loads(resp.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class LoadTest:
+    """Runs client threads and keeps the bookkeeping needed to check integrity
+
+    Each client only updates and deletes rows it added itself, so the
+    expected final state of every row is known. Imports replace the whole
+    store, so rows whose writes overlapped an import are reported as
+    ambiguous rather than lost.
+    """
+
+    def __init__(self, base_url: str, clients: int, duration: float, mix: Dict[str, int], seed: int):
+        self.base_url = base_url
+        self.clients = clients
+        self.duration = duration
+        self.mix = mix
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {op: [] for op in mix}
+        self.errors: Dict[str, Dict[str, int]] = {op: {} for op in mix}
+        # id -> {"expected": amount or None (deleted), "start": t, "end": t}
+        self.rows: Dict[str, Dict] = {}
+        self.imports: List[Tuple[float, float]] = []
+
+    def _record(self, op: str, seconds: float, status: int, ok: bool):
+        with self.lock:
+            self.latencies[op].append(seconds)
+            if not ok:
+                key = str(status)
+                self.errors[op][key] = self.errors[op].get(key, 0) + 1
+
+    def _track(self, row_id: str, started: float, **state):
+        with self.lock:
+            row = self.rows.setdefault(row_id, {"start": started})
+            row.update(state, end=time.monotonic())
+
+    def _client(self, index: int, stop_at: float):
+        rng = random.Random(self.seed + index)
+        client = Client(self.base_url)
+        ops, weights = zip(*self.mix.items())
+        owned: List[str] = []
+
+        while time.monotonic() < stop_at:
+            op = rng.choices(ops, weights)[0]
+            if op in ("update", "delete") and not owned:
+                op = "add"
+            started = time.monotonic()
+            try:
+                if op == "list":
+                    status, _ = client.request("GET", "/api/transactions")
+                    ok = status == 200
+                elif op == "report":
+                    period = rng.choice(["week", "month", "year", "all"])
+                    status, _ = client.request("GET", f"/api/reports?period={period}")
+                    ok = status == 200
+                elif op == "add":
+                    amount = round(rng.uniform(1, 500), 2)
+                    status, body = client.request("POST", "/api/transactions", {
+                        "type": rng.choice(["income", "expense"]), "amount": amount,
+                        "category": "Load Test", "description": f"client {index}",
+                        "date": time.strftime('%Y-%m-%d'),
+                    })
+                    ok = status == 201
+                    if ok:
+                        owned.append(body["id"])
+                        self._track(body["id"], started, expected=amount)
+                elif op == "update":
+                    row_id = rng.choice(owned)
+                    amount = round(rng.uniform(1, 500), 2)
+                    status, _ = client.request("PUT", f"/api/transactions/{row_id}", {"amount": amount})
+                    ok = status == 200
+                    if ok:
+                        self._track(row_id, started, expected=amount)
+                    elif status == 404:
+                        self._track(row_id, started, lost_before_update=True)
+                elif op == "delete":
+                    row_id = owned.pop(rng.randrange(len(owned)))
+                    status, _ = client.request("DELETE", f"/api/transactions/{row_id}")
+                    ok = status == 200
+                    self._track(row_id, started, expected=None, delete_status=status)
+                else:
+                    status, exported = client.request("GET", "/api/export")
+                    ok = status == 200
+                    if ok:
+                        status, _ = client.request("POST", "/api/import", {"data": exported["data"]})
+                        ok = status == 200
+                        with self.lock:
+                            self.imports.append((started, time.monotonic()))
+            except (OSError, ValueError) as e:
+                status, ok = type(e).__name__, False
+            self._record(op, time.monotonic() - started, status, ok)
+
+    def run(self) -> float:
+        stop_at = time.monotonic() + self.duration
+        threads = [threading.Thread(target=self._client, args=(i, stop_at), daemon=True)
+                   for i in range(self.clients)]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.monotonic() - started
+
+    def _overlaps_import(self, row: Dict) -> bool:
+        return any(not (end < row["start"] or start > row["end"]) for start, end in self.imports)
+
+    def verify(self) -> Dict:
+        """Compare the final store with every acknowledged write"""
+        status, body = Client(self.base_url).request("GET", "/api/transactions")
+        if status != 200:
+            return {"error": f"final read failed with {status}"}
+        final = {t["id"]: t for t in body["transactions"]}
+
+        lost_writes, lost_updates, resurrected, ambiguous = [], [], [], 0
+        for row_id, row in self.rows.items():
+            if self._overlaps_import(row):
+                ambiguous += 1
+                continue
+            present = final.get(row_id)
+            if row.get("lost_before_update") or (row.get("expected") is None and row.get("delete_status") == 404):
+                lost_writes.append(row_id)
+            elif row["expected"] is None:
+                if present is not None:
+                    resurrected.append(row_id)
+            elif present is None:
+                lost_writes.append(row_id)
+            elif abs(float(present["amount"]) - row["expected"]) > 1e-9:
+                lost_updates.append(row_id)
+
+        return {
+            "rows_tracked": len(self.rows),
+            "rows_final": len(final),
+            "ambiguous_with_import": ambiguous,
+            "lost_writes": len(lost_writes),
+            "lost_updates": len(lost_updates),
+            "resurrected_deletes": len(resurrected),
+            "sample_lost_ids": lost_writes[:10],
+        }
+
+    def report(self, elapsed: float) -> Dict:
+        total = sum(len(v) for v in self.latencies.values())
+        errors = sum(sum(v.values()) for v in self.errors.values())
+        per_op = {}
+        for op, samples in self.latencies.items():
+            per_op[op] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "errors": self.errors[op],
+            }
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "errors": errors,
+            "operations": per_op,
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(workdir: str, workers: int, threads: int, port: int) -> subprocess.Popen:
+    """Start the app under gunicorn and wait for the health check"""
+    gunicorn = shutil.which("gunicorn")
+    if gunicorn is None:
+        raise SystemExit("gunicorn is not installed (pip install -r requirements.txt)")
+    env = {**os.environ,
+           "DATA_FILE": os.path.join(workdir, "data.json"),
+           "DATABASE_PATH": os.path.join(workdir, "expense_tracker.db"),
+           "CHANGE_FEED_FILE": os.path.join(workdir, "changes.log"),
+           "SNAPSHOT_FILE": os.path.join(workdir, "data.snapshot"),
+           "ARCHIVE_DIR": os.path.join(workdir, "archive"),
+           "JOBS_DB": os.path.join(workdir, "jobs.db"),
+           "JOB_RESULTS_DIR": os.path.join(workdir, "job_results"),
+           "PROFILE_DIR": os.path.join(workdir, "profiles")}
+    process = subprocess.Popen(
+        [gunicorn, "--workers", str(workers), "--threads", str(threads),
+         "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "app:app"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env,
+    )
+    client = Client(f"http://127.0.0.1:{port}", timeout=2)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"gunicorn exited with {process.returncode}")
+        try:
+            if client.request("GET", "/api/health")[0] == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("gunicorn did not become healthy within 30s")
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, text.split(",")):
+        op, _, weight = part.partition("=")
+        if op not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r}")
+        mix[op] = int(weight)
+    return {op: w for op, w in mix.items() if w > 0}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Expense Tracker concurrent load test")
+    parser.add_argument("--url", help="target an already running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds of traffic")
+    parser.add_argument("--size", type=int, default=10000, help="transactions in the seeded ledger")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="operation weights, e.g. list=50,report=30,add=20,import=0")
+    parser.add_argument("--output", help="write the JSON report here (default stdout)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="expense-load-")
+    process = None
+    try:
+        if args.url:
+            base_url = args.url
+        else:
+            LedgerGenerator(args.size, seed=args.seed).write_json(os.path.join(workdir, "data.json"))
+            port = free_port()
+            process = start_gunicorn(workdir, args.workers, args.threads, port)
+            base_url = f"http://127.0.0.1:{port}"
+
+        print(f"Load testing {base_url} with {args.clients} clients for {args.duration}s "
+              f"(workers={args.workers}, threads={args.threads})", file=sys.stderr)
+        test = LoadTest(base_url, args.clients, args.duration, args.mix, args.seed)
+        elapsed = test.run()
+        result = {
+            "config": {"workers": args.workers, "threads": args.threads, "clients": args.clients,
+                       "duration": args.duration, "size": args.size, "mix": args.mix,
+                       "url": args.url},
+            **test.report(elapsed),
+            "integrity": test.verify(),
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    integrity = result["integrity"]
+    for op, stats in result["operations"].items():
+        print(f"  {op:<8} {stats['requests']:>7} req  {stats['throughput_rps']:>8} rps  "
+              f"p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  "
+              f"errors {stats['errors']}", file=sys.stderr)
+    print(f"  total {result['requests']} req, {result['throughput_rps']} rps, {result['errors']} errors; "
+          f"integrity {integrity}", file=sys.stderr)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    violations = sum(integrity.get(k, 0) for k in ("lost_writes", "lost_updates", "resurrected_deletes"))
+    return 1 if violations or "error" in integrity else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Benchmark runner
+Times every API route, every Database method and every BlockchainDatabase
+lookup against a synthetic ledger and compares results with a baseline
+
+Usage (from the backend directory):
+    python -m benchmarks.run --size 10000 --output bench.json
+    python -m benchmarks.run --size 100000 --baseline bench.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import app as app_module
+import database as database_module
+from archive import ArchiveStore
+from blockchain_database import BlockchainDatabase
+from change_feed import ChangeFeed
+from database import Database
+from jobs import job_queue
+from response_cache import response_cache
+from snapshot import SnapshotStore
+
+from benchmarks.synthetic import LedgerGenerator
+
+
+class Bench:
+    """Collects timings as machine-readable result rows"""
+
+    def __init__(self, size: int, repeat: int, min_time: float):
+        self.size = size
+        self.repeat = repeat
+        self.min_time = min_time
+        self.results: List[Dict] = []
+
+    def measure(self, group: str, name: str, fn: Callable, backend: str = "-",
+                setup: Optional[Callable] = None):
+        """Time ``fn`` at least ``repeat`` times and for at least ``min_time`` seconds"""
+        if setup is None:
+            fn()  # warm up lazy imports and caches
+        samples = []
+        started = time.perf_counter()
+        while len(samples) < self.repeat or (time.perf_counter() - started < self.min_time and len(samples) < 1000):
+            arg = setup() if setup else None
+            t0 = time.perf_counter()
+            fn(arg) if setup else fn()
+            samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        row = {
+            "group": group,
+            "name": name,
+            "backend": backend,
+            "size": self.size,
+            "iterations": len(samples),
+            "min_ms": round(samples[0], 4),
+            "median_ms": round(statistics.median(samples), 4),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        }
+        self.results.append(row)
+        print(f"  {group:<12} {backend:<7} {name:<48} median {row['median_ms']:>10.3f} ms  "
+              f"p95 {row['p95_ms']:>10.3f} ms  (n={row['iterations']})", file=sys.stderr)
+
+
+def fresh_ledger(generator: LedgerGenerator, data_file: str, workdir: str):
+    """Rewrite the synthetic JSON store and point the app at a new, empty archive"""
+    generator.write_json(data_file)
+    app_module.archive_store = ArchiveStore(os.path.join(workdir, f'archive-{time.monotonic_ns()}'))
+
+
+def bench_routes(bench: Bench, generator: LedgerGenerator, workdir: str):
+    """Every app.py route through the Flask test client, on the JSON store"""
+    data_file = os.path.join(workdir, 'data.json')
+    generator.write_json(data_file)
+    app_module.DATA_FILE = data_file
+    app_module.snapshot_store = SnapshotStore(os.path.join(workdir, 'data.snapshot'))
+    app_module.archive_store = ArchiveStore(os.path.join(workdir, 'archive'))
+    app_module.change_feed = database_module.change_feed = ChangeFeed(os.path.join(workdir, 'changes.log'))
+    job_queue.db_path = os.path.join(workdir, 'jobs.db')
+    job_queue.result_dir = os.path.join(workdir, 'job_results')
+    # Jobs stay queued, so no worker competes with the timed requests
+    job_queue.max_workers = 0
+    client = app_module.app.test_client()
+    ids = iter(t["id"] for t in generator.transactions())
+    counter = iter(range(10 ** 9))
+    body = {"type": "expense", "amount": 12.5, "category": "Food & Dining",
+            "description": "Benchmark", "date": generator.end.isoformat()}
+    uncategorized = [{"type": "expense", "amount": 12.5, "description": f"Grocery store {n}",
+                      "date": generator.end.isoformat()} for n in range(100)]
+    export = client.get('/api/export').get_json()
+    version = client.get('/api/sync?since=0&limit=1').get_json()['version']
+    job_id = client.post('/api/jobs', json={"kind": "report"}).get_json()['id']
+
+    # Cold numbers: nothing is served from the response cache
+    max_bytes, response_cache.max_bytes = response_cache.max_bytes, 0
+    try:
+        gets = ['/api/health', '/api/transactions', '/api/categories', '/api/reports?period=week',
+                '/api/reports?period=month', '/api/reports?period=year', '/api/reports?period=all',
+                '/api/timeseries', '/api/timeseries?granularity=day&max_points=200',
+                '/api/export', '/api/ledger?limit=50', '/api/ledger?limit=500', '/api/blockchain/portfolio',
+                '/api/blockchain/gas/analytics', '/api/cache/stats', '/api/metrics', '/api/budgets',
+                '/api/budgets/alerts', '/api/anomalies', '/api/sync?since=0&limit=1000',
+                '/api/categorize/rules', '/api/jobs', '/api/archive']
+        for path in gets:
+            bench.measure("route", f"GET {path}", lambda p=path: client.get(p), "json")
+        bench.measure("route", "GET /api/sync?since=<latest>", lambda: client.get(f'/api/sync?since={version}'), "json")
+        bench.measure("route", "GET /api/jobs/<id>", lambda: client.get(f'/api/jobs/{job_id}'), "json")
+        bench.measure("route", "POST /api/transactions", lambda: client.post('/api/transactions', json=body), "json")
+        bench.measure("route", "POST /api/transactions/batch (100 rows)",
+                      lambda i: client.post('/api/transactions/batch', json={"transactions": [
+                          {**row, "bank_transaction_id": f"bench-{i}-{n}"} for n, row in enumerate(uncategorized)]}),
+                      "json", setup=lambda: next(counter))
+        bench.measure("route", "POST /api/categorize (100 rows)",
+                      lambda: client.post('/api/categorize', json={"transactions": uncategorized}), "json")
+        bench.measure("route", "POST /api/budgets",
+                      lambda: client.post('/api/budgets', json={"category": "Food & Dining", "amount": 500}), "json")
+        bench.measure("route", "POST /api/jobs", lambda: client.post('/api/jobs', json={"kind": "report"}), "json")
+        bench.measure("route", "PUT /api/transactions/<id>",
+                      lambda i: client.put(f'/api/transactions/{i}', json={"amount": 10}), "json",
+                      setup=lambda: next(ids, "missing"))
+        bench.measure("route", "DELETE /api/transactions/<id>",
+                      lambda i: client.delete(f'/api/transactions/{i}'), "json", setup=lambda: next(ids, "missing"))
+        bench.measure("route", "POST /api/categories",
+                      lambda: client.post('/api/categories', json={"name": "Bench", "type": "expense", "color": "#000"}), "json")
+        bench.measure("route", "POST /api/import", lambda: client.post('/api/import', json=export), "json")
+        # The writes above filled the change feed
+        for path in ['/api/changes?since=0', '/api/changes?since=0&limit=500']:
+            bench.measure("route", f"GET {path}", lambda p=path: client.get(p), "json")
+        # Every run archives the full ledger's closed years into an empty archive
+        bench.measure("route", "POST /api/archive", lambda _: client.post('/api/archive', json={}), "json",
+                      setup=lambda: fresh_ledger(generator, data_file, workdir))
+    finally:
+        response_cache.max_bytes = max_bytes
+    fresh_ledger(generator, data_file, workdir)
+
+    response_cache.clear()
+    for path in ['/api/transactions', '/api/categories', '/api/reports?period=year']:
+        client.get(path)
+        bench.measure("route", f"GET {path} (cached)", lambda p=path: client.get(p), "json")
+
+
+def bench_database(bench: Bench, generator: LedgerGenerator, db: Database):
+    """Every Database method on the SQLite store"""
+    ids = iter(t["id"] for t in generator.transactions())
+    end = generator.end.isoformat()
+    start = f"{generator.end.year - 1}-{generator.end.month:02d}-01"
+    row = {"type": "expense", "amount_cents": 1250, "category": "Food & Dining",
+           "description": "Benchmark", "date": end, "created_at": end}
+    counter = iter(range(10 ** 9))
+
+    bench.measure("database", "Database()", lambda: Database(db.db_path), "sqlite")
+    bench.measure("database", "get_all_transactions", db.get_all_transactions, "sqlite")
+    bench.measure("database", "get_transaction_by_id", lambda i: db.get_transaction_by_id(i), "sqlite",
+                  setup=lambda: next(ids, "missing"))
+    bench.measure("database", "add_transaction",
+                  lambda i: db.add_transaction({**row, "id": f"bench-{i}"}), "sqlite", setup=lambda: next(counter))
+    bench.measure("database", "update_transaction",
+                  lambda i: db.update_transaction(i, {"amount_cents": 1100}), "sqlite", setup=lambda: next(ids, "missing"))
+    bench.measure("database", "delete_transaction", lambda i: db.delete_transaction(i), "sqlite",
+                  setup=lambda: next(ids, "missing"))
+    bench.measure("database", "iter_transactions (first 500)",
+                  lambda: sum(1 for _, _ in zip(range(500), db.iter_transactions())), "sqlite")
+    bench.measure("database", "get_all_categories", db.get_all_categories, "sqlite")
+    bench.measure("database", "add_category + delete_category",
+                  lambda i: (db.add_category({"id": f"c{i}", "name": f"Bench {i}", "type": "expense", "color": "#000"}),
+                             db.delete_category(f"c{i}")), "sqlite", setup=lambda: next(counter))
+    bench.measure("database", "get_transactions_by_date_range (1y)",
+                  lambda: db.get_transactions_by_date_range(start, end), "sqlite")
+
+    # The same aggregations on both backends
+    data = app_module.load_data()
+    transactions = data["transactions"]
+    bench.measure("aggregate", "summary", db.get_summary, "sqlite")
+    bench.measure("aggregate", "summary", lambda: app_module.calculate_summary(transactions), "json")
+    bench.measure("aggregate", "category_breakdown", db.get_category_breakdown, "sqlite")
+    bench.measure("aggregate", "category_breakdown", lambda: app_module.get_category_breakdown(transactions), "json")
+    bench.measure("aggregate", "monthly_data", db.get_monthly_data, "sqlite")
+    bench.measure("aggregate", "weekly_data (1y)", lambda: db.get_period_totals('week', start, end), "sqlite")
+    bench.measure("aggregate", "monthly_data", lambda: app_module.get_monthly_data(transactions), "json")
+    bench.measure("storage", "load all transactions", db.get_all_transactions, "sqlite")
+    bench.measure("storage", "load all transactions", app_module.load_data, "json")
+    bench.measure("storage", "save all transactions", lambda: app_module.save_data(data), "json")
+
+
+def load_blockchain(chain_db: BlockchainDatabase, records: Dict[str, list]):
+    """Ingest synthetic on-chain records"""
+    t0 = time.perf_counter()
+    for receipt in records["nft_receipts"]:
+        chain_db.add_nft_receipt(receipt)
+    for tx in records["transactions"]:
+        chain_db.add_blockchain_transaction(tx)
+    for balance in records["token_balances"]:
+        chain_db.add_or_update_token_balance(balance)
+    print(f"  loaded {len(records['transactions'])} on-chain records in {time.perf_counter() - t0:.2f}s",
+          file=sys.stderr)
+
+
+def bench_blockchain(bench: Bench, chain_db: BlockchainDatabase, records: Dict[str, list]):
+    """Every BlockchainDatabase lookup"""
+
+    wallet = records["wallets"][0]
+    tx_hash = records["transactions"][-1].transaction_hash
+    token_id = records["nft_receipts"][-1].token_id if records["nft_receipts"] else "0"
+    prices = app_module.price_table
+    for symbol, price in (("ETH", 2500.0), ("USDC", 1.0), ("USDT", 1.0), ("DAI", 1.0)):
+        prices.set_price(symbol, price)
+
+    bench.measure("blockchain", "get_blockchain_transactions_by_address",
+                  lambda: chain_db.get_blockchain_transactions_by_address(wallet))
+    bench.measure("blockchain", "get_blockchain_transaction_by_hash",
+                  lambda: chain_db.get_blockchain_transaction_by_hash(tx_hash))
+    bench.measure("blockchain", "iter_blockchain_transactions_by_date (first 500)",
+                  lambda: sum(1 for _, _ in zip(range(500), chain_db.iter_blockchain_transactions_by_date())))
+    bench.measure("blockchain", "get_nft_receipts_by_owner", lambda: chain_db.get_nft_receipts_by_owner(wallet))
+    bench.measure("blockchain", "get_nft_receipt_by_token_id", lambda: chain_db.get_nft_receipt_by_token_id(token_id))
+    bench.measure("blockchain", "get_smart_contract_expenses_by_user",
+                  lambda: chain_db.get_smart_contract_expenses_by_user(wallet))
+    bench.measure("blockchain", "get_token_balances_by_wallet", lambda: chain_db.get_token_balances_by_wallet(wallet))
+    bench.measure("blockchain", "get_active_wallet_by_address", lambda: chain_db.get_active_wallet_by_address(wallet))
+    bench.measure("blockchain", "get_stats_for_address", lambda: chain_db.get_stats_for_address(wallet))
+    bench.measure("blockchain", "get_portfolio_valuation (all wallets)",
+                  lambda: chain_db.get_portfolio_valuation(prices))
+    bench.measure("blockchain", "gas.daily (all addresses)", lambda: chain_db.gas.daily())
+
+
+def compare(results: List[Dict], baseline_path: str, threshold: float) -> List[Dict]:
+    """Return results whose median regressed more than ``threshold`` vs the baseline"""
+    with open(baseline_path) as f:
+        baseline = {(r["group"], r["name"], r["backend"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for row in results:
+        base = baseline.get((row["group"], row["name"], row["backend"], row["size"]))
+        if base is None or base["median_ms"] <= 0:
+            continue
+        ratio = row["median_ms"] / base["median_ms"]
+        row["baseline_median_ms"] = base["median_ms"]
+        row["ratio"] = round(ratio, 3)
+        # Ignore sub-0.05ms noise
+        if ratio > 1 + threshold and row["median_ms"] - base["median_ms"] > 0.05:
+            regressions.append(row)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Expense Tracker backend benchmarks")
+    parser.add_argument("--size", type=int, default=10000, help="number of fiat transactions (10k-10M)")
+    parser.add_argument("--onchain", type=int, default=None, help="number of on-chain transactions (default size/10)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="minimum iterations per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per benchmark")
+    parser.add_argument("--only", choices=["routes", "database", "blockchain"], action="append",
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--output", help="write results JSON here (default stdout)")
+    parser.add_argument("--baseline", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown ratio")
+    args = parser.parse_args(argv)
+
+    generator = LedgerGenerator(args.size, seed=args.seed)
+    bench = Bench(args.size, args.repeat, args.min_time)
+    groups = args.only or ["routes", "database", "blockchain"]
+
+    with tempfile.TemporaryDirectory(prefix="expense-bench-") as workdir:
+        print(f"Benchmarking {args.size} transactions in {workdir}", file=sys.stderr)
+        records = generator.blockchain_records(args.onchain or max(1, args.size // 10))
+        # Routes read the app's global blockchain store
+        load_blockchain(app_module.blockchain_db, records)
+        db = Database(os.path.join(workdir, 'bench.db'))
+        generator.load_sqlite(db)
+        if "routes" in groups or "database" in groups:
+            # The aggregate comparisons read the JSON store written for the routes
+            bench_routes(bench, generator, workdir)
+        if "database" in groups:
+            bench_database(bench, generator, db)
+        if "blockchain" in groups:
+            bench_blockchain(bench, app_module.blockchain_db, records)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": args.size,
+        "seed": args.seed,
+        "results": bench.results,
+    }
+
+    status = 0
+    if args.baseline:
+        regressions = compare(bench.results, args.baseline, args.threshold)
+        report["regressions"] = regressions
+        for row in regressions:
+            print(f"REGRESSION {row['group']} {row['backend']} {row['name']}: "
+                  f"{row['baseline_median_ms']} -> {row['median_ms']} ms (x{row['ratio']})", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
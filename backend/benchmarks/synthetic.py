@@ -0,0 +1,227 @@
+"""
+Deterministic synthetic ledger generator
+Produces fiat transactions and on-chain records with realistic category,
+date and amount distributions for benchmarks and load tests
+"""
+
+import json
+import random
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+from app import DATA_SCHEMA_VERSION, DEFAULT_CATEGORIES
+from blockchain_models import BlockchainTransaction, NFTReceipt, TokenBalance
+from dates import month_key
+
+# (category, weight, log-normal mu, sigma) for expenses; income is handled
+# separately so salaries land on the first of the month.
+EXPENSE_PROFILE = [
+    ("Food & Dining", 30, 3.0, 0.7),
+    ("Transportation", 14, 3.2, 0.6),
+    ("Shopping", 14, 3.6, 0.9),
+    ("Bills & Utilities", 8, 4.6, 0.5),
+    ("Entertainment", 10, 3.2, 0.8),
+    ("Healthcare", 5, 3.8, 1.0),
+    ("Education", 3, 4.5, 0.9),
+    ("Other Expense", 16, 3.0, 1.1),
+]
+INCOME_PROFILE = [
+    ("Freelance", 50, 6.2, 0.8),
+    ("Investments", 35, 4.5, 1.0),
+    ("Other Income", 15, 4.0, 0.9),
+]
+DESCRIPTIONS = {
+    "Food & Dining": ["Grocery shopping", "Restaurant dinner", "Coffee", "Lunch", "Takeout"],
+    "Transportation": ["Gas refill", "Train ticket", "Ride share", "Parking", "Bus pass"],
+    "Shopping": ["New clothes", "Electronics", "Home goods", "Books", "Gifts"],
+    "Bills & Utilities": ["Electricity bill", "Water bill", "Internet", "Phone plan", "Rent"],
+    "Entertainment": ["Movie tickets", "Concert", "Streaming", "Games", "Museum"],
+    "Healthcare": ["Pharmacy", "Doctor visit", "Dentist", "Gym membership"],
+    "Education": ["Online course", "Textbooks", "Workshop"],
+    "Other Expense": ["Misc purchase", "Donation", "Service fee"],
+    "Salary": ["Monthly salary"],
+    "Freelance": ["Web project", "Design work", "Consulting"],
+    "Investments": ["Dividend payout", "Interest", "Capital gains"],
+    "Other Income": ["Refund", "Cashback", "Gift"],
+}
+MERCHANTS = ["Acme Market", "City Transit", "MegaMart", "Corner Cafe", "PowerCo",
+             "StreamFlix", "HealthPlus", "LearnHub", "FuelStop", "BookNook"]
+CHAINS = ["0x1", "0x89", "0x38"]
+TOKENS = [("ETH", "0x0000000000000000000000000000000000000000", 18),
+          ("USDC", "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48", 6),
+          ("USDT", "0xdac17f958d2ee523a2206206994597c13d831ec7", 6),
+          ("DAI", "0x6b175474e89094c44da98b954eedeac495271d0f", 18)]
+
+
+class LedgerGenerator:
+    """Generates a reproducible synthetic ledger from a seed
+
+    Transactions are yielded in date order, so arbitrarily large ledgers
+    (10M rows) can be written out without being held in memory.
+    """
+
+    def __init__(self, size: int, seed: int = 42, start: date = date(2016, 1, 1),
+                 end: Optional[date] = None):
+        self.size = size
+        self.seed = seed
+        self.start = start
+        self.end = end or date.today()
+
+    def categories(self) -> List[Dict]:
+        return [dict(c) for c in DEFAULT_CATEGORIES]
+
+    def transactions(self) -> Iterator[Dict]:
+        """Yield ``size`` fiat transactions (amounts in cents), oldest first"""
+        rng = random.Random(self.seed)
+        days = max(1, (self.end - self.start).days)
+        months = max(1, days // 30)
+        # ~1 salary per month, 10% other income, the rest expenses
+        salaries = min(months, self.size // 10)
+        others = self.size - salaries
+        per_day = others / days
+
+        expense_weights = [w for _, w, _, _ in EXPENSE_PROFILE]
+        income_weights = [w for _, w, _, _ in INCOME_PROFILE]
+        salary_every = max(1, days // max(1, salaries))
+        emitted = 0
+        carry = 0.0
+
+        for offset in range(days):
+            day = self.start + timedelta(days=offset)
+            iso = day.isoformat()
+            ordinal = day.toordinal()
+            rows = []
+            if salaries and offset % salary_every == 0 and emitted < self.size:
+                rows.append(("income", "Salary", round(rng.lognormvariate(8.4, 0.15) * 100)))
+            carry += per_day
+            count, carry = int(carry), carry - int(carry)
+            for _ in range(count):
+                if rng.random() < 0.1:
+                    name, _, mu, sigma = rng.choices(INCOME_PROFILE, income_weights)[0]
+                    rows.append(("income", name, round(rng.lognormvariate(mu, sigma) * 100)))
+                else:
+                    name, _, mu, sigma = rng.choices(EXPENSE_PROFILE, expense_weights)[0]
+                    rows.append(("expense", name, round(rng.lognormvariate(mu, sigma) * 100)))
+
+            for kind, category, cents in rows:
+                if emitted >= self.size:
+                    return
+                emitted += 1
+                yield {
+                    "id": f"syn-{self.seed}-{emitted:09d}",
+                    "type": kind,
+                    "amount_cents": max(cents, 1),
+                    "category": category,
+                    "description": rng.choice(DESCRIPTIONS[category]),
+                    "date": iso,
+                    "day": ordinal,
+                    "created_at": f"{iso}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+                    "merchant_name": rng.choice(MERCHANTS) if kind == "expense" else None,
+                }
+
+        # Top up on the last day if rounding left rows unassigned
+        while emitted < self.size:
+            emitted += 1
+            iso = self.end.isoformat()
+            yield {
+                "id": f"syn-{self.seed}-{emitted:09d}",
+                "type": "expense",
+                "amount_cents": max(1, round(rng.lognormvariate(3.0, 0.7) * 100)),
+                "category": "Other Expense",
+                "description": "Misc purchase",
+                "date": iso,
+                "day": self.end.toordinal(),
+                "created_at": f"{iso}T23:59:00",
+                "merchant_name": rng.choice(MERCHANTS),
+            }
+
+    def write_json(self, path: str):
+        """Write a data.json compatible file, streaming transactions to disk"""
+        categories = [{**c, "version": self.size + i + 1} for i, c in enumerate(self.categories())]
+        with open(path, 'w') as f:
+            f.write(f'{{"schema_version": {DATA_SCHEMA_VERSION}, "categories": ')
+            json.dump(categories, f)
+            f.write(', "transactions": [')
+            for i, t in enumerate(self.transactions()):
+                if i:
+                    f.write(', ')
+                json.dump({**t, "version": i + 1}, f)
+            f.write('], "sync": ')
+            json.dump({"version": self.size + len(categories), "purged_through": 0, "tombstones": []}, f)
+            f.write('}')
+
+    def load_sqlite(self, database, batch_size: int = 10000):
+        """Bulk load transactions into a Database"""
+        columns = ("id", "type", "amount_cents", "description", "date", "created_at",
+                   "merchant_name", "day")
+        sql = (f"INSERT INTO transactions ({', '.join(columns)}, category_key, month_key, version) "
+               f"VALUES ({', '.join('?' for _ in columns)}, ?, ?, "
+               f"(SELECT version FROM sync_state WHERE id = 1) + ?)")
+        batch = []
+        with database.get_connection() as conn:
+            keys = dict(conn.execute('SELECT name, key FROM categories').fetchall())
+            for i, t in enumerate(self.transactions(), 1):
+                batch.append(tuple(t[c] for c in columns) + (keys[t["category"]], month_key(t["day"]), i))
+                if len(batch) >= batch_size:
+                    conn.executemany(sql, batch)
+                    batch.clear()
+            if batch:
+                conn.executemany(sql, batch)
+            conn.execute('UPDATE sync_state SET version = version + ? WHERE id = 1', (self.size,))
+
+    def addresses(self, count: int) -> List[str]:
+        rng = random.Random(self.seed + 1)
+        return ["0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40)) for _ in range(count)]
+
+    def blockchain_records(self, tx_count: int, wallet_count: int = 100) -> Dict[str, list]:
+        """Generate on-chain transactions, NFT receipts and token balances"""
+        rng = random.Random(self.seed + 2)
+        wallets = self.addresses(wallet_count)
+        start = datetime(self.start.year, self.start.month, self.start.day, tzinfo=timezone.utc).timestamp()
+        span = max(1, (self.end - self.start).days) * 86400
+        expense_names = [name for name, _, _, _ in EXPENSE_PROFILE]
+
+        receipts, transactions, balances = [], [], []
+        for i in range(tx_count):
+            sender, receiver = rng.sample(wallets, 2)
+            symbol, _, _ = rng.choice(TOKENS)
+            chain = rng.choice(CHAINS)
+            receipt_id = None
+            if rng.random() < 0.05:
+                receipt = NFTReceipt(
+                    token_id=str(i), contract_address=wallets[0], owner_address=sender,
+                    transaction_hash=f"0x{i:064x}", amount=0.0, category=rng.choice(expense_names),
+                    description="Receipt", merchant=rng.choice(MERCHANTS),
+                    minted_at=datetime.now().isoformat(), chain_id=chain,
+                )
+                receipts.append(receipt)
+                receipt_id = receipt.id
+            gas_used = rng.randint(21000, 250000)
+            gwei = rng.uniform(5, 80)
+            transactions.append(BlockchainTransaction(
+                transaction_hash=f"0x{i:064x}",
+                from_address=sender,
+                to_address=receiver,
+                amount=round(rng.lognormvariate(2.0, 1.2), 6),
+                token_symbol=symbol,
+                chain_id=chain,
+                timestamp=str(int(start + rng.random() * span)),
+                status="confirmed",
+                gas_used=str(gas_used),
+                gas_fee=f"{gas_used * gwei / 1e9:.12f}",
+                block_number=rng.randint(1, 20_000_000),
+                category=rng.choice(expense_names),
+                nft_receipt_id=receipt_id,
+            ))
+
+        for wallet in wallets:
+            for chain in CHAINS:
+                for symbol, address, decimals in TOKENS:
+                    balances.append(TokenBalance(
+                        wallet_address=wallet, token_symbol=symbol, token_name=symbol,
+                        token_address=address, balance=f"{rng.lognormvariate(3, 2):.6f}",
+                        decimals=decimals, chain_id=chain,
+                    ))
+
+        return {"transactions": transactions, "nft_receipts": receipts,
+                "token_balances": balances, "wallets": wallets}
@@ -3,16 +3,17 @@ Blockchain database operations
 Handles storage and retrieval of blockchain-related data
 """
 
-from typing import List, Optional, Dict
-from datetime import datetime
-import json
-from .blockchain_models import (
+from typing import List, Optional, Dict, Iterator, Tuple
+import bisect
+from blockchain_models import (
     BlockchainTransaction,
     WalletConnection,
     NFTReceipt,
     SmartContractExpense,
     TokenBalance
 )
+from gas_analytics import GasRollups, timestamp_to_day
+from portfolio import PortfolioBook, PriceTable
 
 
 class BlockchainDatabase:
@@ -24,13 +25,40 @@ class BlockchainDatabase:
         self.nft_receipts: List[NFTReceipt] = []
         self.smart_contract_expenses: List[SmartContractExpense] = []
         self.token_balances: List[TokenBalance] = []
+        self.portfolio = PortfolioBook()
+        self.gas = GasRollups()
+        self._token_balance_positions: Dict[tuple, int] = {}
+        # (day, id) keys kept sorted so the ledger can stream by date
+        self._transactions_by_date: List[Tuple[str, str]] = []
+        self._transactions_by_id: Dict[str, BlockchainTransaction] = {}
+        self._nft_receipts_by_id: Dict[str, NFTReceipt] = {}
+        self._nft_receipts_by_token_id: Dict[str, NFTReceipt] = {}
     
     # Blockchain Transaction Operations
     def add_blockchain_transaction(self, transaction: BlockchainTransaction) -> BlockchainTransaction:
         """Add a new blockchain transaction"""
         self.blockchain_transactions.append(transaction)
+        self.gas.add(transaction)
+        bisect.insort(self._transactions_by_date, (timestamp_to_day(transaction.timestamp), transaction.id))
+        self._transactions_by_id[transaction.id] = transaction
         return transaction
     
+    def iter_blockchain_transactions_by_date(self, before: Optional[Tuple[str, str]] = None,
+                                             address: Optional[str] = None) -> Iterator[BlockchainTransaction]:
+        """Stream transactions newest first as ``(day, id)`` descending
+        
+        ``before`` is an optional ``(day, id)`` cursor; only transactions
+        strictly before it are returned.
+        """
+        end = len(self._transactions_by_date)
+        if before is not None:
+            end = bisect.bisect_left(self._transactions_by_date, tuple(before))
+        address = address.lower() if address else None
+        for i in range(end - 1, -1, -1):
+            tx = self._transactions_by_id[self._transactions_by_date[i][1]]
+            if address is None or address in (tx.from_address.lower(), tx.to_address.lower()):
+                yield tx
+    
     def get_blockchain_transactions_by_address(self, address: str) -> List[BlockchainTransaction]:
         """Get all transactions for a specific address"""
         return [
@@ -75,8 +103,14 @@ class BlockchainDatabase:
     def add_nft_receipt(self, receipt: NFTReceipt) -> NFTReceipt:
         """Add new NFT receipt"""
         self.nft_receipts.append(receipt)
+        self._nft_receipts_by_id[receipt.id] = receipt
+        self._nft_receipts_by_token_id[receipt.token_id] = receipt
         return receipt
     
+    def get_nft_receipt_by_id(self, receipt_id: str) -> Optional[NFTReceipt]:
+        """Get NFT receipt by its record ID"""
+        return self._nft_receipts_by_id.get(receipt_id)
+    
     def get_nft_receipts_by_owner(self, owner_address: str) -> List[NFTReceipt]:
         """Get all NFT receipts for an owner"""
         return [
@@ -86,10 +120,7 @@ class BlockchainDatabase:
     
     def get_nft_receipt_by_token_id(self, token_id: str) -> Optional[NFTReceipt]:
         """Get NFT receipt by token ID"""
-        for receipt in self.nft_receipts:
-            if receipt.token_id == token_id:
-                return receipt
-        return None
+        return self._nft_receipts_by_token_id.get(token_id)
     
     # Smart Contract Expense Operations
     def add_smart_contract_expense(self, expense: SmartContractExpense) -> SmartContractExpense:
@@ -107,17 +138,16 @@ class BlockchainDatabase:
     # Token Balance Operations
     def add_or_update_token_balance(self, balance: TokenBalance) -> TokenBalance:
         """Add or update token balance"""
-        # Remove existing balance for same wallet/token/chain
-        self.token_balances = [
-            b for b in self.token_balances
-            if not (
-                b.wallet_address.lower() == balance.wallet_address.lower() and
-                b.token_address.lower() == balance.token_address.lower() and
-                b.chain_id == balance.chain_id
-            )
-        ]
+        # Replace existing balance for same wallet/token/chain in place
+        key = (balance.wallet_address.lower(), balance.token_address.lower(), balance.chain_id)
+        position = self._token_balance_positions.get(key)
+        if position is None:
+            self._token_balance_positions[key] = len(self.token_balances)
+            self.token_balances.append(balance)
+        else:
+            self.token_balances[position] = balance
         
-        self.token_balances.append(balance)
+        self.portfolio.add_balance(balance)
         return balance
     
     def get_token_balances_by_wallet(self, wallet_address: str, chain_id: Optional[str] = None) -> List[TokenBalance]:
@@ -132,6 +162,11 @@ class BlockchainDatabase:
         
         return balances
     
+    def get_portfolio_valuation(self, prices: PriceTable, wallets: Optional[List[str]] = None,
+                                chain_id: Optional[str] = None) -> Dict:
+        """Value token balances for the given wallets (or all wallets) in USD"""
+        return self.portfolio.value(prices, wallets=wallets, chain_id=chain_id)
+    
     # Utility Methods
     def get_stats_for_address(self, address: str) -> Dict:
         """Get comprehensive stats for an address"""
@@ -5,9 +5,12 @@ Extends the existing models with blockchain/Web3 support
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, Dict
 import uuid
 
+from gas_analytics import parse_gas_fee, parse_gas_used
+from portfolio import parse_units
+
 
 @dataclass
 class BlockchainTransaction:
@@ -28,6 +31,13 @@ class BlockchainTransaction:
     description: Optional[str] = None
     nft_receipt_id: Optional[str] = None
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    gas_used_units: int = field(init=False, repr=False)
+    gas_fee_wei: int = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        """Parse gas strings into exact integers once at ingest"""
+        self.gas_used_units = parse_gas_used(self.gas_used)
+        self.gas_fee_wei = parse_gas_fee(self.gas_fee)
     
     def to_dict(self) -> Dict:
         """Convert to dictionary"""
@@ -43,6 +53,7 @@ class BlockchainTransaction:
             "status": self.status,
             "gas_used": self.gas_used,
             "gas_fee": self.gas_fee,
+            "gas_fee_wei": str(self.gas_fee_wei),
             "block_number": self.block_number,
             "transaction_type": self.transaction_type,
             "category": self.category,
@@ -158,6 +169,11 @@ class TokenBalance:
     value_usd: Optional[float] = None
     last_updated: str = field(default_factory=lambda: datetime.now().isoformat())
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    balance_units: int = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        """Parse the balance string into integer base units once"""
+        self.balance_units = parse_units(self.balance, self.decimals)
     
     def to_dict(self) -> Dict:
         """Convert to dictionary"""
@@ -0,0 +1,236 @@
+"""
+Budget engine for Expense Tracker
+Per-category and overall budgets with spend-to-date counters maintained on
+every transaction write, plus threshold-crossing alerts
+"""
+
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from dates import month_key, period_label, to_day, week_key
+from fx import fx_table
+from money import from_cents, to_cents
+
+BUDGET_PERIODS = ('monthly', 'weekly', 'custom')
+DEFAULT_THRESHOLDS = [0.8, 1.0]
+
+
+def budget_from_api(body: Dict, existing: Optional[Dict] = None) -> Dict:
+    """Validate an API budget (decimal amount) and convert it to its stored shape"""
+    merged = {**(existing or {}), **body}
+
+    period = merged.get('period', 'monthly')
+    if period not in BUDGET_PERIODS:
+        raise ValueError(f"Period must be one of {', '.join(BUDGET_PERIODS)}")
+
+    if 'amount' in merged:
+        try:
+            amount_cents = to_cents(merged['amount'])
+        except (ValueError, TypeError):
+            raise ValueError("Amount must be a positive number")
+    elif isinstance(merged.get('amount_cents'), int):
+        amount_cents = merged['amount_cents']
+    else:
+        raise ValueError("Missing required field: amount")
+    if amount_cents <= 0:
+        raise ValueError("Amount must be a positive number")
+
+    start_date = end_date = None
+    if period == 'custom':
+        start_date, end_date = merged.get('start_date'), merged.get('end_date')
+        if not start_date or not end_date:
+            raise ValueError("Custom budgets need start_date and end_date")
+        if to_day(start_date) > to_day(end_date):
+            raise ValueError("start_date must not be after end_date")
+
+    thresholds = merged.get('thresholds')
+    if thresholds is None or thresholds == []:
+        thresholds = DEFAULT_THRESHOLDS
+    if not isinstance(thresholds, list) or not all(
+            isinstance(t, (int, float)) and not isinstance(t, bool) and 0 < t <= 1 for t in thresholds):
+        raise ValueError("Thresholds must be a list of fractions of the amount, each in (0, 1]")
+
+    return {
+        "id": merged.get('id') or str(uuid.uuid4()),
+        "name": merged.get('name') or (merged.get('category') or 'Overall'),
+        "category": merged.get('category') or None,
+        "period": period,
+        "amount_cents": amount_cents,
+        "start_date": start_date,
+        "end_date": end_date,
+        "thresholds": sorted(set(thresholds)),
+        "created_at": merged.get('created_at') or datetime.now().isoformat(),
+    }
+
+
+def budget_to_api(budget: Dict) -> Dict:
+    """Convert a stored budget (integer cents) into its API shape"""
+    return {('amount' if k == 'amount_cents' else k): (from_cents(v) if k == 'amount_cents' else v)
+            for k, v in budget.items()}
+
+
+class BudgetEngine:
+    """Spend-to-date counters per ``(budget, period)`` in integer cents
+
+    Budgets are indexed by category, so a transaction write touches only
+    the budgets it counts towards and reading a budget's status is a dict
+    lookup. Like the time-series rollups, the counters are tagged with the
+    data file fingerprint and rebuilt in one pass when it moves under them.
+    Budgets and spend are in the base currency. Threshold crossings are
+    returned to the writer, which publishes them on the shared change feed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._budgets: Dict[str, Dict] = {}
+        self._by_category: Dict[Optional[str], List[str]] = {}
+        self._windows: Dict[str, tuple] = {}
+        self._spent: Dict[tuple, int] = {}
+        self._stamp = None
+        self.rebuilds = 0
+
+    def _period_key(self, budget: Dict, day: int) -> Optional[int]:
+        if budget['period'] == 'monthly':
+            return month_key(day)
+        if budget['period'] == 'weekly':
+            return week_key(day)
+        start_day, end_day = self._windows[budget['id']]
+        return 0 if start_day <= day <= end_day else None
+
+    def _period_label(self, budget: Dict, key: int) -> str:
+        if budget['period'] == 'monthly':
+            return period_label('month', key)
+        if budget['period'] == 'weekly':
+            return period_label('week', key)
+        return f"{budget['start_date']}..{budget['end_date']}"
+
+    def _apply(self, t: Dict, sign: int, today: Optional[int] = None, amount: Optional[int] = None,
+               alerts: Optional[List[Dict]] = None):
+        if t['type'] != 'expense':
+            return
+        if amount is None:
+            amount = fx_table.convert_one(t['amount_cents'], t.get('currency', fx_table.base),
+                                          t['day'], fx_table.base)
+        amount *= sign
+        for category in (None, t['category']):
+            for budget_id in self._by_category.get(category, ()):
+                budget = self._budgets[budget_id]
+                key = self._period_key(budget, t['day'])
+                if key is None:
+                    continue
+                spent_before = self._spent.get((budget_id, key), 0)
+                self._spent[(budget_id, key)] = spent_before + amount
+                if today is not None and self._period_key(budget, today) == key:
+                    alerts.extend(self._crossings(budget, key, spent_before, spent_before + amount))
+
+    def _crossings(self, budget: Dict, key: int, spent_before: int, spent_after: int) -> List[Dict]:
+        limit = budget['amount_cents']
+        crossings = []
+        for threshold in budget['thresholds']:
+            mark = limit * threshold
+            if spent_before < mark <= spent_after:
+                crossings.append({
+                    "budget_id": budget['id'],
+                    "budget_name": budget['name'],
+                    "category": budget['category'],
+                    "threshold": threshold,
+                    "period": self._period_label(budget, key),
+                    "spent": from_cents(spent_after),
+                    "limit": from_cents(limit),
+                    "created_at": datetime.now().isoformat(),
+                })
+        return crossings
+
+    def rebuild(self, budgets: Iterable[Dict], transactions: List[Dict], stamp):
+        """Index the budgets and recount spend from every transaction"""
+        amounts = fx_table.converted(None, transactions, fx_table.base)
+        if amounts is None:
+            amounts = [t['amount_cents'] for t in transactions]
+        with self._lock:
+            self._budgets = {b['id']: b for b in budgets}
+            self._by_category = {}
+            self._windows = {}
+            for budget in self._budgets.values():
+                self._by_category.setdefault(budget['category'], []).append(budget['id'])
+                if budget['period'] == 'custom':
+                    self._windows[budget['id']] = (to_day(budget['start_date']), to_day(budget['end_date']))
+            self._spent = {}
+            for t, amount in zip(transactions, amounts):
+                self._apply(t, 1, amount=amount)
+            self._stamp = stamp
+            self.rebuilds += 1
+
+    def ensure(self, stamp, load_data):
+        """Rebuild from ``load_data()`` unless already at ``stamp``"""
+        if stamp is None or stamp != self._stamp:
+            data = load_data()
+            self.rebuild(data.get('budgets', []), data['transactions'], stamp)
+
+    def apply_changes(self, before, after, removed: Iterable[Dict] = (),
+                      added: Iterable[Dict] = ()) -> List[Dict]:
+        """Move the counters from fingerprint ``before`` to ``after`` by a delta
+
+        Returns an alert for every threshold this delta crossed in a
+        budget's current period.
+        """
+        with self._lock:
+            if before is None or self._stamp != before:
+                self._stamp = None
+                return []
+            alerts: List[Dict] = []
+            today = datetime.now().toordinal()
+            for t in removed:
+                self._apply(t, -1, today, alerts=alerts)
+            for t in added:
+                self._apply(t, 1, today, alerts=alerts)
+            self._stamp = after
+            return alerts
+
+    def reset(self):
+        """Drop the counters so the next read rebuilds them"""
+        with self._lock:
+            self._stamp = None
+
+    def status(self, budget_id: str, day: Optional[int] = None) -> Optional[Dict]:
+        """Spend against a budget for the period containing ``day`` (default today)"""
+        with self._lock:
+            budget = self._budgets.get(budget_id)
+            if budget is None:
+                return None
+            day = datetime.now().toordinal() if day is None else day
+            key = self._period_key(budget, day)
+            active = key is not None
+            if key is None:
+                key = 0
+            spent = self._spent.get((budget_id, key), 0)
+
+        limit = budget['amount_cents']
+        percent = round(spent * 100 / limit, 1)
+        crossed = [t for t in budget['thresholds'] if spent >= limit * t]
+        if spent >= limit:
+            state = 'exceeded'
+        elif crossed:
+            state = 'warning'
+        else:
+            state = 'ok'
+        return {
+            **budget_to_api(budget),
+            "period_label": self._period_label(budget, key),
+            "active": active,
+            "spent": from_cents(spent),
+            "remaining": from_cents(limit - spent),
+            "percent": percent,
+            "state": state,
+            "thresholds_crossed": crossed,
+        }
+
+    def statuses(self, day: Optional[int] = None) -> List[Dict]:
+        """Status of every budget for the period containing ``day``"""
+        return [self.status(budget_id, day) for budget_id in list(self._budgets)]
+
+
+
+# Global budget engine for the JSON store
+budget_engine = BudgetEngine()
@@ -0,0 +1,246 @@
+"""
+Auto-categorization for Expense Tracker
+Assigns categories to incoming transactions (bank sync batches) from an
+index of the user's own history, their keyword rules and built-in rules,
+and learns from the categories users correct
+"""
+
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from merchants import keyword_tokens, normalize_merchant
+
+# Built-in keyword rules, consulted after the user's rules and history
+DEFAULT_RULES = [
+    ("expense", "Food & Dining", ("grocery", "groceries", "supermarket", "restaurant", "cafe", "coffee",
+                                  "starbucks", "mcdonald's", "pizza", "burger", "bakery", "uber eats",
+                                  "doordash", "grubhub", "whole foods", "trader joe's")),
+    ("expense", "Transportation", ("uber", "lyft", "taxi", "parking", "transit", "metro", "fuel",
+                                   "shell", "chevron", "exxon", "gas station", "toll", "airline")),
+    ("expense", "Shopping", ("amazon", "walmart", "target", "ebay", "ikea", "costco", "best buy", "etsy")),
+    ("expense", "Bills & Utilities", ("electric", "electricity", "water", "internet", "utility", "comcast",
+                                      "verizon", "at&t", "t mobile", "rent", "insurance", "mortgage")),
+    ("expense", "Entertainment", ("netflix", "spotify", "hulu", "disney", "cinema", "theater", "steam",
+                                  "playstation", "xbox", "concert", "tickets")),
+    ("expense", "Healthcare", ("pharmacy", "cvs", "walgreens", "clinic", "hospital", "dental", "dentist",
+                               "doctor", "gym")),
+    ("expense", "Education", ("tuition", "course", "udemy", "coursera", "school", "university", "textbook")),
+    ("income", "Salary", ("payroll", "salary", "direct deposit", "wages")),
+    ("income", "Freelance", ("upwork", "fiverr", "invoice", "freelance")),
+    ("income", "Investments", ("dividend", "interest", "brokerage")),
+]
+FALLBACK_CATEGORIES = {"expense": "Other Expense", "income": "Other Income"}
+
+# Votes a row carries in the history index: rows the categorizer filled in
+# carry none (its own guesses must not reinforce themselves), corrections
+# of such rows carry the most
+SOURCE_WEIGHTS = {"auto": 0, "user": 3}
+
+# Share of a merchant's or keywords' history one category needs to be picked
+MIN_CONFIDENCE = 0.5
+
+
+def rule_from_api(body: Dict, existing: Optional[Dict] = None) -> Dict:
+    """Validate an API keyword rule"""
+    merged = {**(existing or {}), **body}
+    if not isinstance(merged.get('pattern'), str) or not keyword_tokens(merged['pattern']):
+        raise ValueError("Rule pattern must contain at least one word")
+    if not merged.get('category'):
+        raise ValueError("Missing required field: category")
+    if not isinstance(merged['category'], str):
+        raise ValueError("category must be a string")
+    if merged.get('type', 'expense') not in tuple(FALLBACK_CATEGORIES):
+        raise ValueError("Type must be 'income' or 'expense'")
+    return {
+        "id": merged.get('id') or str(uuid.uuid4()),
+        "pattern": merged['pattern'],
+        "category": merged['category'],
+        "type": merged.get('type', 'expense'),
+    }
+
+
+class PhraseIndex:
+    """Keyword phrases hashed by their first word; the longest match wins"""
+
+    def __init__(self):
+        self._by_first: Dict[Tuple[str, str], List[Tuple[Tuple[str, ...], str]]] = {}
+
+    def add(self, kind: str, phrase: str, category: str):
+        words = keyword_tokens(phrase)
+        if words:
+            entries = self._by_first.setdefault((kind, words[0]), [])
+            entries.append((words, category))
+            entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+
+    def match(self, kind: str, words: Tuple[str, ...]) -> Optional[str]:
+        best = None
+        for i, word in enumerate(words):
+            for phrase, category in self._by_first.get((kind, word), ()):
+                if words[i:i + len(phrase)] == phrase and (best is None or len(phrase) > len(best[0])):
+                    best = (phrase, category)
+                    break
+        return best[1] if best else None
+
+
+class Categorizer:
+    """Category votes per normalized merchant and per keyword, from history
+
+    Lookup order: the user's keyword rules, the merchant's history, the
+    history of the words in its merchant name and description, the
+    built-in rules, then the type's catch-all category. Decisions are
+    memoized per (type, merchant, description) until the index changes, so
+    a statement full of repeat merchants costs one lookup per merchant.
+    Like the budget counters, the index is tagged with the data file
+    fingerprint and moved across writes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._merchants: Dict[Tuple[str, str], Counter] = {}
+        self._keywords: Dict[Tuple[str, str], Counter] = {}
+        self._rules = PhraseIndex()
+        self._defaults = PhraseIndex()
+        for kind, category, phrases in DEFAULT_RULES:
+            for phrase in phrases:
+                self._defaults.add(kind, phrase, category)
+        self._memo: Dict[tuple, Dict] = {}
+        self._memo_known: Dict[str, Set[str]] = {}
+        self._stamp = None
+        self.rebuilds = 0
+        self.lookups = 0
+        self.memo_hits = 0
+
+    @staticmethod
+    def _words(t: Dict) -> Tuple[str, ...]:
+        return keyword_tokens(t.get('merchant_name')) + keyword_tokens(t.get('description'))
+
+    def _apply(self, t: Dict, sign: int):
+        weight = SOURCE_WEIGHTS.get(t.get('category_source'), 1) * sign
+        if not weight:
+            return
+        kind, category = t['type'], t['category']
+        merchant = normalize_merchant(t.get('merchant_name'))
+        if merchant is not None:
+            self._merchants.setdefault((kind, merchant), Counter())[category] += weight
+        for word in set(self._words(t)):
+            if len(word) > 2:
+                self._keywords.setdefault((kind, word), Counter())[category] += weight
+
+    def rebuild(self, rules: Iterable[Dict], transactions: List[Dict], stamp):
+        """Index the rules and every transaction's merchant and keywords"""
+        with self._lock:
+            self._rules = PhraseIndex()
+            for rule in rules:
+                self._rules.add(rule['type'], rule['pattern'], rule['category'])
+            self._merchants, self._keywords = {}, {}
+            for t in transactions:
+                self._apply(t, 1)
+            self._memo = {}
+            self._stamp = stamp
+            self.rebuilds += 1
+
+    def ensure(self, stamp, load_data):
+        """Rebuild from ``load_data()`` unless already at ``stamp``"""
+        if stamp is None or stamp != self._stamp:
+            data = load_data()
+            self.rebuild(data.get('categorization_rules', []), data['transactions'], stamp)
+
+    def apply_changes(self, before, after, removed: Iterable[Dict] = (), added: Iterable[Dict] = ()):
+        """Move the index from fingerprint ``before`` to ``after`` by a delta"""
+        with self._lock:
+            if before is None or self._stamp != before:
+                self._stamp = None
+                return
+            removed, added = list(removed), list(added)
+            for t in removed:
+                self._apply(t, -1)
+            for t in added:
+                self._apply(t, 1)
+            if removed or added:
+                self._memo = {}
+            self._stamp = after
+
+    def reset(self):
+        """Drop the index so the next use rebuilds it"""
+        with self._lock:
+            self._stamp = None
+
+    @staticmethod
+    def _best(votes: Counter, known: Set[str]) -> Optional[Tuple[str, float]]:
+        total = sum(v for v in votes.values() if v > 0)
+        for category, count in votes.most_common():
+            if count <= 0 or total == 0:
+                return None
+            if category in known:
+                return category, count / total
+        return None
+
+    def _decide(self, kind: str, merchant_name: Optional[str], description: Optional[str], known: Set[str]) -> Dict:
+        words = keyword_tokens(merchant_name) + keyword_tokens(description)
+        category = self._rules.match(kind, words)
+        if category in known:
+            return {"category": category, "source": "rule", "confidence": 1.0}
+
+        merchant = normalize_merchant(merchant_name)
+        if merchant is not None and (kind, merchant) in self._merchants:
+            best = self._best(self._merchants[(kind, merchant)], known)
+            if best is not None and best[1] >= MIN_CONFIDENCE:
+                return {"category": best[0], "source": "merchant", "confidence": round(best[1], 3)}
+
+        # Every known word votes with its category distribution
+        scores: Counter = Counter()
+        voters = 0
+        for word in set(words):
+            votes = self._keywords.get((kind, word))
+            if votes is None:
+                continue
+            total = sum(v for v in votes.values() if v > 0)
+            if total:
+                voters += 1
+                for name, count in votes.items():
+                    if count > 0:
+                        scores[name] += count / total
+        if voters:
+            best = self._best(scores, known)
+            if best is not None and best[1] >= MIN_CONFIDENCE:
+                return {"category": best[0], "source": "keywords", "confidence": round(best[1], 3)}
+
+        category = self._defaults.match(kind, words)
+        if category in known:
+            return {"category": category, "source": "default_rule", "confidence": 0.5}
+        return {"category": FALLBACK_CATEGORIES[kind], "source": "fallback", "confidence": 0.0}
+
+    def categorize(self, rows: Iterable[Dict], categories: Iterable[Dict]) -> List[Dict]:
+        """Category decision (category, source, confidence) for each row
+
+        Only existing ``categories`` of the row's type are suggested, apart
+        from the catch-all.
+        """
+        known: Dict[str, Set[str]] = {kind: set() for kind in FALLBACK_CATEGORIES}
+        for c in categories:
+            known.setdefault(c.get('type'), set()).add(c['name'])
+        decisions = []
+        with self._lock:
+            if known != self._memo_known:
+                self._memo, self._memo_known = {}, known
+            for t in rows:
+                kind = t['type'] if isinstance(t.get('type'), str) and t['type'] in FALLBACK_CATEGORIES else 'expense'
+                key = (kind, t.get('merchant_name'), t.get('description'))
+                self.lookups += 1
+                decision = self._memo.get(key)
+                if decision is None:
+                    decision = self._memo[key] = self._decide(kind, key[1], key[2], known[kind])
+                else:
+                    self.memo_hits += 1
+                decisions.append(decision)
+        return decisions
+
+    def stats(self) -> Dict:
+        return {"merchants": len(self._merchants), "keywords": len(self._keywords), "rebuilds": self.rebuilds,
+                "lookups": self.lookups, "memo_hits": self.memo_hits}
+
+
+# Global categorizer for the JSON store
+categorizer = Categorizer()
@@ -0,0 +1,270 @@
+"""
+Change feed for Expense Tracker
+Every write publishes a compact event (the changed row plus the aggregate
+delta it causes) to a bounded on-disk log that all workers share, so open
+dashboards can follow changes over server-sent events
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dates import month_key, period_label
+from fx import fx_table
+from money import from_cents
+
+# Storage-only keys that never appear in API rows
+_INTERNAL_KEYS = ('day', 'month_key', 'category_key')
+
+
+def row_to_api(row: Dict) -> Dict:
+    """API shape of a stored transaction row from either store"""
+    api = {('amount' if k == 'amount_cents' else k): (from_cents(v) if k == 'amount_cents' else v)
+           for k, v in row.items() if k not in _INTERNAL_KEYS}
+    api.setdefault('currency', fx_table.base)
+    return api
+
+
+def aggregate_delta(removed: Iterable[Dict] = (), added: Iterable[Dict] = ()) -> Dict:
+    """Change to the summary, category and monthly aggregates, in the base currency"""
+    summary = {"income": 0, "expense": 0, "count": 0}
+    categories: Dict[str, Dict[str, int]] = {}
+    months: Dict[int, Dict[str, int]] = {}
+    for sign, rows in ((-1, removed), (1, added)):
+        for t in rows:
+            amount = sign * fx_table.convert_one(t['amount_cents'], t.get('currency', fx_table.base),
+                                                 t['day'], fx_table.base)
+            summary[t['type']] += amount
+            summary['count'] += sign
+            category = categories.setdefault(t['category'], {"income": 0, "expense": 0, "count": 0})
+            category[t['type']] += amount
+            category['count'] += sign
+            month = months.setdefault(month_key(t['day']), {"income": 0, "expense": 0})
+            month[t['type']] += amount
+
+    def money(totals):
+        return {k: (v if k == 'count' else from_cents(v)) for k, v in totals.items()}
+
+    return {
+        "currency": fx_table.base,
+        "summary": money(summary),
+        "categories": {name: money(totals) for name, totals in categories.items() if any(totals.values())},
+        "months": {period_label('month', key): money(totals)
+                   for key, totals in sorted(months.items()) if any(totals.values())},
+    }
+
+
+class FeedCursor:
+    """A reader's position in the change log
+
+    Tracks the byte offset it has read up to, so polling an idle feed is a
+    single ``stat``. When the log is compacted (a new inode, or a recycled
+    one whose bytes before the offset are no longer the line last read)
+    the cursor rescans it for events after the last id it delivered.
+    """
+
+    def __init__(self, feed: "ChangeFeed", last_id: int):
+        self.feed = feed
+        self.last_id = last_id
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._last_line = b''
+
+    def poll(self, limit: int = 500) -> List[Dict]:
+        """Events published since the last poll, oldest first
+
+        Starts with a ``reset`` event when events the reader has not seen
+        were compacted away, or the log was recreated behind its id,
+        meaning the client must refetch its state.
+        """
+        try:
+            stat = os.stat(self.feed.path)
+        except OSError:
+            return []
+        if stat.st_ino == self._inode and stat.st_size == self._offset:
+            return []
+
+        events = []
+        with open(self.feed.path, 'rb') as f:
+            if stat.st_ino != self._inode or not self._still_at_offset(f):
+                self._inode, self._offset, self._last_line = stat.st_ino, 0, b''
+                if self.last_id > self.feed.latest_id():
+                    self.last_id = 0
+                    return [self.feed.reset_event(0)]
+            f.seek(self._offset)
+            while len(events) < limit:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break
+                self._offset = f.tell()
+                self._last_line = line
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event['id'] <= self.last_id:
+                    continue
+                if self.last_id > 0 and event['id'] > self.last_id + 1:
+                    events.append(self.feed.reset_event(event['id'] - 1))
+                events.append(event)
+                self.last_id = event['id']
+        return events
+
+    def _still_at_offset(self, f) -> bool:
+        """Whether the line last read still ends at the offset, i.e. the log was only appended to"""
+        if self._offset < len(self._last_line):
+            return False
+        f.seek(self._offset - len(self._last_line))
+        return f.read(len(self._last_line)) == self._last_line
+
+
+class ChangeFeed:
+    """Append-only, size-bounded JSON-lines event log shared across workers
+
+    Publishers serialize on an ``flock`` of the log, take the next id from
+    its last line and append. Past ``max_bytes`` the log is compacted to
+    its newest half and atomically replaced; a publisher that opened the
+    replaced file notices once it holds the lock and reopens the log.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 4 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.published = 0
+        self.compactions = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @staticmethod
+    def _last_id(f) -> int:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        f.seek(max(0, size - 65536))
+        lines = f.read().splitlines()
+        for line in reversed(lines):
+            try:
+                return json.loads(line)['id']
+            except (ValueError, KeyError):
+                continue
+        return 0
+
+    def _compact(self, f):
+        f.seek(0)
+        lines = f.read().splitlines(keepends=True)
+        kept, size = [], 0
+        for line in reversed(lines):
+            size += len(line)
+            if size > self.max_bytes // 2:
+                break
+            kept.append(line)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as tmp:
+            tmp.writelines(reversed(kept))
+        os.replace(tmp_path, self.path)
+        self.compactions += 1
+
+    @contextmanager
+    def _locked(self):
+        """The log opened for appending under an exclusive ``flock``
+
+        Compaction replaces the log, so the file opened may already be an
+        orphan by the time the lock is granted; it is reopened until the
+        locked handle is the file at ``path``.
+        """
+        while True:
+            f = open(self.path, 'a+b')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    current = os.stat(self.path).st_ino
+                except FileNotFoundError:
+                    current = None
+                if os.fstat(f.fileno()).st_ino == current:
+                    try:
+                        yield f
+                    finally:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+                    return
+                fcntl.flock(f, fcntl.LOCK_UN)
+            finally:
+                f.close()
+
+    def publish(self, event_type: str, resource: str, data: Optional[Dict] = None,
+                delta: Optional[Dict] = None, store: str = 'json') -> int:
+        """Append an event and return its id"""
+        with self._lock, self._locked() as f:
+            event_id = self._last_id(f) + 1
+            event = {"id": event_id, "type": event_type, "resource": resource, "store": store,
+                     "data": data, "delta": delta, "at": datetime.now().isoformat()}
+            f.write(json.dumps(event, separators=(',', ':'), default=str).encode() + b'\n')
+            f.flush()
+            if f.tell() > self.max_bytes:
+                self._compact(f)
+        self.published += 1
+        return event_id
+
+    @staticmethod
+    def reset_event(event_id: int) -> Dict:
+        return {"id": event_id, "type": "reset", "resource": None, "data": None, "delta": None,
+                "at": datetime.now().isoformat()}
+
+    def latest_id(self) -> int:
+        """Id of the newest event in the log, 0 when there is none"""
+        try:
+            with open(self.path, 'rb') as f:
+                return self._last_id(f)
+        except OSError:
+            return 0
+
+    def read_since(self, last_id: int = 0, limit: int = 500) -> Tuple[List[Dict], bool]:
+        """Events after ``last_id`` and whether the reader has to refetch"""
+        events = FeedCursor(self, last_id).poll(limit)
+        reset = bool(events) and events[0]['type'] == 'reset'
+        return events, reset
+
+    def stream(self, last_id: int = 0, timeout: float = 300.0, poll_interval: float = 0.5,
+               heartbeat: float = 15.0) -> Iterator[str]:
+        """Server-sent events after ``last_id`` until ``timeout`` seconds pass
+
+        The stream ends on its own so a worker is never held indefinitely;
+        EventSource clients reconnect with ``Last-Event-ID`` and resume.
+        """
+        yield f"retry: {int(poll_interval * 2000)}\n\n"
+        cursor = FeedCursor(self, last_id)
+        deadline = time.monotonic() + timeout
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            events = cursor.poll()
+            for event in events:
+                yield self.format_sse(event)
+            if events:
+                last_sent = time.monotonic()
+                continue
+            if time.monotonic() - last_sent >= heartbeat:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(poll_interval)
+
+    @staticmethod
+    def format_sse(event: Dict) -> str:
+        name = event['type'] if event['resource'] is None else f"{event['resource']}.{event['type']}"
+        return f"id: {event['id']}\nevent: {name}\ndata: {json.dumps(event, default=str)}\n\n"
+
+    def stats(self) -> Dict:
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        return {"published": self.published, "compactions": self.compactions, "log_bytes": size}
+
+
+# Change log shared by all workers, backed by backend/changes.log by default
+change_feed = ChangeFeed(os.environ.get(
+    'CHANGE_FEED_FILE', os.path.join(os.path.dirname(__file__), 'changes.log')
+), max_bytes=int(os.environ.get('CHANGE_FEED_MAX_BYTES', 4 * 1024 * 1024)))
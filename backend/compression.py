@@ -0,0 +1,86 @@
+"""
+Response compression for Expense Tracker
+JSON responses above a size threshold are gzip-compressed for clients
+whose Accept-Encoding allows it
+"""
+
+import gzip
+import os
+import threading
+from typing import Dict
+
+from flask import Flask, request
+
+
+def accepts_gzip(header: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (``q=0`` refuses it)"""
+    allowed = None
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if coding not in ('gzip', '*'):
+            continue
+        quality = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        # An explicit gzip entry overrides the wildcard
+        if coding == 'gzip' or allowed is None:
+            allowed = quality > 0
+        if coding == 'gzip':
+            break
+    return bool(allowed)
+
+
+class ResponseCompressor:
+    """Compresses finished responses in an ``after_request`` hook
+
+    Streamed and file responses pass through untouched, as do bodies
+    smaller than ``min_bytes``, where gzip's overhead outweighs the saving.
+    """
+
+    def __init__(self, min_bytes: int = 1024, level: int = 6):
+        self.min_bytes = min_bytes
+        self.level = level
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def compress(self, response):
+        if (response.direct_passthrough or response.is_streamed or not 200 <= response.status_code < 300
+                or 'Content-Encoding' in response.headers):
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+        response.vary.add('Accept-Encoding')
+        if not accepts_gzip(request.headers.get('Accept-Encoding', '')):
+            return response
+        body = gzip.compress(data, compresslevel=self.level)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = 'gzip'
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+        return response
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"compressed": self.compressed, "bytes_in": self.bytes_in, "bytes_out": self.bytes_out}
+
+
+# Compressor for the API, tuned through COMPRESS_MIN_BYTES and COMPRESS_LEVEL
+compressor = ResponseCompressor(
+    min_bytes=int(os.environ.get('COMPRESS_MIN_BYTES', 1024)),
+    level=int(os.environ.get('COMPRESS_LEVEL', 6)),
+)
+
+
+def init_app(app: Flask):
+    """Install response compression"""
+    app.after_request(compressor.compress)
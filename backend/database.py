@@ -3,17 +3,77 @@ Database Handler for Expense Tracker
 Manages data persistence using SQLite with connection pooling
 """
 
+import logging
 import sqlite3
 import os
+import uuid
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterable, Iterator
 from contextlib import contextmanager
+from change_feed import aggregate_delta, change_feed, row_to_api
+from dates import month_key, period_label, to_day
+from fx import fx_table, normalize_currency
 from models import Transaction, Category, FinancialSummary
+from metrics import timed
+from migrations import migrate
+from money import savings_rate
+from response_cache import response_cache
+from sync import MAX_SYNC_LIMIT, changes_page
+
+logger = logging.getLogger(__name__)
+
+
+# SQL bucket expression per reporting granularity (see dates.period_key)
+PERIOD_BUCKETS = {
+    'day': 'day',
+    'week': '(day - 1) / 7',
+    'month': 'month_key',
+    'quarter': 'month_key / 3',
+    'year': 'month_key / 12',
+}
+
+
+# Transactions with their category's name and public id; rows store only
+# the integer ``category_key``
+TRANSACTION_SELECT = '''
+    SELECT t.*, c.name AS category, c.id AS category_id
+    FROM transactions t JOIN categories c ON c.key = t.category_key
+'''
+
+# SELECT expression per transaction field, for ``fields`` projections
+TRANSACTION_COLUMNS = {
+    **{name: f't.{name}' for name in (
+        'id', 'type', 'amount_cents', 'description', 'date', 'created_at', 'bank_account_id', 'payment_method',
+        'is_auto_sync', 'bank_transaction_id', 'merchant_name', 'location', 'currency', 'version', 'updated_at',
+    )},
+    'amount': 't.amount_cents',
+    'category': 'c.name AS category',
+    'category_id': 'c.id AS category_id',
+}
+
+# Category columns exposed by the API (the integer key stays internal)
+CATEGORY_COLUMNS = 'id, name, type, color, icon, version, updated_at'
+
+
+def transaction_select(fields: Optional[List[str]] = None) -> str:
+    """SELECT of just ``fields`` of each transaction; categories are joined only when asked for"""
+    if fields is None:
+        return TRANSACTION_SELECT
+    unknown = [f for f in fields if f not in TRANSACTION_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown transaction fields: {', '.join(unknown)}")
+    columns = ', '.join(dict.fromkeys(TRANSACTION_COLUMNS[f] for f in fields)) or 't.id'
+    if 'category' in fields or 'category_id' in fields:
+        return f'SELECT {columns} FROM transactions t JOIN categories c ON c.key = t.category_key'
+    return f'SELECT {columns} FROM transactions t'
 
 
 class Database:
     """SQLite database handler for expense tracker"""
     
+    # Database files whose schema this process has already verified
+    _migrated_paths = set()
+    
     def __init__(self, db_path: str = "expense_tracker.db"):
         self.db_path = os.path.join(os.path.dirname(__file__), db_path)
         self._init_database()
@@ -23,6 +83,7 @@ class Database:
         """Context manager for database connections"""
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys = ON')
         try:
             yield conn
             conn.commit()
@@ -32,120 +93,174 @@ class Database:
         finally:
             conn.close()
     
+    @timed('database.init_database')
     def _init_database(self):
-        """Initialize database tables and indexes"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Create transactions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id TEXT PRIMARY KEY,
-                    type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
-                    amount REAL NOT NULL CHECK(amount > 0),
-                    category TEXT NOT NULL,
-                    description TEXT,
-                    date TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                )
-            ''')
-            
-            # Create categories table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS categories (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL UNIQUE,
-                    type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
-                    color TEXT NOT NULL,
-                    icon TEXT DEFAULT 'circle'
-                )
-            ''')
-            
-            # Create indexes for faster queries
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_transactions_date 
-                ON transactions(date DESC)
-            ''')
-            
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_transactions_type 
-                ON transactions(type)
-            ''')
-            
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_transactions_category 
-                ON transactions(category)
-            ''')
-            
-            # Insert default categories if empty
-            cursor.execute('SELECT COUNT(*) FROM categories')
-            if cursor.fetchone()[0] == 0:
-                self._insert_default_categories(cursor)
-    
-    def _insert_default_categories(self, cursor):
-        """Insert default categories"""
-        default_categories = [
-            ("1", "Salary", "income", "#10b981", "wallet"),
-            ("2", "Freelance", "income", "#06b6d4", "laptop"),
-            ("3", "Investments", "income", "#8b5cf6", "trending-up"),
-            ("4", "Other Income", "income", "#f59e0b", "gift"),
-            ("5", "Food & Dining", "expense", "#ef4444", "utensils"),
-            ("6", "Transportation", "expense", "#f97316", "car"),
-            ("7", "Shopping", "expense", "#ec4899", "shopping-bag"),
-            ("8", "Bills & Utilities", "expense", "#6366f1", "file-text"),
-            ("9", "Entertainment", "expense", "#14b8a6", "film"),
-            ("10", "Healthcare", "expense", "#f43f5e", "heart-pulse"),
-            ("11", "Education", "expense", "#3b82f6", "book-open"),
-            ("12", "Other Expense", "expense", "#71717a", "package"),
-        ]
+        """Bring the schema up to date, skipping all DDL when it already is"""
+        if self.db_path in Database._migrated_paths:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+        Database._migrated_paths.add(self.db_path)
+    
+    @staticmethod
+    def _next_version(cursor) -> int:
+        """Advance the store-wide sync version inside the caller's write"""
+        cursor.execute('UPDATE sync_state SET version = version + 1 WHERE id = 1')
+        return cursor.execute('SELECT version FROM sync_state WHERE id = 1').fetchone()[0]
+    
+    @staticmethod
+    def _checked_currency(code) -> str:
+        """Normalized currency code, rejected up front when there are no FX rates for it"""
+        currency = normalize_currency(code)
+        if not fx_table.supports(currency):
+            raise ValueError(f"No FX rates for {currency}")
+        return currency
+    
+    @staticmethod
+    def _publish(event_type: str, resource: str, data: Optional[Dict] = None,
+                 removed: Iterable[Dict] = (), added: Iterable[Dict] = ()):
+        """Publish a committed write to the change feed
+        
+        The write has already happened, so a delta that cannot be computed or
+        a log that cannot be appended to is logged instead of raised.
+        """
+        try:
+            delta = aggregate_delta(removed, added) if removed or added else None
+            change_feed.publish(event_type, resource, data, delta, store='sqlite')
+        except (OSError, ValueError):
+            logger.exception("Could not publish %s %s to the change feed", resource, event_type)
+    
+    @staticmethod
+    def _clear_tombstone(cursor, resource: str, row_id: str):
+        cursor.execute('DELETE FROM tombstones WHERE resource = ? AND id = ?', (resource, row_id))
+    
+    @classmethod
+    def _tombstone(cls, cursor, resource: str, row_id: str):
+        cursor.execute('''
+            INSERT OR REPLACE INTO tombstones (resource, id, version, deleted_at) VALUES (?, ?, ?, ?)
+        ''', (resource, row_id, cls._next_version(cursor), datetime.now().isoformat()))
+    
+    @classmethod
+    def _category_key(cls, cursor, name: str, kind: str) -> int:
+        """Integer key of a category by name, creating the category if it is new"""
+        row = cursor.execute('SELECT key FROM categories WHERE name = ?', (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        cursor.execute('''
+            INSERT INTO categories (id, name, type, color, icon, version, updated_at)
+            VALUES (?, ?, ?, '#71717a', 'circle', ?, ?)
+        ''', (str(uuid.uuid4()), name, kind, cls._next_version(cursor), datetime.now().isoformat()))
+        return cursor.lastrowid
+    
+    @staticmethod
+    def _key_of(cursor, category_id: str) -> Optional[int]:
+        row = cursor.execute('SELECT key FROM categories WHERE id = ?', (category_id,)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _reassign(cursor, source_keys: List[int], target_key: int) -> int:
+        """Point every transaction in ``source_keys`` at ``target_key`` in one statement
         
-        cursor.executemany('''
-            INSERT INTO categories (id, name, type, color, icon)
-            VALUES (?, ?, ?, ?, ?)
-        ''', default_categories)
+        Moved rows get consecutive new sync versions, so clients pick them up.
+        """
+        placeholders = ', '.join('?' for _ in source_keys)
+        base = cursor.execute('SELECT version FROM sync_state WHERE id = 1').fetchone()[0]
+        cursor.execute(f'''
+            UPDATE transactions
+            SET category_key = ?, version = ? + ranked.n, updated_at = ?
+            FROM (
+                SELECT rowid AS rid, ROW_NUMBER() OVER (ORDER BY rowid) AS n
+                FROM transactions WHERE category_key IN ({placeholders})
+            ) AS ranked
+            WHERE transactions.rowid = ranked.rid
+        ''', (target_key, base, datetime.now().isoformat(), *source_keys))
+        moved = cursor.rowcount
+        cursor.execute('UPDATE sync_state SET version = version + ? WHERE id = 1', (moved,))
+        return moved
     
     # ============== TRANSACTION OPERATIONS ==============
     
-    def get_all_transactions(self) -> List[Dict]:
-        """Get all transactions sorted by date"""
+    @timed('database.get_all_transactions')
+    def get_all_transactions(self, fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get all transactions sorted by date, with only ``fields`` if given"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM transactions 
-                ORDER BY date DESC, created_at DESC
-            ''')
+            cursor.execute(f'{transaction_select(fields)} ORDER BY t.date DESC, t.created_at DESC')
             return [dict(row) for row in cursor.fetchall()]
     
+    @timed('database.get_transaction_by_id')
     def get_transaction_by_id(self, transaction_id: str) -> Optional[Dict]:
         """Get a single transaction by ID"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM transactions WHERE id = ?', (transaction_id,))
+            cursor.execute(f'{TRANSACTION_SELECT} WHERE t.id = ?', (transaction_id,))
             row = cursor.fetchone()
             return dict(row) if row else None
     
+    @timed('database.add_transaction')
     def add_transaction(self, transaction: Dict) -> Dict:
         """Add a new transaction"""
+        day = to_day(transaction['date'])
+        currency = self._checked_currency(transaction.get('currency', fx_table.base))
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            self._clear_tombstone(cursor, 'transaction', transaction['id'])
+            category_key = self._category_key(cursor, transaction['category'], transaction['type'])
             cursor.execute('''
-                INSERT INTO transactions (id, type, amount, category, description, date, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO transactions (
+                    id, type, amount_cents, category_key, description, date, created_at,
+                    bank_account_id, payment_method, is_auto_sync, bank_transaction_id,
+                    merchant_name, location, day, month_key, currency, version, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 transaction['id'],
                 transaction['type'],
-                transaction['amount'],
-                transaction['category'],
+                transaction['amount_cents'],
+                category_key,
                 transaction['description'],
                 transaction['date'],
-                transaction['created_at']
+                transaction['created_at'],
+                transaction.get('bank_account_id'),
+                transaction.get('payment_method'),
+                int(bool(transaction.get('is_auto_sync', False))),
+                transaction.get('bank_transaction_id'),
+                transaction.get('merchant_name'),
+                transaction.get('location'),
+                day,
+                month_key(day),
+                currency,
+                self._next_version(cursor),
+                datetime.now().isoformat()
             ))
-            return transaction
+        response_cache.invalidate('transactions')
+        stored = {**transaction, 'day': day, 'currency': currency}
+        self._publish('insert', 'transaction', row_to_api(stored), added=[stored])
+        return transaction
     
+    @timed('database.update_transaction')
     def update_transaction(self, transaction_id: str, updates: Dict) -> Optional[Dict]:
         """Update an existing transaction"""
+        if 'date' in updates:
+            day = to_day(updates['date'])
+            updates = {**updates, 'day': day, 'month_key': month_key(day)}
+        if 'currency' in updates:
+            updates = {**updates, 'currency': self._checked_currency(updates['currency'])}
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute(f'{TRANSACTION_SELECT} WHERE t.id = ?', (transaction_id,))
+            old = cursor.fetchone()
+            if old is None:
+                return None
+            if 'category' in updates:
+                updates = dict(updates)
+                updates['category_key'] = self._category_key(
+                    cursor, updates.pop('category'), updates.get('type', old['type']))
+            updates = {**updates, 'version': self._next_version(cursor),
+                       'updated_at': datetime.now().isoformat()}
             
             set_clause = ', '.join(f'{k} = ?' for k in updates.keys())
             values = list(updates.values()) + [transaction_id]
@@ -153,126 +268,324 @@ class Database:
             cursor.execute(f'''
                 UPDATE transactions SET {set_clause} WHERE id = ?
             ''', values)
-            
-            if cursor.rowcount > 0:
-                return self.get_transaction_by_id(transaction_id)
-            return None
+            updated = cursor.rowcount > 0
+        
+        if updated:
+            response_cache.invalidate('transactions')
+            new = self.get_transaction_by_id(transaction_id)
+            self._publish('update', 'transaction', row_to_api(new), removed=[dict(old)], added=[new])
+            return new
+        return None
     
+    @timed('database.delete_transaction')
     def delete_transaction(self, transaction_id: str) -> bool:
         """Delete a transaction"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute(f'{TRANSACTION_SELECT} WHERE t.id = ?', (transaction_id,))
+            old = cursor.fetchone()
             cursor.execute('DELETE FROM transactions WHERE id = ?', (transaction_id,))
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+            if deleted:
+                self._tombstone(cursor, 'transaction', transaction_id)
+        
+        if deleted:
+            response_cache.invalidate('transactions')
+            self._publish('delete', 'transaction', {"id": transaction_id}, removed=[dict(old)])
+        return deleted
+    
+    def iter_transactions(self, before: Optional[tuple] = None, batch_size: int = 500) -> Iterator[Dict]:
+        """Stream transactions newest first without loading the table
+        
+        ``before`` is an optional ``(date, id)`` cursor; only rows that sort
+        strictly after it in ``date DESC, id DESC`` order are returned.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if before is None:
+                cursor.execute(f'{TRANSACTION_SELECT} ORDER BY t.date DESC, t.id DESC')
+            else:
+                cursor.execute(f'''
+                    {TRANSACTION_SELECT}
+                    WHERE t.date < ? OR (t.date = ? AND t.id < ?)
+                    ORDER BY t.date DESC, t.id DESC
+                ''', (before[0], before[0], before[1]))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
     
     # ============== CATEGORY OPERATIONS ==============
     
+    @timed('database.get_all_categories')
     def get_all_categories(self) -> List[Dict]:
         """Get all categories"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM categories ORDER BY type, name')
+            cursor.execute(f'SELECT {CATEGORY_COLUMNS} FROM categories ORDER BY type, name')
             return [dict(row) for row in cursor.fetchall()]
     
+    @timed('database.add_category')
     def add_category(self, category: Dict) -> Dict:
         """Add a new category"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            self._clear_tombstone(cursor, 'category', category['id'])
             cursor.execute('''
-                INSERT INTO categories (id, name, type, color, icon)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO categories (id, name, type, color, icon, version, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 category['id'],
                 category['name'],
                 category['type'],
                 category['color'],
-                category.get('icon', 'circle')
+                category.get('icon', 'circle'),
+                self._next_version(cursor),
+                datetime.now().isoformat()
             ))
-            return category
+        response_cache.invalidate('categories')
+        self._publish('insert', 'category', category)
+        return category
     
-    def delete_category(self, category_id: str) -> bool:
-        """Delete a category"""
+    @timed('database.delete_category')
+    def delete_category(self, category_id: str, reassign_to: Optional[str] = None) -> bool:
+        """Delete a category, first moving its transactions to ``reassign_to``
+        
+        Raises ValueError if transactions still use the category and no
+        (existing, different) replacement is given.
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
-            return cursor.rowcount > 0
+            key = self._key_of(cursor, category_id)
+            if key is None:
+                return False
+            moved = 0
+            if reassign_to is not None:
+                target_key = self._key_of(cursor, reassign_to)
+                if target_key is None or target_key == key:
+                    raise ValueError(f"Cannot reassign transactions to category {reassign_to!r}")
+                moved = self._reassign(cursor, [key], target_key)
+            else:
+                used = cursor.execute('SELECT COUNT(*) FROM transactions WHERE category_key = ?',
+                                      (key,)).fetchone()[0]
+                if used:
+                    raise ValueError(f"Category is used by {used} transactions; reassign them first")
+            cursor.execute('DELETE FROM categories WHERE key = ?', (key,))
+            self._tombstone(cursor, 'category', category_id)
+        
+        response_cache.invalidate('transactions' if moved else 'categories', 'categories')
+        self._publish('delete', 'category', {"id": category_id, "reassigned_to": reassign_to, "moved": moved})
+        return True
     
-    # ============== REPORTING QUERIES ==============
+    @timed('database.rename_category')
+    def rename_category(self, category_id: str, name: str) -> Optional[Dict]:
+        """Rename a category with a single-row update
+        
+        Transactions reference the category by key and read its name through
+        a join, so none of them are rewritten; sync clients follow the rename
+        through the category row and the ``category_id`` on transactions.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                    UPDATE categories SET name = ?, version = ?, updated_at = ? WHERE id = ?
+                ''', (name, self._next_version(cursor), datetime.now().isoformat(), category_id))
+            except sqlite3.IntegrityError:
+                raise ValueError(f"A category named {name!r} already exists")
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return None
+            row = cursor.execute(f'SELECT {CATEGORY_COLUMNS} FROM categories WHERE id = ?',
+                                 (category_id,)).fetchone()
+        
+        category = dict(row)
+        response_cache.invalidate('transactions', 'categories')
+        self._publish('update', 'category', category)
+        return category
     
-    def get_transactions_by_date_range(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get transactions within a date range"""
+    @timed('database.merge_categories')
+    def merge_categories(self, source_ids: List[str], target_id: str) -> int:
+        """Move every transaction of ``source_ids`` into ``target_id`` and delete the sources
+        
+        One set-based UPDATE moves the transactions; returns how many moved.
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM transactions 
-                WHERE date >= ? AND date <= ?
-                ORDER BY date DESC
-            ''', (start_date, end_date))
-            return [dict(row) for row in cursor.fetchall()]
+            target_key = self._key_of(cursor, target_id)
+            if target_key is None:
+                raise ValueError(f"Unknown category: {target_id!r}")
+            source_keys = {}
+            for source_id in source_ids:
+                key = self._key_of(cursor, source_id)
+                if key is None:
+                    raise ValueError(f"Unknown category: {source_id!r}")
+                if key != target_key:
+                    source_keys[source_id] = key
+            if not source_keys:
+                return 0
+            moved = self._reassign(cursor, list(source_keys.values()), target_key)
+            cursor.execute(f"DELETE FROM categories WHERE key IN ({', '.join('?' for _ in source_keys)})",
+                           list(source_keys.values()))
+            for source_id in source_keys:
+                self._tombstone(cursor, 'category', source_id)
+        
+        response_cache.invalidate('transactions', 'categories')
+        self._publish('merge', 'category', {"source_ids": list(source_keys), "target_id": target_id,
+                                            "moved": moved})
+        return moved
+    
+    # ============== DELTA SYNC ==============
     
-    def get_summary(self) -> Dict:
-        """Get financial summary"""
+    @timed('database.get_changes_since')
+    def get_changes_since(self, since: int = 0, limit: int = 1000) -> Dict:
+        """Transactions, categories and tombstones written after version ``since``
+        
+        Each table is read through its version index, so the cost follows
+        the number of changes rather than the size of the ledger. Versions
+        are unique per write here, so reading one row past the limit from
+        each table is enough to merge them and tell whether more remain.
+        """
+        limit = max(1, min(limit, MAX_SYNC_LIMIT))
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            
+            version = cursor.execute('SELECT version FROM sync_state WHERE id = 1').fetchone()[0]
+            changed = []
+            cursor.execute(f'''
+                {TRANSACTION_SELECT} WHERE t.version > ? ORDER BY t.version LIMIT ?
+            ''', (since, limit + 1))
+            changed.extend(('transaction', row_to_api(dict(row))) for row in cursor.fetchall())
+            cursor.execute(f'''
+                SELECT {CATEGORY_COLUMNS} FROM categories WHERE version > ? ORDER BY version LIMIT ?
+            ''', (since, limit + 1))
+            changed.extend(('category', dict(row)) for row in cursor.fetchall())
             cursor.execute('''
-                SELECT 
-                    COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0) as total_income,
-                    COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0) as total_expenses,
-                    COUNT(*) as transaction_count
-                FROM transactions
-            ''')
-            
-            row = cursor.fetchone()
-            total_income = row['total_income']
-            total_expenses = row['total_expenses']
-            
-            return {
-                "total_income": total_income,
-                "total_expenses": total_expenses,
-                "balance": total_income - total_expenses,
-                "transaction_count": row['transaction_count'],
-                "savings_rate": round((total_income - total_expenses) / total_income * 100, 1) if total_income > 0 else 0
-            }
-    
-    def get_category_breakdown(self) -> Dict:
-        """Get breakdown by category"""
+                SELECT resource, id, version, deleted_at FROM tombstones
+                WHERE version > ? ORDER BY version LIMIT ?
+            ''', (since, limit + 1))
+            deleted = [dict(row) for row in cursor.fetchall()]
+        return changes_page(since, version, 0, changed, deleted, limit)
+    
+    # ============== REPORTING QUERIES ==============
+    
+    @timed('database.get_transactions_by_date_range')
+    def get_transactions_by_date_range(self, start_date: str, end_date: str,
+                                       fields: Optional[List[str]] = None) -> List[Dict]:
+        """Get transactions within a date range, with only ``fields`` if given"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT 
-                    category,
-                    SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) as income,
-                    SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) as expense,
-                    COUNT(*) as count
-                FROM transactions
-                GROUP BY category
-            ''')
-            
-            return {row['category']: {
-                "income": row['income'],
-                "expense": row['expense'],
-                "count": row['count']
-            } for row in cursor.fetchall()}
-    
-    def get_monthly_data(self) -> Dict:
-        """Get monthly income and expense totals"""
+            cursor.execute(f'''
+                {transaction_select(fields)}
+                WHERE t.day BETWEEN ? AND ?
+                ORDER BY t.day DESC
+            ''', (to_day(start_date), to_day(end_date)))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def _aggregate(self, group: Optional[str], currency: Optional[str], where: str = '', params=()) -> Dict:
+        """Income/expense/count per group in ``currency`` cents
+        
+        When every row is in the display currency (checked with two
+        index lookups) this is the plain single-pass SUM. Otherwise rows in
+        other currencies are summed per currency and day, and those partial
+        sums are converted in one vectorized pass.
+        """
+        currency = currency or fx_table.base
+        select_group = f"{group} as grp," if group else "0 as grp,"
+        group_by = "GROUP BY grp" if group else ""
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
+            lowest = cursor.execute('SELECT MIN(currency) FROM transactions').fetchone()[0]
+            highest = cursor.execute('SELECT MAX(currency) FROM transactions').fetchone()[0]
+            mixed = lowest is not None and not (lowest == highest == currency)
+            same_currency = "AND currency = ?" if mixed else ""
+            cursor.execute(f'''
                 SELECT 
-                    strftime('%Y-%m', date) as month,
-                    SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) as income,
-                    SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) as expense
+                    {select_group}
+                    COALESCE(SUM(CASE WHEN type = 'income' {same_currency} THEN amount_cents ELSE 0 END), 0) as income,
+                    COALESCE(SUM(CASE WHEN type = 'expense' {same_currency} THEN amount_cents ELSE 0 END), 0) as expense,
+                    COUNT(*) as count
                 FROM transactions
-                GROUP BY strftime('%Y-%m', date)
-                ORDER BY month
-            ''')
+                {where}
+                {group_by}
+            ''', ((currency, currency) if mixed else ()) + tuple(params))
+            totals = {row['grp']: {"income": row['income'], "expense": row['expense'], "count": row['count']}
+                      for row in cursor.fetchall()}
+            if not mixed:
+                return totals
             
-            return {row['month']: {
-                "income": row['income'],
-                "expense": row['expense']
-            } for row in cursor.fetchall()}
+            foreign_where = f"{where} AND currency != ?" if where else "WHERE currency != ?"
+            cursor.execute(f'''
+                SELECT {select_group} type, currency, day, SUM(amount_cents) as total
+                FROM transactions
+                {foreign_where}
+                GROUP BY grp, type, currency, day
+            ''', (*params, currency))
+            foreign = cursor.fetchall()
+        
+        converted = fx_table.convert([row['total'] for row in foreign], [row['currency'] for row in foreign],
+                                     [row['day'] for row in foreign], currency)
+        for row, amount in zip(foreign, converted.tolist()):
+            totals[row['grp']][row['type']] += amount
+        return totals
+    
+    @timed('database.get_summary')
+    def get_summary(self, currency: Optional[str] = None) -> Dict:
+        """Get financial summary (amounts in integer cents of ``currency``)"""
+        totals = self._aggregate(None, currency)[0]
+        total_income = totals['income']
+        total_expenses = totals['expense']
+        
+        return {
+            "total_income": total_income,
+            "total_expenses": total_expenses,
+            "balance": total_income - total_expenses,
+            "transaction_count": totals['count'],
+            "savings_rate": savings_rate(total_income, total_expenses)
+        }
+    
+    @timed('database.get_category_breakdown')
+    def get_category_breakdown(self, currency: Optional[str] = None) -> Dict:
+        """Get breakdown by category (amounts in integer cents of ``currency``)
+        
+        Groups on the integer ``category_key`` through its covering index and
+        only then maps the few keys to names.
+        """
+        totals = self._aggregate('category_key', currency)
+        with self.get_connection() as conn:
+            names = dict(conn.execute('SELECT key, name FROM categories').fetchall())
+        return {names[key]: totals[key] for key in totals}
+    
+    @timed('database.get_monthly_data')
+    def get_monthly_data(self, currency: Optional[str] = None) -> Dict:
+        """Get monthly income and expense totals (in integer cents of ``currency``)"""
+        return self.get_period_totals('month', currency=currency)
+    
+    @timed('database.get_period_totals')
+    def get_period_totals(self, granularity: str = 'month', start_date: Optional[str] = None,
+                          end_date: Optional[str] = None, currency: Optional[str] = None) -> Dict:
+        """Get income and expense totals per day, week, month, quarter or year (in integer cents)
+        
+        Buckets are integer expressions over the ``day`` and ``month_key``
+        columns, so the scan stays on a covering index.
+        """
+        if granularity not in PERIOD_BUCKETS:
+            raise ValueError(f"Unknown granularity: {granularity!r}")
+        conditions, params = [], []
+        if start_date:
+            conditions.append('day >= ?')
+            params.append(to_day(start_date))
+        if end_date:
+            conditions.append('day <= ?')
+            params.append(to_day(end_date))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        totals = self._aggregate(PERIOD_BUCKETS[granularity], currency, where, params)
+        return {period_label(granularity, period): {
+            "income": totals[period]['income'],
+            "expense": totals[period]['expense']
+        } for period in sorted(totals)}
 
 
 # Singleton instance
@@ -283,5 +596,5 @@ def get_database() -> Database:
     """Get or create database instance"""
     global _db_instance
     if _db_instance is None:
-        _db_instance = Database()
+        _db_instance = Database(os.environ.get('DATABASE_PATH', 'expense_tracker.db'))
     return _db_instance
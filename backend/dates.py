@@ -0,0 +1,66 @@
+"""
+Date helpers for Expense Tracker
+Dates are stored as integer day ordinals (``date.toordinal()``) so range
+filters and period grouping are integer arithmetic instead of string parsing
+"""
+
+from datetime import date
+from functools import lru_cache
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+
+
+def to_day(value: str) -> int:
+    """Convert an ISO ``YYYY-MM-DD`` date into its day ordinal"""
+    try:
+        return date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date: {value!r}, expected YYYY-MM-DD")
+
+
+def from_day(day: int) -> str:
+    """Convert a day ordinal back into an ISO date"""
+    return date.fromordinal(day).isoformat()
+
+
+@lru_cache(maxsize=65536)
+def month_key(day: int) -> int:
+    """Months since year 0 (``year * 12 + month - 1``) for a day ordinal"""
+    d = date.fromordinal(day)
+    return d.year * 12 + d.month - 1
+
+
+def week_key(day: int) -> int:
+    """Monday-based week number; ordinal 1 (0001-01-01) is a Monday"""
+    return (day - 1) // 7
+
+
+def period_key(granularity: str, day: int) -> int:
+    """Integer bucket of a day ordinal at the given granularity"""
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return week_key(day)
+    if granularity == 'month':
+        return month_key(day)
+    if granularity == 'quarter':
+        return month_key(day) // 3
+    if granularity == 'year':
+        return month_key(day) // 12
+    raise ValueError(f"Unknown granularity: {granularity!r}")
+
+
+def period_label(granularity: str, key: int) -> str:
+    """Display label of a period bucket: ISO day, week start, YYYY-MM, YYYY-Qn or YYYY"""
+    if granularity == 'day':
+        return from_day(key)
+    if granularity == 'week':
+        return from_day(key * 7 + 1)
+    if granularity == 'month':
+        return f"{key // 12:04d}-{key % 12 + 1:02d}"
+    if granularity == 'quarter':
+        return f"{key // 4:04d}-Q{key % 4 + 1}"
+    if granularity == 'year':
+        return f"{key:04d}"
+    raise ValueError(f"Unknown granularity: {granularity!r}")
+
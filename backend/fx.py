@@ -0,0 +1,196 @@
+"""
+Foreign exchange rates for Expense Tracker
+Daily FX rates against a base currency, cached in memory from a JSON file,
+with vectorized conversion of amounts in integer cents
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dates import to_day
+
+BASE_CURRENCY = os.environ.get('BASE_CURRENCY', 'USD').upper()
+
+
+def normalize_currency(code) -> str:
+    """Validate an ISO 4217 style currency code and upper-case it"""
+    if not isinstance(code, str) or len(code) != 3 or not code.isalpha():
+        raise ValueError(f"Invalid currency: {code!r}")
+    return code.upper()
+
+
+class FxTable:
+    """TTL-cached daily FX rates, optionally backed by a JSON file
+
+    The file holds ``{"base": "USD", "rates": {"EUR": {"2025-01-02": 0.92}}}``
+    where a rate is units of the currency per one unit of the base. A day
+    without a rate uses the latest earlier one (or the earliest known).
+    Rates are kept per currency as sorted NumPy arrays of day ordinals, so
+    converting a batch is one ``searchsorted`` per currency present.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: float = 300.0,
+                 base: str = BASE_CURRENCY,
+                 loader: Optional[Callable[[], Dict[str, Dict[str, float]]]] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.base = base
+        self._loader = loader
+        self._rates: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._loaded_at = 0.0
+        self._mtime: Optional[int] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._conversions: "OrderedDict[tuple, Optional[List[int]]]" = OrderedDict()
+
+    def _build(self, rates: Dict[str, Dict[str, float]]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        table = {}
+        for currency, series in rates.items():
+            if not series:
+                continue
+            points = sorted((to_day(d), float(r)) for d, r in series.items())
+            table[normalize_currency(currency)] = (
+                np.array([d for d, _ in points], dtype=np.int64),
+                np.array([r for _, r in points], dtype=np.float64),
+            )
+        return table
+
+    def _read_file(self) -> Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return self._rates
+        with open(self.path, 'r') as f:
+            payload = json.load(f)
+        self._mtime = mtime
+        return self._build(payload.get("rates", {}))
+
+    def refresh(self, force: bool = False) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Reload rates if the cached table is older than the TTL"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._loaded_at and now - self._loaded_at < self.ttl_seconds:
+                return self._rates
+            rates = self._build(self._loader()) if self._loader is not None else self._read_file()
+            if rates is not None and rates is not self._rates:
+                self._rates = rates
+                self._version = self._mtime if self._loader is None else self._version + 1
+                self._conversions.clear()
+            self._loaded_at = now
+            return self._rates
+
+    @property
+    def version(self):
+        """Changes whenever the rates do; the file mtime, so workers agree on it"""
+        self.refresh()
+        return self._version
+
+    def set_rate(self, currency: str, date: str, rate: float):
+        """Set a single rate in memory (does not touch the backing file)"""
+        currency = normalize_currency(currency)
+        day = to_day(date)
+        with self._lock:
+            days, rates = self._rates.get(currency, (np.empty(0, np.int64), np.empty(0, np.float64)))
+            index = int(np.searchsorted(days, day))
+            if index < len(days) and days[index] == day:
+                rates = rates.copy()
+                rates[index] = rate
+            else:
+                days, rates = np.insert(days, index, day), np.insert(rates, index, rate)
+            self._rates = {**self._rates, currency: (days, rates)}
+            self._version = (self._version or 0) + 1
+            self._conversions.clear()
+
+    def currencies(self) -> List[str]:
+        """Currencies amounts can be converted between"""
+        return sorted({self.base, *self.refresh()})
+
+    def supports(self, currency: str) -> bool:
+        return currency == self.base or currency in self.refresh()
+
+    def rates(self, currency: str, days: np.ndarray) -> np.ndarray:
+        """Units of ``currency`` per unit of the base currency on each day"""
+        if currency == self.base:
+            return np.ones(len(days))
+        table = self.refresh().get(currency)
+        if table is None:
+            raise ValueError(f"No FX rates for {currency}")
+        rate_days, rates = table
+        index = np.searchsorted(rate_days, days, side='right') - 1
+        return rates[np.clip(index, 0, len(rates) - 1)]
+
+    def convert(self, amounts, currencies, days, to_currency: str) -> np.ndarray:
+        """Convert integer cents from per-row currencies into ``to_currency`` cents"""
+        amounts = np.asarray(amounts, dtype=np.int64)
+        currencies = np.asarray(currencies, dtype=object)
+        days = np.asarray(days, dtype=np.int64)
+        result = amounts.astype(np.float64)
+        target = self.rates(to_currency, days) if to_currency != self.base else None
+        for currency in set(currencies.tolist()):
+            if currency == to_currency:
+                continue
+            mask = currencies == currency
+            values = result[mask] / self.rates(currency, days[mask])
+            if target is not None:
+                values *= target[mask]
+            result[mask] = values
+        return np.rint(result).astype(np.int64)
+
+    def convert_one(self, amount: int, currency: str, day: int, to_currency: str) -> int:
+        """Convert a single amount in cents; used for incremental updates"""
+        if currency == to_currency:
+            return amount
+        rates = self.refresh()
+
+        def rate(code):
+            if code == self.base:
+                return 1.0
+            if code not in rates:
+                raise ValueError(f"No FX rates for {code}")
+            rate_days, values = rates[code]
+            index = int(np.searchsorted(rate_days, day, side='right')) - 1
+            return float(values[max(0, index)])
+
+        return int(round(amount / rate(currency) * rate(to_currency)))
+
+    def converted(self, stamp, transactions: List[Dict], to_currency: str,
+                  max_entries: int = 8) -> Optional[List[int]]:
+        """Amounts of stored transactions in ``to_currency`` cents, aligned by index
+
+        Returns None when every row is already in ``to_currency`` so callers
+        can keep using ``amount_cents``. Results are cached per data
+        fingerprint, target currency and rates version.
+        """
+        key = (stamp, to_currency, self.version)
+        with self._lock:
+            if stamp is not None and key in self._conversions:
+                self._conversions.move_to_end(key)
+                return self._conversions[key]
+
+        currencies = [t.get('currency', self.base) for t in transactions]
+        if all(c == to_currency for c in currencies):
+            amounts = None
+        else:
+            amounts = self.convert([t['amount_cents'] for t in transactions], currencies,
+                                   [t['day'] for t in transactions], to_currency).tolist()
+
+        if stamp is not None:
+            with self._lock:
+                self._conversions[key] = amounts
+                while len(self._conversions) > max_entries:
+                    self._conversions.popitem(last=False)
+        return amounts
+
+
+# FX table shared by the API, backed by backend/fx_rates.json when present
+FX_RATES_FILE = os.environ.get(
+    'FX_RATES_FILE', os.path.join(os.path.dirname(__file__), 'fx_rates.json')
+)
+fx_table = FxTable(FX_RATES_FILE, ttl_seconds=float(os.environ.get('FX_RATES_TTL', 300)))
@@ -0,0 +1,184 @@
+"""
+Gas fee analytics for Expense Tracker
+Maintains incremental gas spend rollups by chain, day, category and address
+"""
+
+import heapq
+import itertools
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from portfolio import parse_units
+
+WEI_PER_ETH = 10 ** 18
+
+
+def parse_gas_used(gas_used: Optional[str]) -> int:
+    """Parse a gas used string (decimal or 0x-hex) into an integer"""
+    if gas_used is None or str(gas_used).strip() == "":
+        return 0
+    text = str(gas_used).strip()
+    try:
+        value = int(text, 16) if text.lower().startswith("0x") else Decimal(text)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid gas used: {gas_used!r}")
+    if isinstance(value, Decimal) and (not value.is_finite() or value != value.to_integral_value()):
+        raise ValueError(f"Invalid gas used: {gas_used!r}")
+    return int(value)
+
+
+def parse_gas_fee(gas_fee: Optional[str]) -> int:
+    """Parse an ether-denominated gas fee string into integer wei"""
+    if gas_fee is None or str(gas_fee).strip() == "":
+        return 0
+    return parse_units(gas_fee, 18)
+
+
+def timestamp_to_day(timestamp) -> str:
+    """Convert a unix (seconds) or ISO timestamp into a YYYY-MM-DD day"""
+    text = str(timestamp).strip()
+    try:
+        seconds = float(text)
+    except ValueError:
+        return text[:10]
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+def format_wei(wei: int) -> Dict:
+    """Serialize a wei amount without losing precision in JSON clients"""
+    return {"wei": str(wei), "eth": float(Decimal(wei) / WEI_PER_ETH)}
+
+
+class _GasTotals:
+    """Running gas totals for one rollup bucket"""
+
+    __slots__ = ("fee_wei", "gas_used", "count")
+
+    def __init__(self):
+        self.fee_wei = 0
+        self.gas_used = 0
+        self.count = 0
+
+    def add(self, fee_wei: int, gas_used: int):
+        self.fee_wei += fee_wei
+        self.gas_used += gas_used
+        self.count += 1
+
+    def merge(self, other: "_GasTotals"):
+        self.fee_wei += other.fee_wei
+        self.gas_used += other.gas_used
+        self.count += other.count
+
+    def to_dict(self) -> Dict:
+        return {
+            "gas_fee": format_wei(self.fee_wei),
+            "gas_used": self.gas_used,
+            "count": self.count,
+        }
+
+
+class GasRollups:
+    """Incremental gas spend rollups, updated once per ingested transaction
+
+    Gas is attributed to the paying (``from``) address. Daily and category
+    buckets are keyed by address and chain, so per-address queries touch
+    only that address's buckets and global queries merge buckets rather
+    than transactions. The most expensive transactions are ranked per
+    address, per chain and per address and chain, so a filtered query
+    still gets its full top ``top_n``.
+    """
+
+    def __init__(self, top_n: int = 50):
+        self.top_n = top_n
+        self._daily: Dict[Tuple[str, str, str], _GasTotals] = {}
+        self._category: Dict[Tuple[str, str, str], _GasTotals] = {}
+        self._address: Dict[str, _GasTotals] = {}
+        self._top: Dict[Tuple[Optional[str], Optional[str]], List[Tuple[int, int, object]]] = {}
+        self._seq = itertools.count()
+
+    @staticmethod
+    def _bucket(table: Dict, key) -> _GasTotals:
+        totals = table.get(key)
+        if totals is None:
+            totals = table[key] = _GasTotals()
+        return totals
+
+    def _push_top(self, key: Tuple[Optional[str], Optional[str]], entry: Tuple[int, int, object]):
+        heap = self._top.setdefault(key, [])
+        fee_wei = entry[0]
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, entry)
+        elif fee_wei > heap[0][0]:
+            heapq.heapreplace(heap, entry)
+
+    def add(self, tx):
+        """Fold one BlockchainTransaction into the rollups"""
+        fee_wei, gas_used = tx.gas_fee_wei, tx.gas_used_units
+        if not fee_wei and not gas_used:
+            return
+        address = tx.from_address.lower()
+        day = timestamp_to_day(tx.timestamp)
+        category = tx.category or "Uncategorized"
+
+        self._bucket(self._daily, (address, tx.chain_id, day)).add(fee_wei, gas_used)
+        self._bucket(self._category, (address, tx.chain_id, category)).add(fee_wei, gas_used)
+        self._bucket(self._address, address).add(fee_wei, gas_used)
+        entry = (fee_wei, next(self._seq), tx)
+        for key in ((None, None), (address, None), (None, tx.chain_id), (address, tx.chain_id)):
+            self._push_top(key, entry)
+
+    def _select(self, table: Dict, address: Optional[str], chain_id: Optional[str]):
+        address = address.lower() if address else None
+        for (addr, chain, bucket), totals in table.items():
+            if address is not None and addr != address:
+                continue
+            if chain_id is not None and chain != chain_id:
+                continue
+            yield chain, bucket, totals
+
+    def daily(self, address: Optional[str] = None, chain_id: Optional[str] = None,
+              start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Dict]:
+        """Gas spend per chain and day, oldest first"""
+        merged: Dict[Tuple[str, str], _GasTotals] = {}
+        for chain, day, totals in self._select(self._daily, address, chain_id):
+            if (start_date and day < start_date) or (end_date and day > end_date):
+                continue
+            self._bucket(merged, (chain, day)).merge(totals)
+        return [
+            {"chain_id": chain, "date": day, **totals.to_dict()}
+            for (chain, day), totals in sorted(merged.items(), key=lambda item: (item[0][1], item[0][0]))
+        ]
+
+    def by_category(self, address: Optional[str] = None, chain_id: Optional[str] = None) -> Dict:
+        """Gas spend per category"""
+        merged: Dict[str, _GasTotals] = {}
+        for _, category, totals in self._select(self._category, address, chain_id):
+            self._bucket(merged, category).merge(totals)
+        return {category: totals.to_dict() for category, totals in merged.items()}
+
+    def by_address(self) -> Dict:
+        """Gas spend per paying address"""
+        return {address: totals.to_dict() for address, totals in self._address.items()}
+
+    def total(self, address: Optional[str] = None, chain_id: Optional[str] = None) -> Dict:
+        """Overall gas spend, optionally for one address and/or chain"""
+        if chain_id is None:
+            if address is not None:
+                return self._address.get(address.lower(), _GasTotals()).to_dict()
+            buckets = self._address.values()
+        else:
+            buckets = (totals for _, _, totals in self._select(self._category, address, chain_id))
+        totals = _GasTotals()
+        for bucket in buckets:
+            totals.merge(bucket)
+        return totals.to_dict()
+
+    def most_expensive(self, address: Optional[str] = None, chain_id: Optional[str] = None,
+                       limit: int = 10) -> List:
+        """Most expensive transactions by gas fee (``limit`` between 1 and ``top_n``)"""
+        if not 1 <= limit <= self.top_n:
+            raise ValueError(f"Limit must be between 1 and {self.top_n}")
+        heap = self._top.get((address.lower() if address else None, chain_id), [])
+        entries = sorted(heap, key=lambda entry: (-entry[0], entry[1]))
+        return [tx for _, _, tx in entries[:limit]]
@@ -0,0 +1,305 @@
+"""
+Background jobs for Expense Tracker
+A persistent SQLite job table plus a pool of worker threads, so expensive
+exports and reports run outside the request that asked for them
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler once its job has been cancelled"""
+
+
+class JobContext:
+    """Handed to a job handler to report progress and notice cancellation"""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        """Record progress (0..1) and raise ``JobCancelled`` if cancelled"""
+        with self.queue._connection() as conn:
+            conn.execute('''
+                UPDATE jobs SET progress = ?, message = COALESCE(?, message), heartbeat_at = ?
+                WHERE id = ?
+            ''', (max(0.0, min(1.0, fraction)), message, time.time(), self.job_id))
+            cancelled = self._cancel_requested(conn)
+        if cancelled:
+            raise JobCancelled(self.job_id)
+
+    def check_cancelled(self):
+        """Raise ``JobCancelled`` if the job has been asked to stop"""
+        with self.queue._connection() as conn:
+            cancelled = self._cancel_requested(conn)
+        if cancelled:
+            raise JobCancelled(self.job_id)
+
+    def _cancel_requested(self, conn: sqlite3.Connection) -> bool:
+        return bool(conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (self.job_id,)).fetchone()[0])
+
+
+class JobQueue:
+    """Jobs persisted in SQLite, executed by daemon worker threads
+
+    Any process sharing the database file can run queued jobs: a worker
+    claims one with a single conditional UPDATE under ``BEGIN IMMEDIATE``.
+    Results are written as JSON files and expire ``ttl_seconds`` after the
+    job finishes. Each process heartbeats the jobs it is running; running
+    jobs whose heartbeat goes stale (their process died) are put back in
+    the queue.
+    """
+
+    def __init__(self, db_path: str, result_dir: str, max_workers: int = 2,
+                 ttl_seconds: float = 3600.0, stale_seconds: float = 300.0, poll_interval: float = 0.5):
+        self.db_path = db_path
+        self.result_dir = result_dir
+        self.max_workers = max_workers
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, Callable[[Dict, JobContext], object]] = {}
+        self._threads: List[threading.Thread] = []
+        self._running: set = set()
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL CHECK(status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    expires_at REAL,
+                    heartbeat_at REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs(expires_at) WHERE expires_at IS NOT NULL')
+            self._initialized = True
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def register(self, kind: str, handler: Callable[[Dict, JobContext], object]):
+        """Register the handler for a job kind; it returns a JSON-serializable result"""
+        self._handlers[kind] = handler
+
+    def kinds(self) -> List[str]:
+        return sorted(self._handlers)
+
+    def start(self):
+        """Start this process's worker threads (again after a fork)"""
+        with self._start_lock:
+            if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            os.makedirs(self.result_dir, exist_ok=True)
+            self._running = set()
+            self._threads = [threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                             for i in range(self.max_workers)]
+            self._threads.append(threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def submit(self, kind: str, params: Optional[Dict] = None) -> Dict:
+        """Queue a job and return its status"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind!r}; expected one of {', '.join(self.kinds())}")
+        job_id = str(uuid.uuid4())
+        with self._connection() as conn:
+            conn.execute('''
+                INSERT INTO jobs (id, kind, params, status, created_at) VALUES (?, ?, ?, 'queued', ?)
+            ''', (job_id, kind, json.dumps(params or {}), datetime.now().isoformat()))
+        self.start()
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Status, progress and timestamps of a job"""
+        self.start()
+        with self._connection() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_api(row) if row else None
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """Most recently submitted jobs first"""
+        with self._connection() as conn:
+            rows = conn.execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        return [self._to_api(row) for row in rows]
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Cancel a queued job outright; ask a running one to stop at its next progress report"""
+        with self._connection() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'cancelled', finished_at = ?, expires_at = ?
+                WHERE id = ? AND status = 'queued'
+            ''', (datetime.now().isoformat(), time.time() + self.ttl_seconds, job_id))
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def result_path(self, job_id: str) -> Optional[str]:
+        """Path of a finished job's result file, None if missing or expired"""
+        with self._connection() as conn:
+            row = conn.execute('SELECT status, expires_at FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None or row['status'] != 'succeeded' or row['expires_at'] < time.time():
+            return None
+        path = os.path.join(self.result_dir, f"{job_id}.json")
+        return path if os.path.exists(path) else None
+
+    def purge_expired(self) -> int:
+        """Delete finished jobs (and their result files) past their expiry"""
+        with self._connection() as conn:
+            rows = conn.execute('SELECT id FROM jobs WHERE expires_at < ?', (time.time(),)).fetchall()
+            for row in rows:
+                try:
+                    os.remove(os.path.join(self.result_dir, f"{row['id']}.json"))
+                except OSError:
+                    pass
+            conn.execute('DELETE FROM jobs WHERE expires_at < ?', (time.time(),))
+        return len(rows)
+
+    def requeue_stale(self) -> int:
+        """Put running jobs whose worker stopped heartbeating back in the queue"""
+        with self._connection() as conn:
+            cursor = conn.execute('''
+                UPDATE jobs SET status = 'queued', progress = 0, started_at = NULL
+                WHERE status = 'running' AND heartbeat_at < ?
+            ''', (time.time() - self.stale_seconds,))
+        return cursor.rowcount
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1
+            ''').fetchone()
+            if row is not None:
+                conn.execute('''
+                    UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE id = ?
+                ''', (datetime.now().isoformat(), time.time(), row['id']))
+            conn.execute('COMMIT')
+            return row
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._connection() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = ?, error = ?, finished_at = ?, expires_at = ?,
+                    progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END
+                WHERE id = ?
+            ''', (status, error, datetime.now().isoformat(), time.time() + self.ttl_seconds, status, job_id))
+
+    def run_one(self) -> bool:
+        """Claim and run a single queued job; False when the queue is empty
+
+        A job cancelled between being claimed and starting never runs its handler.
+        """
+        row = self._claim()
+        if row is None:
+            return False
+        job_id = row['id']
+        handler = self._handlers.get(row['kind'])
+        self._running.add(job_id)
+        context = JobContext(self, job_id)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind {row['kind']!r}")
+            context.check_cancelled()
+            result = handler(json.loads(row['params']), context)
+            tmp_path = os.path.join(self.result_dir, f"{job_id}.json.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, os.path.join(self.result_dir, f"{job_id}.json"))
+        except JobCancelled:
+            self._finish(job_id, 'cancelled')
+        except Exception as e:
+            self._finish(job_id, 'failed', f"{type(e).__name__}: {e}")
+        else:
+            self._finish(job_id, 'succeeded')
+        finally:
+            self._running.discard(job_id)
+        return True
+
+    def _run(self):
+        last_maintenance = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_maintenance > 60:
+                    self.requeue_stale()
+                    self.purge_expired()
+                    last_maintenance = time.monotonic()
+                if self.run_one():
+                    continue
+            except sqlite3.Error:
+                pass
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.stale_seconds / 3)
+            running = list(self._running)
+            if not running:
+                continue
+            try:
+                with self._connection() as conn:
+                    conn.executemany('UPDATE jobs SET heartbeat_at = ? WHERE id = ?',
+                                     [(time.time(), job_id) for job_id in running])
+            except sqlite3.Error:
+                pass
+
+    @staticmethod
+    def _to_api(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        job['has_result'] = job['status'] == 'succeeded'
+        if job['expires_at'] is not None:
+            job['expires_at'] = datetime.fromtimestamp(job['expires_at']).isoformat()
+        job.pop('heartbeat_at')
+        return job
+
+
+# Job queue shared by the API, backed by backend/jobs.db by default
+job_queue = JobQueue(
+    os.environ.get('JOBS_DB', os.path.join(os.path.dirname(__file__), 'jobs.db')),
+    os.environ.get('JOB_RESULTS_DIR', os.path.join(os.path.dirname(__file__), 'job_results')),
+    max_workers=int(os.environ.get('JOB_WORKERS', 2)),
+    ttl_seconds=float(os.environ.get('JOB_RESULT_TTL', 3600)),
+)
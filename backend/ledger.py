@@ -0,0 +1,162 @@
+"""
+Unified ledger for Expense Tracker
+Lazily merges fiat and on-chain transactions into one chronological stream
+"""
+
+import heapq
+import itertools
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dates import to_day
+from gas_analytics import format_wei, timestamp_to_day
+from money import from_cents
+
+# Entries sort newest first by (date, source, id); the source breaks ties
+# between fiat and on-chain rows that share a date.
+FIAT = "fiat"
+ONCHAIN = "onchain"
+
+
+def ledger_key(entry: Dict) -> Tuple[str, str, str]:
+    """Sort key of a normalized ledger entry"""
+    return (entry["date"], entry["source"], entry["id"])
+
+
+def encode_cursor(entry: Dict) -> str:
+    """Encode the position after ``entry`` as an opaque cursor string"""
+    return "|".join(ledger_key(entry))
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, str]:
+    """Decode a cursor produced by :func:`encode_cursor`"""
+    parts = cursor.split("|", 2)
+    if len(parts) != 3 or parts[1] not in (FIAT, ONCHAIN):
+        raise ValueError("Invalid ledger cursor")
+    try:
+        to_day(parts[0])
+    except ValueError:
+        raise ValueError("Invalid ledger cursor")
+    return parts[0], parts[1], parts[2]
+
+
+def source_cursor(cursor: Tuple[str, str, str], source: str) -> Optional[Tuple[str, str]]:
+    """Translate a ledger cursor into a per-source ``(date, id)`` cursor
+
+    Every row a source returns sorts strictly before the translated cursor,
+    so no entry is repeated or skipped across pages.
+    """
+    date, cursor_source, entry_id = cursor
+    if source == cursor_source:
+        return date, entry_id
+    if source < cursor_source:
+        # Rows on the cursor date still come after it in descending order
+        return date, "\uffff"
+    return date, ""
+
+
+def fiat_key(row: Dict) -> Tuple[str, str]:
+    """Sort key of a stored fiat row, matching ``date DESC, id DESC`` when reversed"""
+    return row["date"], row["id"]
+
+
+def iter_stored(rows: Iterable[Dict], before: Optional[Tuple[str, str]] = None) -> Iterator[Dict]:
+    """Stored fiat rows newest first, after an optional ``(date, id)`` cursor
+
+    The in-memory counterpart of ``Database.iter_transactions`` for rows
+    held by the JSON store.
+    """
+    if before is not None:
+        rows = (row for row in rows if fiat_key(row) < before)
+    return iter(sorted(rows, key=fiat_key, reverse=True))
+
+
+def normalize_fiat(row: Dict) -> Dict:
+    """Normalize a fiat transaction row into a ledger entry"""
+    return {
+        "id": row["id"],
+        "source": FIAT,
+        "type": row["type"],
+        "amount": from_cents(row["amount_cents"]),
+        "currency": row.get("currency", "USD"),
+        "category": row["category"],
+        "description": row.get("description"),
+        "date": row["date"],
+        "timestamp": row.get("created_at"),
+        "nft_receipt": None,
+        "details": {
+            "bank_account_id": row.get("bank_account_id"),
+            "merchant_name": row.get("merchant_name"),
+        },
+    }
+
+
+def normalize_onchain(tx, nft_receipt=None) -> Dict:
+    """Normalize a BlockchainTransaction into a ledger entry"""
+    return {
+        "id": tx.id,
+        "source": ONCHAIN,
+        "type": tx.transaction_type,
+        "amount": tx.amount,
+        "currency": tx.token_symbol,
+        "category": tx.category,
+        "description": tx.description,
+        "date": timestamp_to_day(tx.timestamp),
+        "timestamp": tx.timestamp,
+        "nft_receipt": nft_receipt.to_dict() if nft_receipt else None,
+        "details": {
+            "transaction_hash": tx.transaction_hash,
+            "chain_id": tx.chain_id,
+            "from_address": tx.from_address,
+            "to_address": tx.to_address,
+            "status": tx.status,
+            "gas_fee": format_wei(tx.gas_fee_wei),
+        },
+    }
+
+
+def iter_ledger(fiat_rows: Callable[[Optional[Tuple[str, str]]], Iterable[Dict]], chain_db,
+                cursor: Optional[str] = None, address: Optional[str] = None) -> Iterator[Dict]:
+    """Stream the unified ledger newest first, starting after ``cursor``
+
+    ``fiat_rows(before)`` yields stored fiat rows newest first after a
+    ``(date, id)`` cursor (``Database.iter_transactions``, or the JSON
+    store's snapshot date index). Both inputs are already
+    ordered by date, so a k-way heap merge yields entries one at a time
+    while holding a single row per source. ``address`` keeps the on-chain
+    transactions from or to that address; fiat rows belong to no address,
+    so they are left out when filtering by one.
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    onchain_txs = chain_db.iter_blockchain_transactions_by_date(
+        before=source_cursor(position, ONCHAIN) if position else None,
+        address=address,
+    )
+
+    def join_receipt(tx):
+        receipt = None
+        if tx.nft_receipt_id:
+            receipt = (chain_db.get_nft_receipt_by_id(tx.nft_receipt_id)
+                       or chain_db.get_nft_receipt_by_token_id(tx.nft_receipt_id))
+        return normalize_onchain(tx, receipt)
+
+    streams: List[Iterable[Dict]] = [(join_receipt(tx) for tx in onchain_txs)]
+    if address is None:
+        rows = fiat_rows(source_cursor(position, FIAT) if position else None)
+        streams.append(normalize_fiat(row) for row in rows)
+    return heapq.merge(*streams, key=ledger_key, reverse=True)
+
+
+def ledger_page(fiat_rows: Callable[[Optional[Tuple[str, str]]], Iterable[Dict]], chain_db,
+                cursor: Optional[str] = None, limit: int = 50, address: Optional[str] = None) -> Dict:
+    """Return one page of the unified ledger with a cursor to the next page"""
+    stream = iter_ledger(fiat_rows, chain_db, cursor=cursor, address=address)
+    entries = list(itertools.islice(stream, limit + 1))
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    stream.close()
+    return {
+        "entries": entries,
+        "next_cursor": encode_cursor(entries[-1]) if has_more else None,
+        "count": len(entries),
+    }
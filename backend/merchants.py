@@ -0,0 +1,37 @@
+"""
+Merchant name helpers for Expense Tracker
+Bank feeds spell the same merchant many ways ("AMAZON MKTPLACE #1234",
+"Amazon Mktplace"); these helpers reduce them to one stable key
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+
+_NON_WORD = re.compile(r"[^a-z0-9&' ]+")
+
+# Tokens bank feeds add around the merchant itself
+NOISE_TOKENS = frozenset({
+    'pos', 'purchase', 'debit', 'credit', 'card', 'payment', 'visa', 'mastercard', 'contactless',
+    'inc', 'llc', 'ltd', 'co', 'corp', 'www', 'com', 'the',
+})
+
+
+@lru_cache(maxsize=65536)
+def normalize_merchant(name: Optional[str]) -> Optional[str]:
+    """Lowercased merchant words without store numbers, references or feed noise
+
+    Returns None for names with nothing left, so they are not tracked.
+    """
+    if not name:
+        return None
+    words = [w.strip("'") for w in _NON_WORD.sub(' ', name.lower()).split()]
+    words = [w for w in words if w and w not in NOISE_TOKENS and not any(c.isdigit() for c in w)]
+    return ' '.join(words) or None
+
+
+@lru_cache(maxsize=65536)
+def keyword_tokens(text: Optional[str]) -> Tuple[str, ...]:
+    """Normalized words of a merchant name or description, in order"""
+    normalized = normalize_merchant(text)
+    return tuple(normalized.split()) if normalized else ()
@@ -0,0 +1,221 @@
+"""
+Metrics for Expense Tracker
+Per-route latency histograms, row counters, storage timings and sampled
+cProfile captures, exported in Prometheus text format
+"""
+
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+# Latency buckets in seconds, upper bounds (Prometheus ``le`` labels)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        running = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            result.append((repr(bound), running))
+        result.append(("+Inf", self.count))
+        return result
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+
+class MetricsRegistry:
+    """Thread-safe registry of request, row and storage metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_latency: Dict[Tuple[str, str], Histogram] = {}
+        self.request_count: Dict[Tuple[str, str, int], int] = {}
+        self.rows_scanned: Dict[str, int] = {}
+        self.rows_serialized: Dict[str, int] = {}
+        self.storage_latency: Dict[str, Histogram] = {}
+        self.gauges: List[Callable[[], Dict[str, float]]] = []
+        self.started_at = time.time()
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float):
+        with self._lock:
+            histogram = self.request_latency.get((route, method))
+            if histogram is None:
+                histogram = self.request_latency[(route, method)] = Histogram()
+            histogram.observe(seconds)
+            key = (route, method, status)
+            self.request_count[key] = self.request_count.get(key, 0) + 1
+
+    def add_rows(self, route: str, scanned: int = 0, serialized: int = 0):
+        with self._lock:
+            self.rows_scanned[route] = self.rows_scanned.get(route, 0) + scanned
+            self.rows_serialized[route] = self.rows_serialized.get(route, 0) + serialized
+
+    def observe_storage(self, operation: str, seconds: float):
+        with self._lock:
+            histogram = self.storage_latency.get(operation)
+            if histogram is None:
+                histogram = self.storage_latency[operation] = Histogram()
+            histogram.observe(seconds)
+
+    def register_gauges(self, collect: Callable[[], Dict[str, float]]):
+        """Register a callback returning ``{metric_name: value}`` at scrape time"""
+        self.gauges.append(collect)
+
+    @staticmethod
+    def _histogram_lines(name: str, histogram: Histogram, **labels) -> List[str]:
+        base = _labels(**labels)
+        sep = "," if base else ""
+        lines = [f'{name}_bucket{{{base}{sep}le="{le}"}} {count}' for le, count in histogram.cumulative()]
+        lines.append(f'{name}_sum{{{base}}} {histogram.total}')
+        lines.append(f'{name}_count{{{base}}} {histogram.count}')
+        return lines
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += ["# HELP expense_http_request_duration_seconds Request latency by route",
+                      "# TYPE expense_http_request_duration_seconds histogram"]
+            for (route, method), histogram in sorted(self.request_latency.items()):
+                lines += self._histogram_lines("expense_http_request_duration_seconds", histogram,
+                                               route=route, method=method)
+
+            lines += ["# HELP expense_http_requests_total Requests by route and status",
+                      "# TYPE expense_http_requests_total counter"]
+            for (route, method, status), count in sorted(self.request_count.items()):
+                lines.append(f'expense_http_requests_total{{{_labels(route=route, method=method, status=status)}}} {count}')
+
+            lines += ["# HELP expense_rows_scanned_total Rows read from storage by route",
+                      "# TYPE expense_rows_scanned_total counter"]
+            for route, count in sorted(self.rows_scanned.items()):
+                lines.append(f'expense_rows_scanned_total{{{_labels(route=route)}}} {count}')
+
+            lines += ["# HELP expense_rows_serialized_total Rows written to responses by route",
+                      "# TYPE expense_rows_serialized_total counter"]
+            for route, count in sorted(self.rows_serialized.items()):
+                lines.append(f'expense_rows_serialized_total{{{_labels(route=route)}}} {count}')
+
+            lines += ["# HELP expense_storage_duration_seconds Storage operation latency",
+                      "# TYPE expense_storage_duration_seconds histogram"]
+            for operation, histogram in sorted(self.storage_latency.items()):
+                lines += self._histogram_lines("expense_storage_duration_seconds", histogram,
+                                               operation=operation)
+
+        lines += ["# TYPE expense_uptime_seconds gauge",
+                  f"expense_uptime_seconds {time.time() - self.started_at}"]
+        for collect in self.gauges:
+            for name, value in collect().items():
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def timed(operation: str):
+    """Record the latency of a storage function under ``operation``"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe_storage(operation, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def record_rows(scanned: int = 0, serialized: int = 0):
+    """Count rows scanned and serialized by the current request"""
+    g.rows_scanned = getattr(g, 'rows_scanned', 0) + scanned
+    g.rows_serialized = getattr(g, 'rows_serialized', 0) + serialized
+
+
+class SamplingProfiler:
+    """Captures cProfile stats for a random fraction of requests"""
+
+    def __init__(self, sample_rate: float = 0.0, output_dir: Optional[str] = None):
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.captured = 0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def dump(self, profiler: cProfile.Profile, route: str, seconds: float):
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{int(seconds * 1000)}ms-{os.getpid()}.prof"
+        profiler.dump_stats(os.path.join(self.output_dir, name))
+        self.captured += 1
+
+
+profiler = SamplingProfiler(
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    output_dir=os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles')),
+)
+
+
+def init_app(app: Flask):
+    """Install request timing middleware and the ``/api/metrics`` endpoint"""
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        if profiler.should_sample():
+            g.profile = cProfile.Profile()
+            g.profile.enable()
+
+    @app.after_request
+    def _record_request(response):
+        started = getattr(g, 'request_started', None)
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, seconds)
+        scanned = getattr(g, 'rows_scanned', 0)
+        serialized = getattr(g, 'rows_serialized', 0)
+        if scanned or serialized:
+            metrics.add_rows(route, scanned, serialized)
+        return response
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        # Teardown runs even when the view raised, so a sampled profile never stays enabled
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            profiler.dump(profile, route, time.perf_counter() - g.request_started)
+
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
+        """Serve metrics in Prometheus text format"""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,371 @@
+"""
+Schema migrations for the Expense Tracker database
+Ordered, versioned DDL applied once per database file
+
+Each migration is recorded in the ``schema_migrations`` table and the
+latest version is mirrored into ``PRAGMA user_version``, so a current
+database is recognised with a single pragma read and no DDL at all.
+"""
+
+import sqlite3
+import uuid
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from dates import month_key, to_day
+from fx import BASE_CURRENCY
+from money import to_cents
+
+DEFAULT_CATEGORIES = [
+    ("1", "Salary", "income", "#10b981", "wallet"),
+    ("2", "Freelance", "income", "#06b6d4", "laptop"),
+    ("3", "Investments", "income", "#8b5cf6", "trending-up"),
+    ("4", "Other Income", "income", "#f59e0b", "gift"),
+    ("5", "Food & Dining", "expense", "#ef4444", "utensils"),
+    ("6", "Transportation", "expense", "#f97316", "car"),
+    ("7", "Shopping", "expense", "#ec4899", "shopping-bag"),
+    ("8", "Bills & Utilities", "expense", "#6366f1", "file-text"),
+    ("9", "Entertainment", "expense", "#14b8a6", "film"),
+    ("10", "Healthcare", "expense", "#f43f5e", "heart-pulse"),
+    ("11", "Education", "expense", "#3b82f6", "book-open"),
+    ("12", "Other Expense", "expense", "#71717a", "package"),
+]
+
+
+def _columns(cursor, table: str) -> List[str]:
+    return [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+
+
+def _add_column(cursor, table: str, column: str, definition: str):
+    """Add a column unless it exists; SQLite does this without rewriting rows"""
+    if column not in _columns(cursor, table):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def initial_schema(cursor):
+    """Transactions and categories tables with their original indexes"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
+            amount REAL NOT NULL CHECK(amount > 0),
+            category TEXT NOT NULL,
+            description TEXT,
+            date TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
+            color TEXT NOT NULL,
+            icon TEXT DEFAULT 'circle'
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date_id ON transactions(date DESC, id DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions(type)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category)')
+
+    cursor.execute('SELECT COUNT(*) FROM categories')
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany('''
+            INSERT INTO categories (id, name, type, color, icon)
+            VALUES (?, ?, ?, ?, ?)
+        ''', DEFAULT_CATEGORIES)
+
+
+def bank_and_merchant_fields(cursor):
+    """Columns the Transaction model carries for bank sync and merchants"""
+    _add_column(cursor, 'transactions', 'bank_account_id', 'TEXT')
+    _add_column(cursor, 'transactions', 'payment_method', 'TEXT')
+    _add_column(cursor, 'transactions', 'is_auto_sync', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(cursor, 'transactions', 'bank_transaction_id', 'TEXT')
+    _add_column(cursor, 'transactions', 'merchant_name', 'TEXT')
+    _add_column(cursor, 'transactions', 'location', 'TEXT')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_bank_account
+        ON transactions(bank_account_id, date DESC) WHERE bank_account_id IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_bank_transaction
+        ON transactions(bank_transaction_id) WHERE bank_transaction_id IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_merchant
+        ON transactions(merchant_name) WHERE merchant_name IS NOT NULL
+    ''')
+
+
+def integer_cents(cursor):
+    """Replace the REAL amount column with exact integer cents
+
+    SQLite cannot change a column type in place, so the table is rebuilt
+    once; amounts are converted through their decimal text like the API.
+    """
+    cursor.connection.create_function('to_cents', 1, to_cents, deterministic=True)
+    cursor.execute('''
+        CREATE TABLE transactions_new (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
+            amount_cents INTEGER NOT NULL CHECK(amount_cents > 0),
+            category TEXT NOT NULL,
+            description TEXT,
+            date TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            bank_account_id TEXT,
+            payment_method TEXT,
+            is_auto_sync INTEGER NOT NULL DEFAULT 0,
+            bank_transaction_id TEXT,
+            merchant_name TEXT,
+            location TEXT
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO transactions_new
+        SELECT id, type, to_cents(amount), category, description, date, created_at,
+               bank_account_id, payment_method, is_auto_sync, bank_transaction_id,
+               merchant_name, location
+        FROM transactions
+    ''')
+    cursor.execute('DROP TABLE transactions')
+    cursor.execute('ALTER TABLE transactions_new RENAME TO transactions')
+    initial_schema(cursor)
+    bank_and_merchant_fields(cursor)
+
+
+def day_ordinals(cursor):
+    """Integer day ordinal and month key columns with covering indexes
+
+    Range filters and day/week grouping scan ``idx_transactions_day`` and
+    monthly/yearly grouping scans ``idx_transactions_month`` without
+    touching the table or parsing date strings.
+    """
+    cursor.connection.create_function('to_day', 1, to_day, deterministic=True)
+    cursor.connection.create_function('month_key', 1, month_key, deterministic=True)
+    _add_column(cursor, 'transactions', 'day', 'INTEGER')
+    _add_column(cursor, 'transactions', 'month_key', 'INTEGER')
+    cursor.execute('UPDATE transactions SET day = to_day(date)')
+    cursor.execute('UPDATE transactions SET month_key = month_key(day)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_day
+        ON transactions(day, type, amount_cents)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_month
+        ON transactions(month_key, type, amount_cents)
+    ''')
+
+
+def transaction_currency(cursor):
+    """Per-transaction currency, with the covering indexes widened to carry it"""
+    _add_column(cursor, 'transactions', 'currency', f"TEXT NOT NULL DEFAULT '{BASE_CURRENCY}'")
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_currency ON transactions(currency)')
+    cursor.execute('DROP INDEX IF EXISTS idx_transactions_day')
+    cursor.execute('DROP INDEX IF EXISTS idx_transactions_month')
+    cursor.execute('''
+        CREATE INDEX idx_transactions_day
+        ON transactions(day, type, currency, amount_cents)
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_transactions_month
+        ON transactions(month_key, type, currency, day, amount_cents)
+    ''')
+
+
+def sync_versions(cursor):
+    """Row versions, a store-wide version counter and tombstones for delta sync
+
+    Existing rows get distinct versions in rowid order, so the first full
+    sync pages like any other; ``idx_*_version`` let a sync read only the
+    rows written after a client's last version.
+    """
+    offset = 0
+    for table in ('transactions', 'categories'):
+        _add_column(cursor, table, 'version', 'INTEGER NOT NULL DEFAULT 1')
+        _add_column(cursor, table, 'updated_at', 'TEXT')
+        cursor.execute(f'UPDATE {table} SET version = rowid + ?', (offset,))
+        offset += cursor.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM {table}').fetchone()[0]
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_version ON {table}(version)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK(id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO sync_state (id, version) VALUES (1, ?)', (offset,))
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tombstones (
+            resource TEXT NOT NULL,
+            id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL,
+            PRIMARY KEY (resource, id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tombstones_version ON tombstones(version)')
+
+
+def category_keys(cursor):
+    """Reference categories from transactions by an integer key instead of by name
+
+    Categories get an integer ``key`` primary key (the text ``id`` stays the
+    public identifier) and transactions a ``category_key`` foreign key in
+    place of the repeated name. Names used by transactions but missing from
+    the categories table become categories first. Both tables are rebuilt
+    once, since SQLite cannot change a primary key or drop an indexed
+    column in place.
+    """
+    cursor.execute('''
+        CREATE TABLE categories_new (
+            key INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
+            color TEXT NOT NULL,
+            icon TEXT DEFAULT 'circle',
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO categories_new (id, name, type, color, icon, version, updated_at)
+        SELECT id, name, type, color, icon, version, updated_at FROM categories ORDER BY rowid
+    ''')
+    cursor.execute('DROP TABLE categories')
+    cursor.execute('ALTER TABLE categories_new RENAME TO categories')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_categories_version ON categories(version)')
+
+    orphans = cursor.execute('''
+        SELECT t.category, MAX(t.type) FROM transactions t
+        LEFT JOIN categories c ON c.name = t.category
+        WHERE c.key IS NULL
+        GROUP BY t.category
+    ''').fetchall()
+    # New rows, so they get new sync versions like any other write
+    version = cursor.execute('SELECT version FROM sync_state WHERE id = 1').fetchone()[0]
+    now = datetime.now().isoformat()
+    cursor.executemany('''
+        INSERT INTO categories (id, name, type, color, icon, version, updated_at)
+        VALUES (?, ?, ?, '#71717a', 'circle', ?, ?)
+    ''', [(str(uuid.uuid4()), name, kind, version + i, now) for i, (name, kind) in enumerate(orphans, 1)])
+    cursor.execute('UPDATE sync_state SET version = ? WHERE id = 1', (version + len(orphans),))
+
+    cursor.execute(f'''
+        CREATE TABLE transactions_new (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL CHECK(type IN ('income', 'expense')),
+            amount_cents INTEGER NOT NULL CHECK(amount_cents > 0),
+            category_key INTEGER NOT NULL REFERENCES categories(key),
+            description TEXT,
+            date TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            bank_account_id TEXT,
+            payment_method TEXT,
+            is_auto_sync INTEGER NOT NULL DEFAULT 0,
+            bank_transaction_id TEXT,
+            merchant_name TEXT,
+            location TEXT,
+            day INTEGER,
+            month_key INTEGER,
+            currency TEXT NOT NULL DEFAULT '{BASE_CURRENCY}',
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO transactions_new
+        SELECT t.id, t.type, t.amount_cents, c.key, t.description, t.date, t.created_at,
+               t.bank_account_id, t.payment_method, t.is_auto_sync, t.bank_transaction_id,
+               t.merchant_name, t.location, t.day, t.month_key, t.currency, t.version, t.updated_at
+        FROM transactions t JOIN categories c ON c.name = t.category
+    ''')
+    cursor.execute('DROP TABLE transactions')
+    cursor.execute('ALTER TABLE transactions_new RENAME TO transactions')
+
+    cursor.execute('CREATE INDEX idx_transactions_date ON transactions(date DESC)')
+    cursor.execute('CREATE INDEX idx_transactions_date_id ON transactions(date DESC, id DESC)')
+    cursor.execute('CREATE INDEX idx_transactions_type ON transactions(type)')
+    # Covers per-category group-bys: integer keys, no table lookups
+    cursor.execute('''
+        CREATE INDEX idx_transactions_category
+        ON transactions(category_key, type, currency, amount_cents)
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_transactions_bank_account
+        ON transactions(bank_account_id, date DESC) WHERE bank_account_id IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_transactions_bank_transaction
+        ON transactions(bank_transaction_id) WHERE bank_transaction_id IS NOT NULL
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_transactions_merchant
+        ON transactions(merchant_name) WHERE merchant_name IS NOT NULL
+    ''')
+    cursor.execute('CREATE INDEX idx_transactions_day ON transactions(day, type, currency, amount_cents)')
+    cursor.execute('''
+        CREATE INDEX idx_transactions_month
+        ON transactions(month_key, type, currency, day, amount_cents)
+    ''')
+    cursor.execute('CREATE INDEX idx_transactions_currency ON transactions(currency)')
+    cursor.execute('CREATE INDEX idx_transactions_version ON transactions(version)')
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "initial schema", initial_schema),
+    (2, "bank and merchant fields", bank_and_merchant_fields),
+    (3, "integer cents amounts", integer_cents),
+    (4, "day ordinals and month keys", day_ordinals),
+    (5, "transaction currency", transaction_currency),
+    (6, "sync versions and tombstones", sync_versions),
+    (7, "integer category keys", category_keys),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Schema version recorded in the database header"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending migrations in order and return the versions applied
+
+    Runs under ``BEGIN IMMEDIATE`` so concurrently starting workers
+    serialize, and re-reads the version once the write lock is held.
+    """
+    if schema_version(conn) >= LATEST_VERSION:
+        return []
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        current = schema_version(conn)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        ''')
+        applied = []
+        for version, name, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            apply(cursor)
+            cursor.execute(
+                'INSERT OR REPLACE INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                (version, name, datetime.now().isoformat())
+            )
+            applied.append(version)
+        if applied:
+            cursor.execute(f'PRAGMA user_version = {applied[-1]}')
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
@@ -9,6 +9,8 @@ from typing import Literal, Optional, List, Dict
 from enum import Enum
 import uuid
 
+from money import from_cents, savings_rate, to_cents
+
 
 class TransactionType(Enum):
     """Enum for transaction types"""
@@ -18,9 +20,9 @@ class TransactionType(Enum):
 
 @dataclass
 class Transaction:
-    """Represents a financial transaction"""
+    """Represents a financial transaction (amount in integer cents)"""
     type: Literal["income", "expense"]
-    amount: float
+    amount: int
     category: str
     description: str
     date: str
@@ -38,7 +40,7 @@ class Transaction:
         return {
             "id": self.id,
             "type": self.type,
-            "amount": self.amount,
+            "amount": from_cents(self.amount),
             "category": self.category,
             "description": self.description,
             "date": self.date,
@@ -57,7 +59,7 @@ class Transaction:
         return cls(
             id=data.get("id", str(uuid.uuid4())),
             type=data["type"],
-            amount=float(data["amount"]),
+            amount=int(data["amount_cents"]) if "amount_cents" in data else to_cents(data["amount"]),
             category=data["category"],
             description=data["description"],
             date=data["date"],
@@ -127,19 +129,19 @@ class Category:
 
 @dataclass
 class FinancialSummary:
-    """Represents a financial summary"""
-    total_income: float
-    total_expenses: float
-    balance: float
+    """Represents a financial summary (amounts in integer cents)"""
+    total_income: int
+    total_expenses: int
+    balance: int
     transaction_count: int
     savings_rate: float
     
     def to_dict(self) -> Dict:
         """Convert summary to dictionary"""
         return {
-            "total_income": self.total_income,
-            "total_expenses": self.total_expenses,
-            "balance": self.balance,
+            "total_income": from_cents(self.total_income),
+            "total_expenses": from_cents(self.total_expenses),
+            "balance": from_cents(self.balance),
             "transaction_count": self.transaction_count,
             "savings_rate": self.savings_rate
         }
@@ -149,32 +151,30 @@ class FinancialSummary:
         """Calculate financial summary from transactions"""
         total_income = sum(t.amount for t in transactions if t.is_income())
         total_expenses = sum(t.amount for t in transactions if t.is_expense())
-        balance = total_income - total_expenses
-        savings_rate = round((balance / total_income * 100), 1) if total_income > 0 else 0
         
         return cls(
             total_income=total_income,
             total_expenses=total_expenses,
-            balance=balance,
+            balance=total_income - total_expenses,
             transaction_count=len(transactions),
-            savings_rate=savings_rate
+            savings_rate=savings_rate(total_income, total_expenses)
         )
 
 
 @dataclass
 class CategoryBreakdown:
-    """Represents breakdown by category"""
+    """Represents breakdown by category (amounts in integer cents)"""
     category: str
-    income: float = 0
-    expense: float = 0
+    income: int = 0
+    expense: int = 0
     count: int = 0
     
     def to_dict(self) -> Dict:
         """Convert breakdown to dictionary"""
         return {
             "category": self.category,
-            "income": self.income,
-            "expense": self.expense,
+            "income": from_cents(self.income),
+            "expense": from_cents(self.expense),
             "count": self.count
         }
 
@@ -209,12 +209,12 @@ class Report:
 
 @dataclass
 class BankAccount:
-    """Represents a linked bank account"""
+    """Represents a linked bank account (balance in integer cents)"""
     bank_name: str
     account_name: str
     account_number: str
     account_type: Literal["checking", "savings", "credit_card", "investment"]
-    balance: float
+    balance: int
     currency: str = "USD"
     is_active: bool = True
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
@@ -229,7 +229,7 @@ class BankAccount:
             "account_name": self.account_name,
             "account_number": self.account_number,
             "account_type": self.account_type,
-            "balance": self.balance,
+            "balance": from_cents(self.balance),
             "currency": self.currency,
             "is_active": self.is_active,
             "linked_at": self.linked_at,
@@ -245,7 +245,7 @@ class BankAccount:
             account_name=data["account_name"],
             account_number=data["account_number"],
             account_type=data["account_type"],
-            balance=float(data.get("balance", 0)),
+            balance=int(data["balance_cents"]) if "balance_cents" in data else to_cents(data.get("balance", 0)),
             currency=data.get("currency", "USD"),
             is_active=data.get("is_active", True),
             linked_at=data.get("linked_at", datetime.now().isoformat()),
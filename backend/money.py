@@ -0,0 +1,38 @@
+"""
+Money helpers for Expense Tracker
+Amounts are stored and aggregated as integer minor units (cents); these
+helpers convert at the API boundary
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENTS_PER_UNIT = 100
+
+
+def to_cents(value) -> int:
+    """Convert an API amount (number or numeric string) into integer cents
+
+    Goes through the decimal text of the value so 0.1 + 0.2 style float
+    noise never leaks into stored amounts.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Amount must be a number")
+    try:
+        amount = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int((amount * CENTS_PER_UNIT).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """Convert integer cents into an API amount"""
+    return cents / CENTS_PER_UNIT
+
+
+def savings_rate(income_cents: int, expense_cents: int) -> float:
+    """Savings rate in percent, computed from exact integer totals"""
+    if income_cents <= 0:
+        return 0
+    return round((income_cents - expense_cents) * 100 / income_cents, 1)
@@ -0,0 +1,249 @@
+"""
+Portfolio valuation for Expense Tracker
+Values token balances across wallets and chains using a cached price table
+and columnar NumPy arrays
+"""
+
+import json
+import os
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def parse_units(amount: str, decimals: int) -> int:
+    """Parse a decimal token amount string into integer base units"""
+    try:
+        value = Decimal(str(amount).strip() or "0")
+    except InvalidOperation:
+        raise ValueError(f"Invalid token amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Invalid token amount: {amount!r}")
+    return int(value.scaleb(decimals).to_integral_value())
+
+
+def format_units(units: int, decimals: int) -> str:
+    """Format integer base units back into a decimal token amount string"""
+    return format(Decimal(units).scaleb(-decimals).normalize(), "f")
+
+
+class PriceTable:
+    """TTL-cached token price table in USD, optionally backed by a JSON file
+
+    The file holds ``{"prices": {"ETH": 2500.0, "0x1:0xa0b8...": 1.0}}``.
+    Keys are either a token symbol or ``"<chain_id>:<token_address>"``;
+    address keys win over symbols when both are present.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: float = 300.0,
+                 loader: Optional[Callable[[], Dict[str, float]]] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._loader = loader
+        self._prices: Dict[str, float] = {}
+        self._loaded_at = 0.0
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(symbol: str) -> str:
+        return symbol.upper()
+
+    @staticmethod
+    def _address_key(chain_id: str, token_address: str) -> str:
+        return f"{chain_id}:{token_address}".lower()
+
+    def _normalize(self, prices: Dict[str, float]) -> Dict[str, float]:
+        normalized = {}
+        for key, price in prices.items():
+            key = key.lower() if ":" in key else self._key(key)
+            normalized[key] = float(price)
+        return normalized
+
+    def _read_file(self) -> Optional[Dict[str, float]]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return self._prices
+        with open(self.path, 'r') as f:
+            payload = json.load(f)
+        self._mtime = mtime
+        return self._normalize(payload.get("prices", payload))
+
+    def refresh(self, force: bool = False) -> Dict[str, float]:
+        """Reload prices if the cached table is older than the TTL"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._loaded_at and now - self._loaded_at < self.ttl_seconds:
+                return self._prices
+            if self._loader is not None:
+                prices = self._normalize(self._loader())
+            else:
+                prices = self._read_file()
+            if prices is not None:
+                self._prices = prices
+            self._loaded_at = now
+            return self._prices
+
+    def set_price(self, symbol: str, price_usd: float):
+        """Set a single price in memory (does not touch the backing file)"""
+        with self._lock:
+            self._prices[self._key(symbol)] = float(price_usd)
+
+    def get(self, symbol: str, chain_id: Optional[str] = None,
+            token_address: Optional[str] = None) -> Optional[float]:
+        """Get the USD price of a token, or None if it is unknown"""
+        prices = self.refresh()
+        if chain_id and token_address:
+            price = prices.get(self._address_key(chain_id, token_address))
+            if price is not None:
+                return price
+        return prices.get(self._key(symbol))
+
+
+class _Codes:
+    """Assigns dense integer codes to string labels"""
+
+    def __init__(self):
+        self.labels: List = []
+        self._codes: Dict = {}
+
+    def code(self, label) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self._codes[label] = code
+            self.labels.append(label)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+
+class PortfolioBook:
+    """Columnar store of token balances, one row per wallet/token/chain
+
+    Balances are parsed into integer base units once at ingest and kept as
+    scaled float64 token amounts alongside integer codes for wallet, chain
+    and token, so valuation is a handful of array operations.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.wallets = _Codes()
+        self.chains = _Codes()
+        self.tokens = _Codes()
+        self._rows: Dict[Tuple[str, str, str], int] = {}
+        self._size = 0
+        self._wallet = np.zeros(capacity, dtype=np.int32)
+        self._chain = np.zeros(capacity, dtype=np.int32)
+        self._token = np.zeros(capacity, dtype=np.int32)
+        self._amount = np.zeros(capacity, dtype=np.float64)
+        self._units: List[int] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        capacity = max(1, len(self._amount) * 2)
+        for name in ("_wallet", "_chain", "_token", "_amount"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def upsert(self, wallet_address: str, chain_id: str, token_address: str,
+               token_symbol: str, units: int, decimals: int):
+        """Insert or replace the balance for a wallet/token/chain"""
+        wallet = wallet_address.lower()
+        key = (wallet, token_address.lower(), chain_id)
+        row = self._rows.get(key)
+        if row is None:
+            if self._size == len(self._amount):
+                self._grow()
+            row = self._size
+            self._rows[key] = row
+            self._units.append(units)
+            self._size += 1
+        else:
+            self._units[row] = units
+        self._wallet[row] = self.wallets.code(wallet)
+        self._chain[row] = self.chains.code(chain_id)
+        self._token[row] = self.tokens.code((chain_id, token_address.lower(), token_symbol.upper()))
+        self._amount[row] = units / (10 ** decimals)
+
+    def add_balance(self, balance) -> None:
+        """Insert or replace a TokenBalance"""
+        self.upsert(balance.wallet_address, balance.chain_id, balance.token_address,
+                    balance.token_symbol, balance.balance_units, balance.decimals)
+
+    def value(self, prices: PriceTable, wallets: Optional[Iterable[str]] = None,
+              chain_id: Optional[str] = None) -> Dict:
+        """Value every balance in one pass, with totals per wallet, chain and token"""
+        n = self._size
+        amount = self._amount[:n]
+        wallet = self._wallet[:n]
+        chain = self._chain[:n]
+        token = self._token[:n]
+
+        mask = np.ones(n, dtype=bool)
+        if wallets is not None:
+            wanted = [self.wallets._codes[w.lower()] for w in wallets
+                      if w.lower() in self.wallets._codes]
+            mask &= np.isin(wallet, np.asarray(wanted, dtype=np.int32))
+        if chain_id is not None:
+            code = self.chains._codes.get(chain_id, -1)
+            mask &= chain == code
+
+        # One price lookup per distinct token, not per row
+        token_prices = np.full(len(self.tokens), np.nan)
+        for code, (tok_chain, tok_address, symbol) in enumerate(self.tokens.labels):
+            price = prices.get(symbol, tok_chain, tok_address)
+            if price is not None:
+                token_prices[code] = price
+
+        row_prices = token_prices[token] if n else np.zeros(0)
+        priced = mask & ~np.isnan(row_prices)
+        values = np.where(priced, amount * np.nan_to_num(row_prices), 0.0)
+
+        def totals(codes: np.ndarray, labels: List) -> Dict:
+            sums = np.bincount(codes, weights=values, minlength=len(labels))
+            present = np.bincount(codes[mask], minlength=len(labels)) > 0
+            return {labels[i]: round(float(sums[i]), 2) for i in np.flatnonzero(present)}
+
+        by_token = {}
+        token_sums = np.bincount(token, weights=values, minlength=len(self.tokens))
+        token_amounts = np.bincount(token, weights=np.where(mask, amount, 0.0), minlength=len(self.tokens))
+        token_present = np.bincount(token[mask], minlength=len(self.tokens)) > 0
+        for i in np.flatnonzero(token_present):
+            tok_chain, tok_address, symbol = self.tokens.labels[i]
+            price = token_prices[i]
+            by_token[f"{tok_chain}:{symbol}"] = {
+                "token_symbol": symbol,
+                "token_address": tok_address,
+                "chain_id": tok_chain,
+                "amount": float(token_amounts[i]),
+                "price_usd": None if np.isnan(price) else float(price),
+                "value_usd": round(float(token_sums[i]), 2),
+            }
+
+        unpriced = sorted({self.tokens.labels[i][2] for i in np.unique(token[mask & ~priced])})
+
+        return {
+            "total_value_usd": round(float(values.sum()), 2),
+            "by_wallet": totals(wallet, self.wallets.labels),
+            "by_chain": totals(chain, self.chains.labels),
+            "by_token": by_token,
+            "unpriced_tokens": unpriced,
+            "balance_count": int(mask.sum()),
+        }
+
+
+# Price table shared by the API, backed by backend/prices.json when present
+PRICE_TABLE_FILE = os.environ.get(
+    'PRICE_TABLE_FILE', os.path.join(os.path.dirname(__file__), 'prices.json')
+)
+price_table = PriceTable(PRICE_TABLE_FILE, ttl_seconds=float(os.environ.get('PRICE_TABLE_TTL', 300)))
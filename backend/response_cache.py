@@ -0,0 +1,166 @@
+"""
+Response cache for Expense Tracker
+In-process LRU + TTL cache for JSON API responses with write-driven invalidation
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from flask import Response, current_app, request
+
+from single_flight import single_flight
+
+DEFAULT_TENANT = "default"
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of serialized responses with per-entry TTLs
+
+    Entries are tagged with the resources they were computed from
+    (``transactions``, ``categories``). Every write bumps the version of the
+    resources it touched and drops their entries, and the versions are part
+    of the cache key, so a response can never outlive the data behind it.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 30.0):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Tuple, Tuple[float, bytes, int, Tuple[str, ...]]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def version(self, resource: str) -> int:
+        """Current data version of a resource"""
+        return self._versions.get(resource, 0)
+
+    def _remove(self, key):
+        _, body, _, _ = self._entries.pop(key)
+        self._size -= len(body)
+
+    def get(self, key) -> Optional[Tuple[bytes, int]]:
+        """Return ``(body, status)`` for a fresh entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, body, status, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body, status
+
+    def set(self, key, body: bytes, status: int = 200, tags: Iterable[str] = (),
+            ttl: Optional[float] = None):
+        """Store a response body, evicting least recently used entries to fit"""
+        if len(body) > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, body, status, tuple(tags))
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, *resources: str):
+        """Bump resource versions and drop every entry derived from them"""
+        with self._lock:
+            for resource in resources:
+                self._versions[resource] = self._versions.get(resource, 0) + 1
+            stale = [
+                key for key, (_, _, _, tags) in self._entries.items()
+                if any(resource in tags for resource in resources)
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict:
+        """Cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    default_ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 30)),
+)
+
+
+def current_tenant() -> str:
+    """Tenant of the current request (``X-Tenant-ID`` header)"""
+    return request.headers.get('X-Tenant-ID', DEFAULT_TENANT)
+
+
+def cached_response(*resources: str, ttl: Optional[float] = None,
+                    fingerprint: Optional[Callable[[], object]] = None):
+    """Cache a GET view's JSON response keyed on endpoint, query, tenant and data version
+
+    ``fingerprint`` returns a token identifying the on-disk store state, so
+    writes made by other worker processes also change the key. Concurrent
+    misses for the same key are coalesced into one view call.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tenant = current_tenant()
+            query = tuple(sorted((k, tuple(sorted(v))) for k, v in request.args.lists()))
+            versions = tuple(response_cache.version(r) for r in resources)
+            store = fingerprint() if fingerprint else None
+            key = (request.path, query, tenant, versions, store)
+
+            hit = response_cache.get(key)
+            if hit is not None:
+                body, status = hit
+                response = Response(body, status=status, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            def compute():
+                response = current_app.make_response(view(*args, **kwargs))
+                return response.get_data(), response.status_code
+
+            body, status = single_flight.do(
+                key, compute, shared_key=repr((request.path, query, tenant)), fingerprint=store
+            )
+            if status == 200:
+                response_cache.set(key, body, status, resources, ttl)
+            response = Response(body, status=status, mimetype='application/json')
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
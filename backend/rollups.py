@@ -0,0 +1,168 @@
+"""
+Time-series rollups for Expense Tracker
+Income/expense totals precomputed at day, week, month, quarter and year
+resolution so chart series are served without rescanning history
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from dates import GRANULARITIES, month_key, period_key, period_label, week_key
+from fx import BASE_CURRENCY, fx_table
+from money import from_cents
+
+# Upper bound on points in one series, whatever the client asks for
+MAX_POINTS = 1000
+
+
+class TimeSeriesRollups:
+    """Per-granularity ``{category: {bucket: [income, expense]}}`` totals in cents
+
+    Totals are kept in one display currency; rows in other currencies are
+    converted with the FX table (vectorized on rebuild). The rollups are
+    tagged with the data file fingerprint they were built from. Writes in
+    this process apply their delta in place; a fingerprint that moved for
+    any other reason (another worker, an import) triggers a single-pass
+    rebuild on the next read.
+    """
+
+    def __init__(self, currency: str = BASE_CURRENCY):
+        self.currency = currency
+        self._lock = threading.Lock()
+        self._levels: Dict[str, Dict[Optional[str], Dict[int, List[int]]]] = {}
+        self._stamp = None
+        self.rebuilds = 0
+
+    def _apply(self, t: Dict, sign: int, amount: Optional[int] = None):
+        column = 0 if t['type'] == 'income' else 1
+        if amount is None:
+            amount = fx_table.convert_one(t['amount_cents'], t.get('currency', fx_table.base),
+                                          t['day'], self.currency)
+        amount *= sign
+        day = t['day']
+        month = month_key(day)
+        # Same order as GRANULARITIES
+        keys = (day, week_key(day), month, month // 3, month // 12)
+        for granularity, key in zip(GRANULARITIES, keys):
+            level = self._levels[granularity]
+            for category in (None, t['category']):
+                totals = level.setdefault(category, {}).setdefault(key, [0, 0])
+                totals[column] += amount
+                if sign < 0 and totals == [0, 0]:
+                    del level[category][key]
+
+    def rebuild(self, transactions: List[Dict], stamp):
+        """Recompute every level from scratch in one pass"""
+        amounts = fx_table.converted(None, transactions, self.currency)
+        if amounts is None:
+            amounts = [t['amount_cents'] for t in transactions]
+        with self._lock:
+            self._levels = {granularity: {None: {}} for granularity in GRANULARITIES}
+            for t, amount in zip(transactions, amounts):
+                self._apply(t, 1, amount)
+            self._stamp = stamp
+            self.rebuilds += 1
+
+    def ensure(self, stamp, load_transactions):
+        """Rebuild from ``load_transactions()`` unless already at ``stamp``"""
+        if stamp is None or stamp != self._stamp:
+            self.rebuild(load_transactions(), stamp)
+
+    def apply_changes(self, before, after, removed: Iterable[Dict] = (), added: Iterable[Dict] = ()):
+        """Move the rollups from fingerprint ``before`` to ``after`` by a delta
+
+        If the rollups were not at ``before`` they are stale anyway and are
+        left for the next read to rebuild.
+        """
+        with self._lock:
+            if before is None or self._stamp != before:
+                self._stamp = None
+                return
+            for t in removed:
+                self._apply(t, -1)
+            for t in added:
+                self._apply(t, 1)
+            self._stamp = after
+
+    def reset(self):
+        """Drop the rollups so the next read rebuilds them"""
+        with self._lock:
+            self._stamp = None
+
+    def choose_granularity(self, start_day: int, end_day: int, max_points: int) -> str:
+        """Finest granularity whose bucket count over the range fits ``max_points``"""
+        for granularity in GRANULARITIES:
+            span = period_key(granularity, end_day) - period_key(granularity, start_day) + 1
+            if span <= max_points:
+                return granularity
+        return GRANULARITIES[-1]
+
+    def bounds(self, category: Optional[str] = None) -> Optional[tuple]:
+        """First and last day ordinal with data, or None when empty"""
+        days = self._levels.get('day', {}).get(category)
+        if not days:
+            return None
+        return min(days), max(days)
+
+    def series(self, granularity: str, start_day: int, end_day: int,
+               category: Optional[str] = None, max_points: int = 366) -> Dict:
+        """Gap-filled income/expense/net series over an inclusive day range
+
+        When the range has more buckets than ``max_points``, consecutive
+        buckets are summed into equal-width bins so totals are preserved.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity!r}")
+        max_points = max(1, min(max_points, MAX_POINTS))
+        first = period_key(granularity, start_day)
+        last = period_key(granularity, end_day)
+        bucket_size = max(1, math.ceil((last - first + 1) / max_points))
+
+        with self._lock:
+            buckets = self._levels[granularity].get(category, {})
+            periods, income, expense = [], [], []
+            for bin_start in range(first, last + 1, bucket_size):
+                bin_income = bin_expense = 0
+                for key in range(bin_start, min(bin_start + bucket_size, last + 1)):
+                    totals = buckets.get(key)
+                    if totals:
+                        bin_income += totals[0]
+                        bin_expense += totals[1]
+                periods.append(period_label(granularity, bin_start))
+                income.append(bin_income)
+                expense.append(bin_expense)
+
+        return {
+            "granularity": granularity,
+            "bucket_size": bucket_size,
+            "periods": periods,
+            "income": [from_cents(v) for v in income],
+            "expense": [from_cents(v) for v in expense],
+            "net": [from_cents(i - e) for i, e in zip(income, expense)],
+            "totals": {
+                "income": from_cents(sum(income)),
+                "expense": from_cents(sum(expense)),
+                "net": from_cents(sum(income) - sum(expense)),
+            },
+        }
+
+
+# Global rollups for the JSON store, one instance per display currency
+_by_currency: Dict[str, TimeSeriesRollups] = {BASE_CURRENCY: TimeSeriesRollups(BASE_CURRENCY)}
+_by_currency_lock = threading.Lock()
+rollups = _by_currency[BASE_CURRENCY]
+
+
+def rollups_for(currency: str) -> TimeSeriesRollups:
+    """Rollups in ``currency``, created (empty, stale) on first use"""
+    with _by_currency_lock:
+        if currency not in _by_currency:
+            _by_currency[currency] = TimeSeriesRollups(currency)
+        return _by_currency[currency]
+
+
+def all_rollups() -> List[TimeSeriesRollups]:
+    """Every currency's rollups, for carrying writes across"""
+    with _by_currency_lock:
+        return list(_by_currency.values())
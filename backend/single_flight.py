@@ -0,0 +1,127 @@
+"""
+Request coalescing for Expense Tracker
+Lets concurrent identical computations share one in-flight result, within a
+worker and optionally across gunicorn workers through a lock directory
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+Result = Tuple[bytes, int]
+
+
+class _Call:
+    """An in-flight computation that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Result] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single execution
+
+    Within a process, followers block on the leader's event. When
+    ``shared_dir`` is set, leaders in different processes also serialize on
+    an ``flock`` per key, and the winner writes its result to a shared file
+    that workers who were waiting on the lock pick up instead of recomputing.
+    """
+
+    def __init__(self, shared_dir: Optional[str] = None):
+        self.shared_dir = shared_dir
+        self._calls: Dict[object, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.shared_hits = 0
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def do(self, key, fn: Callable[[], Result], shared_key: Optional[str] = None,
+           fingerprint: object = None) -> Result:
+        """Run ``fn`` once for all concurrent callers with the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.shared_dir and shared_key is not None:
+                call.result = self._do_shared(shared_key, fingerprint, fn)
+            else:
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_shared(self, shared_key: str, fingerprint: object, fn: Callable[[], Result]) -> Result:
+        name = hashlib.sha1(shared_key.encode()).hexdigest()
+        lock_path = os.path.join(self.shared_dir, name + '.lock')
+        result_path = os.path.join(self.shared_dir, name + '.result')
+        header = json.dumps(fingerprint, default=str)
+        started = time.time_ns()
+
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                shared = self._read_result(result_path, header, started)
+                if shared is not None:
+                    self.shared_hits += 1
+                    return shared
+                body, status = fn()
+                tmp_path = f"{result_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(json.dumps({"fingerprint": header, "status": status}).encode() + b'\n')
+                    f.write(body)
+                os.replace(tmp_path, result_path)
+                return body, status
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_result(path: str, header: str, started: int) -> Optional[Result]:
+        """Read a result another worker finished while this one waited"""
+        try:
+            if os.stat(path).st_mtime_ns < started:
+                return None
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get("fingerprint") != header:
+            return None
+        return body, meta["status"]
+
+    def stats(self) -> Dict:
+        """Coalescing counters"""
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "shared_hits": self.shared_hits,
+            "in_flight": len(self._calls),
+        }
+
+
+single_flight = SingleFlight(shared_dir=os.environ.get('SINGLE_FLIGHT_DIR') or None)
@@ -0,0 +1,480 @@
+"""
+Columnar binary snapshot for Expense Tracker
+The JSON store's transactions packed into fixed-width columns plus a string
+table of full records, memory-mapped so every worker shares the same pages
+and serves report aggregates from NumPy views without parsing data.json.
+A date index lets the ledger page through the rows newest first. Writes
+are journaled beside it and laid over the mapped snapshot until it is
+rewritten
+"""
+
+import bisect
+import fcntl
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from aggregation import partial_aggregate
+from dates import month_key, to_day
+from fx import fx_table
+
+MAGIC = b'ETSNAP02'
+# Magic, row count, data file fingerprint (mtime_ns, size), metadata offset and length
+HEADER = struct.Struct('<8sqqqqq')
+
+# Fixed-width columns in file order; each starts on an 8-byte boundary
+COLUMNS = (
+    ('day', np.int32),
+    ('month', np.int32),
+    ('amount_cents', np.int64),
+    ('type', np.uint8),
+    ('category', np.uint16),
+    ('currency', np.uint8),
+)
+TYPES = ('income', 'expense')
+
+
+def date_key(t: Dict) -> Tuple[int, str]:
+    """``(day, id)`` order of the date index, the ledger's ``(date, id)`` order for stored rows"""
+    return t['day'], t['id']
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // 8) * 8
+
+
+def _code(codes: Dict[str, int], name: str, column: str) -> int:
+    """Code of ``name`` in a string-coded column, rejecting more names than its dtype can hold"""
+    code = codes.get(name)
+    if code is None:
+        code = codes[name] = len(codes)
+        limit = int(np.iinfo(dict(COLUMNS)[column]).max)
+        if code > limit:
+            raise ValueError(f"A snapshot holds at most {limit + 1} distinct values of {column}")
+    return code
+
+
+def write_snapshot(path: str, transactions: List[Dict], fingerprint: Tuple[int, int]):
+    """Write ``transactions`` as a snapshot of the data file at ``fingerprint``
+
+    Rows keep their order, so a row's index matches its position in
+    data.json; ``by_date`` lists the indices in :func:`date_key` order. The file is written beside ``path`` and atomically replaced;
+    workers still mapping the previous file keep reading it safely. Raises
+    ValueError when there are more categories or currencies than their
+    columns can code.
+    """
+    count = len(transactions)
+    categories: Dict[str, int] = {}
+    currencies: Dict[str, int] = {}
+    columns = {name: np.empty(count, dtype) for name, dtype in COLUMNS}
+    records = []
+    for i, t in enumerate(transactions):
+        columns['day'][i] = t['day']
+        columns['month'][i] = month_key(t['day'])
+        columns['amount_cents'][i] = t['amount_cents']
+        columns['type'][i] = TYPES.index(t['type'])
+        columns['category'][i] = _code(categories, t['category'], 'category')
+        columns['currency'][i] = _code(currencies, t.get('currency', fx_table.base), 'currency')
+        records.append(json.dumps(t, separators=(',', ':')).encode())
+    offsets = np.zeros(count + 1, np.uint64)
+    np.cumsum([len(r) for r in records], out=offsets[1:])
+    by_date = np.array(sorted(range(count), key=lambda i: date_key(transactions[i])), dtype=np.int64)
+
+    layout = {}
+    position = HEADER.size
+    for name, array in (*columns.items(), ('record_offsets', offsets), ('by_date', by_date)):
+        position = _aligned(position)
+        layout[name] = [position, array.dtype.str]
+        position += array.nbytes
+    layout['records'] = [position, None]
+    position += int(offsets[-1])
+    meta = json.dumps({"columns": layout, "categories": list(categories),
+                       "currencies": list(currencies)}).encode()
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, count, fingerprint[0], fingerprint[1], position, len(meta)))
+        for name, array in (*columns.items(), ('record_offsets', offsets), ('by_date', by_date)):
+            f.write(b'\0' * (layout[name][0] - f.tell()))
+            f.write(array.tobytes())
+        f.writelines(records)
+        f.write(meta)
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    """A memory-mapped snapshot; columns are read-only zero-copy NumPy views"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, mtime, size, meta_offset, meta_length = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an expense snapshot")
+        self.fingerprint = (mtime, size)
+        meta = json.loads(self._map[meta_offset:meta_offset + meta_length])
+        self.category_names: List[str] = meta['categories']
+        self.currency_names: List[str] = meta['currencies']
+        layout = meta['columns']
+        for name in (*(name for name, _ in COLUMNS), 'record_offsets', 'by_date'):
+            offset, dtype = layout[name]
+            count = self.count + 1 if name == 'record_offsets' else self.count
+            setattr(self, name, np.frombuffer(self._map, dtype=np.dtype(dtype), count=count, offset=offset))
+        self._records_offset = layout['records'][0]
+        self._converted: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, index: int) -> Dict:
+        """The stored transaction at ``index``, decoded from the string table"""
+        start = self._records_offset + int(self.record_offsets[index])
+        end = self._records_offset + int(self.record_offsets[index + 1])
+        return json.loads(self._map[start:end])
+
+    def iter_by_date(self, before: Optional[Tuple[str, str]] = None) -> Iterator[Dict]:
+        """Rows newest first by :func:`date_key`, after an optional ``(date, id)`` cursor
+
+        The cursor is found by bisecting the date index, so a page decodes
+        only its own rows plus a logarithmic number of probes.
+        """
+        end = self.count
+        if before is not None:
+            end = bisect.bisect_left(self.by_date, (to_day(before[0]), before[1]),
+                                     key=lambda index: date_key(self.record(int(index))))
+        return (self.record(int(self.by_date[position])) for position in range(end - 1, -1, -1))
+
+    def converted(self, to_currency: str, max_entries: int = 4) -> np.ndarray:
+        """Amounts in ``to_currency`` cents, cached per FX rates version"""
+        if self.currency_names in ([], [to_currency]):
+            return self.amount_cents
+        key = (to_currency, fx_table.version)
+        with self._lock:
+            if key in self._converted:
+                return self._converted[key]
+        result = self.amount_cents.astype(np.float64)
+        target = fx_table.rates(to_currency, self.day) if to_currency != fx_table.base else None
+        for code, currency in enumerate(self.currency_names):
+            mask = self.currency == code
+            if currency != to_currency:
+                result[mask] /= fx_table.rates(currency, self.day[mask])
+                if target is not None:
+                    result[mask] *= target[mask]
+        amounts = np.rint(result).astype(np.int64)
+        with self._lock:
+            self._converted[key] = amounts
+            while len(self._converted) > max_entries:
+                self._converted.popitem(last=False)
+        return amounts
+
+    def partial(self, start_day: int, to_currency: str, top_n: int = 5) -> Dict:
+        """Same partial aggregate as ``aggregation.partial_aggregate`` over every row
+
+        Sums accumulate in int64 cents; float weights would round totals past 2**53.
+        """
+        amounts = self.converted(to_currency)
+        selected = self.day >= start_day
+        partial = {"count": int(np.count_nonzero(selected)), "categories": {}, "months": {}}
+        months = self.month[selected]
+        first_month = int(months.min()) if len(months) else 0
+        for column, kind in enumerate(TYPES):
+            mask = selected & (self.type == column)
+            values = amounts[mask]
+            partial[kind] = int(values.sum())
+            by_category = np.zeros(len(self.category_names), dtype=np.int64)
+            np.add.at(by_category, self.category[mask], values)
+            counts = np.bincount(self.category[mask], minlength=len(self.category_names))
+            for code in np.flatnonzero(counts):
+                totals = partial['categories'].setdefault(self.category_names[code], [0, 0, 0])
+                totals[column] = int(by_category[code])
+                totals[2] += int(counts[code])
+            month_offsets = self.month[mask] - first_month
+            by_month = np.zeros(int(month_offsets.max()) + 1 if len(month_offsets) else 0, dtype=np.int64)
+            np.add.at(by_month, month_offsets, values)
+            for offset in np.flatnonzero(np.bincount(month_offsets)):
+                partial['months'].setdefault(first_month + int(offset), [0, 0])[column] = int(by_month[offset])
+            partial[f"top_{kind}"] = self._top(np.flatnonzero(mask), amounts, top_n)
+        return partial
+
+    @staticmethod
+    def _top(indices: np.ndarray, amounts: np.ndarray, top_n: int) -> List[tuple]:
+        """``(amount, -index)`` entries of the largest amounts, earlier rows first among ties"""
+        values = amounts[indices]
+        if len(values) > top_n:
+            threshold = np.partition(values, len(values) - top_n)[len(values) - top_n]
+            keep = values >= threshold
+            indices, values = indices[keep], values[keep]
+        return heapq.nlargest(top_n, zip(values.tolist(), (-indices).tolist()))
+
+
+def _converted(rows: List[Dict], to_currency: str) -> List[int]:
+    """Amounts of plain rows in ``to_currency`` cents, rounded exactly like ``Snapshot.converted``"""
+    if not rows:
+        return []
+    return fx_table.convert([t['amount_cents'] for t in rows], [t.get('currency', fx_table.base) for t in rows],
+                            [t['day'] for t in rows], to_currency).tolist()
+
+
+class SnapshotView:
+    """A mapped snapshot with the rows removed and added by later writes laid over it
+
+    Indices past the snapshot's own rows address the added rows, so
+    ``count`` is the size of that index space, not the number of live rows.
+    Among equal amounts, top-N entries rank snapshot rows before added ones.
+    """
+
+    def __init__(self, base: Snapshot, fingerprint, removed: List[Dict], added: List[Dict]):
+        self.base = base
+        self.fingerprint = fingerprint
+        self.removed = removed
+        self.added = added
+        self.count = base.count + len(added)
+        self._removed_ids = {t['id'] for t in removed}
+
+    @property
+    def delta_rows(self) -> int:
+        return len(self.removed) + len(self.added)
+
+    def record(self, index: int) -> Dict:
+        if index < self.base.count:
+            return self.base.record(index)
+        return self.added[index - self.base.count]
+
+    def iter_by_date(self, before: Optional[Tuple[str, str]] = None) -> Iterator[Dict]:
+        """The snapshot's rows newest first less the removed ones, merged with the added ones"""
+        base = (t for t in self.base.iter_by_date(before) if t['id'] not in self._removed_ids)
+        after = None if before is None else (to_day(before[0]), before[1])
+        added = sorted((t for t in self.added if after is None or date_key(t) < after), key=date_key, reverse=True)
+        return heapq.merge(base, added, key=date_key, reverse=True)
+
+    def partial(self, start_day: int, to_currency: str, top_n: int = 5) -> Dict:
+        """The snapshot's partial aggregate, less the removed rows, plus the added ones"""
+        partial = self.base.partial(start_day, to_currency, top_n + len(self.removed))
+        removed = partial_aggregate(self.removed, _converted(self.removed, to_currency), 0, len(self.removed),
+                                    start_day, top_n)
+        added = partial_aggregate(self.added, _converted(self.added, to_currency), 0, len(self.added),
+                                  start_day, top_n)
+        for key in ('income', 'expense', 'count'):
+            partial[key] += added[key] - removed[key]
+        for key, width in (('categories', 3), ('months', 2)):
+            totals = partial[key]
+            for sign, delta in ((-1, removed), (1, added)):
+                for name, values in delta[key].items():
+                    current = totals.setdefault(name, [0] * width)
+                    for i, value in enumerate(values):
+                        current[i] += sign * value
+            for name in [name for name, values in totals.items() if not any(values)]:
+                del totals[name]
+        for kind in TYPES:
+            kept = []
+            # Snapshot entries come largest first; decode only until enough survive
+            for amount, negative_index in partial[f"top_{kind}"]:
+                if len(kept) == top_n:
+                    break
+                if self.base.record(-negative_index)['id'] not in self._removed_ids:
+                    kept.append((amount, negative_index))
+            kept.extend((amount, negative_index - self.base.count) for amount, negative_index in added[f"top_{kind}"])
+            partial[f"top_{kind}"] = heapq.nlargest(top_n, kept)
+        return partial
+
+
+class SnapshotStore:
+    """The current snapshot of the data file, carried across writes by a delta journal
+
+    Writers append each write's removed and added rows to a journal beside
+    the snapshot. ``get`` returns the mapped snapshot when it matches the
+    data file fingerprint, and otherwise lays the journal's net delta over
+    it. The snapshot is rewritten, by one worker under an ``flock``, only
+    when the journal cannot bridge the gap (archiving, imports, a lost
+    entry), or in the background once the delta grows past
+    ``max_delta_rows`` or the journal past half of ``max_journal_bytes``.
+    """
+
+    def __init__(self, path: str, max_delta_rows: int = 5000, max_journal_bytes: int = 2 * 1024 * 1024):
+        self.path = path
+        self.journal_path = f"{path}.delta"
+        self.max_delta_rows = max_delta_rows
+        self.max_journal_bytes = max_journal_bytes
+        self._snapshot: Optional[Snapshot] = None
+        self._current = None
+        self._journal_bytes = 0
+        self._lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self.writes = 0
+        self.maps = 0
+        self.overlays = 0
+
+    def record_change(self, before, after, removed: Iterable[Dict] = (), added: Iterable[Dict] = ()):
+        """Journal a write that moved the data file from fingerprint ``before`` to ``after``
+
+        A journal past ``max_journal_bytes`` (nobody has read a snapshot in
+        a long while) is emptied, so the next ``get`` rewrites the snapshot.
+        """
+        if before is None or after is None:
+            return
+        line = json.dumps({"before": list(before), "after": list(after), "removed": list(removed),
+                           "added": list(added)}, separators=(',', ':')).encode() + b'\n'
+        with open(self.journal_path, 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if f.seek(0, os.SEEK_END) > self.max_journal_bytes:
+                    f.truncate(0)
+                f.write(line)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _journal(self) -> List[Dict]:
+        try:
+            with open(self.journal_path, 'rb') as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                raw = f.read()
+        except OSError:
+            raw = b''
+        self._journal_bytes = len(raw)
+        entries = []
+        for line in raw.splitlines(keepends=True):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries.append({**entry, "before": tuple(entry['before']), "after": tuple(entry['after'])})
+        return entries
+
+    def _trim(self, fingerprint):
+        """Drop journal entries for writes the snapshot at ``fingerprint`` already contains"""
+        try:
+            f = open(self.journal_path, 'r+b')
+        except OSError:
+            return
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            lines = f.read().splitlines(keepends=True)
+            start = len(lines)
+            for i, line in enumerate(lines):
+                try:
+                    if tuple(json.loads(line)['before']) == fingerprint:
+                        start = i
+                        break
+                except (ValueError, KeyError):
+                    continue
+            f.seek(0)
+            f.writelines(lines[start:])
+            f.truncate()
+
+    def _open(self) -> Optional[Snapshot]:
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return None
+        if self._snapshot is None or self._snapshot.inode != inode:
+            try:
+                self._snapshot = Snapshot(self.path)
+            except (OSError, ValueError, struct.error):
+                return None
+            self.maps += 1
+        return self._snapshot
+
+    def _carry(self, fingerprint):
+        """The mapped snapshot at ``fingerprint``, directly or through the journal; None if neither reaches it"""
+        snapshot = self._open()
+        if snapshot is None or snapshot.fingerprint == fingerprint:
+            return snapshot
+        current = snapshot.fingerprint
+        removed: Dict[str, Dict] = {}
+        added: Dict[str, Dict] = {}
+        for entry in self._journal():
+            if current == fingerprint:
+                break
+            if entry['before'] != current:
+                continue
+            for t in entry['removed']:
+                if added.pop(t['id'], None) is None:
+                    removed[t['id']] = t
+            for t in entry['added']:
+                added[t['id']] = t
+            current = entry['after']
+        if current != fingerprint:
+            return None
+        self.overlays += 1
+        return SnapshotView(snapshot, fingerprint, list(removed.values()), list(added.values()))
+
+    def _write(self, load_transactions: Callable[[], Tuple[List[Dict], Optional[Tuple[int, int]]]]) -> bool:
+        transactions, fingerprint = load_transactions()
+        if fingerprint is None:
+            return False
+        write_snapshot(self.path, transactions, fingerprint)
+        self.writes += 1
+        self._trim(fingerprint)
+        return True
+
+    def compact(self, load_transactions: Callable[[], Tuple[List[Dict], Optional[Tuple[int, int]]]],
+                wait: bool = True) -> bool:
+        """Rewrite the snapshot from ``load_transactions()``, which returns rows and their data fingerprint
+
+        Without ``wait`` it gives up when another worker is already writing one.
+        """
+        with open(f"{self.path}.lock", 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            written = self._write(load_transactions)
+        if written:
+            # Map the new snapshot instead of carrying on with a view over the old one
+            self._current = None
+        return written
+
+    def _compact_in_background(self, load_transactions):
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, args=(load_transactions, False),
+                                                name='snapshot-compaction', daemon=True)
+            self._compaction.start()
+
+    def get(self, fingerprint, load_transactions: Callable[[], Tuple[List[Dict], Optional[Tuple[int, int]]]]):
+        """Snapshot (or journal view) at ``fingerprint``, None when there is no data file to snapshot
+
+        ``load_transactions`` returns the stored rows and the fingerprint of
+        the file they were read from; when that is newer than ``fingerprint``
+        the returned snapshot is of the newer file.
+        """
+        if fingerprint is None:
+            return None
+        current = self._current
+        if current is not None and current.fingerprint == fingerprint:
+            return current
+        with self._lock:
+            snapshot = self._carry(fingerprint)
+            if snapshot is None:
+                with open(f"{self.path}.lock", 'w') as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    # Another worker may have written one while this one waited
+                    snapshot = self._carry(fingerprint)
+                    if snapshot is None and self._write(load_transactions):
+                        snapshot = self._open()
+            self._current = snapshot
+        if isinstance(snapshot, SnapshotView) and (snapshot.delta_rows > self.max_delta_rows
+                                                   or self._journal_bytes > self.max_journal_bytes // 2):
+            self._compact_in_background(load_transactions)
+        return snapshot
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        current = self._current
+        return {"writes": self.writes, "maps": self.maps, "overlays": self.overlays,
+                "rows": snapshot.count if snapshot else 0,
+                "delta_rows": current.delta_rows if isinstance(current, SnapshotView) else 0,
+                "journal_bytes": self._journal_bytes}
+
+
+# Snapshot of the JSON store, backed by backend/data.snapshot by default
+snapshot_store = SnapshotStore(os.environ.get(
+    'SNAPSHOT_FILE', os.path.join(os.path.dirname(__file__), 'data.snapshot')
+))
@@ -0,0 +1,125 @@
+"""
+Delta sync for Expense Tracker
+Every transaction and category carries the store-wide version of its last
+write and deletes leave tombstones, so clients holding a local replica can
+ask for just what changed since the version they last saw
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Resources replicated to clients, with the response key holding their rows
+SYNC_RESOURCES = {'transaction': 'transactions', 'category': 'categories'}
+
+# Tombstones kept in data.json; clients further behind than the oldest one
+# are told to resync from scratch
+MAX_TOMBSTONES = 10000
+
+# Largest page a single sync request returns
+MAX_SYNC_LIMIT = 5000
+
+
+def _number_rows(data: Dict, version: int) -> int:
+    """Give every row a distinct version after ``version``, oldest first"""
+    for key in SYNC_RESOURCES.values():
+        for row in reversed(data.get(key, [])):
+            version += 1
+            row['version'] = version
+    return version
+
+
+def init_sync(data: Dict) -> Dict:
+    """Add sync state to a data.json payload, versioning the existing rows"""
+    if 'sync' not in data:
+        data['sync'] = {"version": _number_rows(data, 0), "purged_through": 0, "tombstones": []}
+    return data['sync']
+
+
+def bump(data: Dict, row: Dict) -> int:
+    """Stamp a written row with the next store version"""
+    sync = data['sync']
+    sync['version'] += 1
+    row['version'] = sync['version']
+    row['updated_at'] = datetime.now().isoformat()
+    return sync['version']
+
+
+def tombstone(data: Dict, resource: str, row_id: str) -> int:
+    """Record a delete, dropping the oldest tombstones past ``MAX_TOMBSTONES``"""
+    sync = data['sync']
+    sync['version'] += 1
+    tombstones = [t for t in sync['tombstones'] if not (t['resource'] == resource and t['id'] == row_id)]
+    tombstones.append({"resource": resource, "id": row_id, "version": sync['version'],
+                       "deleted_at": datetime.now().isoformat()})
+    if len(tombstones) > MAX_TOMBSTONES:
+        dropped = tombstones[:-MAX_TOMBSTONES]
+        sync['purged_through'] = max(t['version'] for t in dropped)
+        tombstones = tombstones[-MAX_TOMBSTONES:]
+    sync['tombstones'] = tombstones
+    return sync['version']
+
+
+def restart(data: Dict, previous: Optional[Dict] = None) -> Dict:
+    """Re-version a wholesale replacement (an import) past the previous state
+
+    Every row gets a new version and older tombstones are purged, so any
+    client that synced before the replacement is told to start over.
+    """
+    start = (previous or {}).get('version', 0)
+    data['sync'] = {"version": _number_rows(data, start), "purged_through": start + 1,
+                    "tombstones": []}
+    return data['sync']
+
+
+def changes_page(since: int, version: int, purged_through: int,
+                 changed: Iterable[Tuple[str, Dict]], deleted: Iterable[Dict],
+                 limit: int) -> Dict:
+    """Merge changed rows and tombstones after ``since`` into one page
+
+    ``changed`` holds ``(resource, row)`` pairs. The page is cut at
+    ``limit`` entries in version order but never between two entries of the
+    same version, so ``next_since`` is always safe to resume from.
+    """
+    if since > version or (since > 0 and since < purged_through):
+        return {"since": since, "version": version, "next_since": 0, "has_more": True, "reset": True,
+                **{key: [] for key in SYNC_RESOURCES.values()}, "deleted": []}
+
+    entries: List[Tuple[int, str, Dict]] = [(row['version'], resource, row) for resource, row in changed]
+    if since > 0:
+        entries.extend((t['version'], 'deleted', t) for t in deleted)
+    entries.sort(key=lambda entry: entry[0])
+
+    cut = len(entries)
+    if cut > limit:
+        cut = limit
+        while cut < len(entries) and entries[cut][0] == entries[cut - 1][0]:
+            cut += 1
+    page = entries[:cut]
+
+    result = {key: [] for key in SYNC_RESOURCES.values()}
+    result['deleted'] = []
+    for _, resource, row in page:
+        result[SYNC_RESOURCES.get(resource, 'deleted')].append(row)
+    has_more = cut < len(entries)
+    return {
+        "since": since,
+        "version": version,
+        "next_since": page[-1][0] if has_more else max(version, since),
+        "has_more": has_more,
+        "reset": False,
+        **result,
+    }
+
+
+def changes_since(data: Dict, since: int, limit: int, archived: Iterable[Dict] = ()) -> Dict:
+    """Delta of a data.json payload after version ``since``
+
+    ``archived`` holds transactions moved out of the payload into the
+    archive; they keep their versions, so they are merged in like hot rows.
+    """
+    sync = data['sync']
+    changed = [(resource, row) for resource, key in SYNC_RESOURCES.items()
+               for row in data.get(key, []) if row.get('version', 1) > since]
+    changed.extend(('transaction', row) for row in archived if row.get('version', 1) > since)
+    deleted = [t for t in sync['tombstones'] if t['version'] > since]
+    return changes_page(since, sync['version'], sync.get('purged_through', 0), changed, deleted, limit)
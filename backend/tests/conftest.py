@@ -0,0 +1,74 @@
+"""
+Shared fixtures for the backend tests
+Every on-disk store is pointed at a temporary directory before the app
+modules are imported, and each app test gets fresh stores of its own
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_scratch = tempfile.mkdtemp(prefix='expense-tests-')
+for _name, _path in {
+    'DATA_FILE': 'data.json',
+    'DATABASE_PATH': 'expense_tracker.db',
+    'CHANGE_FEED_FILE': 'changes.log',
+    'JOBS_DB': 'jobs.db',
+    'JOB_RESULTS_DIR': 'job_results',
+    'ARCHIVE_DIR': 'archive',
+    'SNAPSHOT_FILE': 'data.snapshot',
+    'PROFILE_DIR': 'profiles',
+    'FX_RATES_FILE': 'fx_rates.json',
+}.items():
+    os.environ[_name] = os.path.join(_scratch, _path)
+
+import app as app_module  # noqa: E402
+import database as database_module  # noqa: E402
+from anomalies import anomaly_detector  # noqa: E402
+from archive import ArchiveStore  # noqa: E402
+from budgets import budget_engine  # noqa: E402
+from categorize import categorizer  # noqa: E402
+from change_feed import ChangeFeed  # noqa: E402
+from fx import fx_table  # noqa: E402
+from response_cache import response_cache  # noqa: E402
+from rollups import all_rollups  # noqa: E402
+from snapshot import SnapshotStore  # noqa: E402
+
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    """The app module writing to an empty data directory of its own"""
+    feed = ChangeFeed(str(tmp_path / 'changes.log'))
+    monkeypatch.setattr(app_module, 'DATA_FILE', str(tmp_path / 'data.json'))
+    monkeypatch.setattr(app_module, 'archive_store', ArchiveStore(str(tmp_path / 'archive')))
+    monkeypatch.setattr(app_module, 'snapshot_store', SnapshotStore(str(tmp_path / 'data.snapshot')))
+    monkeypatch.setattr(app_module, 'change_feed', feed)
+    monkeypatch.setattr(database_module, 'change_feed', feed)
+    response_cache.clear()
+    for series in all_rollups():
+        series.reset()
+    budget_engine.reset()
+    anomaly_detector.reset()
+    categorizer.reset()
+    return app_module
+
+
+@pytest.fixture
+def client(app_env):
+    return app_env.app.test_client()
+
+
+@pytest.fixture
+def eur_rates(monkeypatch):
+    """EUR rates of 0.5 (2024) and 0.8 (2025) per USD, dropped again after the test"""
+    monkeypatch.setattr(fx_table, '_rates', fx_table._rates)
+    monkeypatch.setattr(fx_table, '_version', fx_table._version)
+    fx_table.set_rate('EUR', '2024-01-01', 0.5)
+    fx_table.set_rate('EUR', '2025-01-01', 0.8)
+    return fx_table
+
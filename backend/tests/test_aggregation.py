@@ -0,0 +1,69 @@
+"""Tests for partial aggregates and the reports merged from them"""
+
+import random
+
+from aggregation import ParallelAggregator, merge_partials, partial_aggregate, summed_partial
+from snapshot import Snapshot, write_snapshot
+
+
+def rows(count, seed=7):
+    generator = random.Random(seed)
+    return [{"id": str(i), "type": generator.choice(('income', 'expense')), "amount_cents": generator.randint(1, 5000),
+             "category": generator.choice(('Food', 'Rent', 'Salary')), "day": 739000 + generator.randint(0, 400)}
+            for i in range(count)]
+
+
+def test_partials_of_any_slices_merge_into_the_serial_result():
+    transactions = rows(500)
+    amounts = [t['amount_cents'] for t in transactions]
+    serial = merge_partials([partial_aggregate(transactions, amounts, 0, 500, 739100)])
+    sliced = merge_partials([partial_aggregate(transactions, amounts, start, min(start + 70, 500), 739100)
+                             for start in range(0, 500, 70)])
+    assert sliced == serial
+    assert serial['count'] == sum(1 for t in transactions if t['day'] >= 739100)
+
+
+def test_top_entries_prefer_earlier_rows_among_equal_amounts():
+    transactions = [{"type": "expense", "amount_cents": 100, "category": "Food", "day": 739000} for _ in range(4)]
+    merged = merge_partials([partial_aggregate(transactions, [100] * 4, 0, 4, top_n=2)], top_n=2)
+    assert merged['top_expense'] == [(100, 0), (100, 1)]
+
+
+def test_snapshot_partial_matches_the_row_aggregate(tmp_path):
+    transactions = rows(300)
+    write_snapshot(str(tmp_path / 'data.snapshot'), transactions, (1, 1))
+    snapshot = Snapshot(str(tmp_path / 'data.snapshot'))
+    amounts = [t['amount_cents'] for t in transactions]
+
+    assert (merge_partials([snapshot.partial(739200, 'USD')])
+            == merge_partials([partial_aggregate(transactions, amounts, 0, 300, 739200)]))
+
+
+def test_summed_rows_count_every_row_they_stand_for():
+    sums = [{"type": "expense", "category": "Food", "day": 739000, "count": 3}]
+    candidates = [{"type": "expense"}]
+    partial = summed_partial(sums, [900], candidates, [500], offset=10)
+    assert partial['count'] == 3
+    assert partial['categories'] == {"Food": [0, 900, 3]}
+    assert merge_partials([partial])['top_expense'] == [(500, 10)]
+
+
+def test_the_process_pool_merges_into_the_serial_result():
+    transactions = rows(2000)
+    amounts = [t['amount_cents'] for t in transactions]
+    archived = summed_partial([], [], [{"type": "expense"}], [10 ** 6], offset=2000)
+    serial = ParallelAggregator(max_workers=1, min_rows=0)
+    pooled = ParallelAggregator(max_workers=3, min_rows=0)
+    try:
+        expected = serial.aggregate(transactions, amounts, 739100, extra=[archived])
+        assert pooled.aggregate(transactions, amounts, 739100, extra=[archived]) == expected
+    finally:
+        pooled.close()
+    assert expected['top_expense'][0] == (10 ** 6, 2000)
+    assert (serial.stats()['serial_runs'], pooled.stats()['parallel_runs']) == (1, 1)
+
+
+def test_small_reports_stay_in_process():
+    aggregator = ParallelAggregator(max_workers=4, min_rows=100)
+    aggregator.aggregate(rows(99), [1] * 99)
+    assert aggregator.stats()['serial_runs'] == 1 and aggregator._executor is None
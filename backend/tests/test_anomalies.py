@@ -0,0 +1,67 @@
+"""Tests for anomaly detection on transaction writes"""
+
+from anomalies import AnomalyDetector
+
+
+def cafe(amount, day=10):
+    return {"type": "expense", "amount": amount, "category": "Cafe", "merchant_name": "Corner Cafe",
+            "description": "Coffee", "date": f"2025-10-{day:02d}"}
+
+
+def history(client):
+    for day, amount in enumerate((4.5, 5.2, 3.9, 6.1, 4.8, 5.5, 4.2, 5.9, 4.4, 5.1, 6.3, 3.7, 5.0, 4.6, 5.4), 1):
+        client.post('/api/transactions', json=cafe(amount, day))
+
+
+def anomaly_events(app_env):
+    events, _ = app_env.change_feed.read_since(0)
+    return [e for e in events if e['type'] == 'anomaly']
+
+
+def test_a_write_publishes_the_anomaly_it_causes(client, app_env):
+    history(client)
+    assert anomaly_events(app_env) == []
+
+    spike = client.post('/api/transactions', json=cafe(5000, 20)).get_json()['id']
+    flagged = anomaly_events(app_env)
+    assert [e['data']['transaction_id'] for e in flagged] == [spike]
+    assert {r['scope'] for r in flagged[0]['data']['reasons']} == {'category', 'merchant'}
+
+
+def test_anomalies_are_flagged_after_another_worker_wrote(client, app_env):
+    history(client)
+    data = app_env.load_data()
+    data['transactions'].insert(0, app_env.new_transaction_from_body(cafe(5.3, 16)))
+    # Another worker's write leaves this process's statistics behind the file
+    app_env.save_data(data)
+
+    spike = client.post('/api/transactions', json=cafe(5000, 20)).get_json()['id']
+    assert [e['data']['transaction_id'] for e in anomaly_events(app_env)] == [spike]
+
+
+def test_updating_a_row_into_an_outlier_flags_it(client, app_env):
+    history(client)
+    row = client.post('/api/transactions', json=cafe(5, 20)).get_json()['id']
+    client.put(f'/api/transactions/{row}', json={"amount": 4000})
+    assert [e['data']['transaction_id'] for e in anomaly_events(app_env)] == [row]
+
+    anomalies = client.get('/api/anomalies').get_json()['anomalies']
+    assert [a['transaction_id'] for a in anomalies] == [row]
+
+
+def test_a_rebuild_finds_what_streaming_ingest_found():
+    rows = [{"id": str(i), "type": "expense", "amount_cents": 500 + (i % 7) * 40, "category": "Cafe",
+             "day": 739000 + i, "date": f"day-{i}"} for i in range(20)]
+    rows.append({"id": "spike", "type": "expense", "amount_cents": 90000, "category": "Cafe", "day": 739030,
+                 "date": "day-30"})
+    streamed = AnomalyDetector()
+    streamed.rebuild([], 0)
+    found = []
+    for stamp, t in enumerate(rows, 1):
+        found += streamed.apply_changes(stamp - 1, stamp, added=[t])
+
+    replayed = AnomalyDetector()
+    # Stored newest first, as data.json keeps them
+    replayed.rebuild(list(reversed(rows)), 'replayed')
+    assert [a['transaction_id'] for a in found] == ['spike']
+    assert [a['transaction_id'] for a in replayed.anomalies()] == ['spike']
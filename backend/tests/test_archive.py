@@ -0,0 +1,132 @@
+"""Tests for the cold history archive and how archived rows stay reachable"""
+
+from datetime import datetime
+
+import pytest
+
+from archive import ArchiveStore, year_start
+from jobs import job_queue
+
+
+def expense(date, description='Old', amount=10):
+    return {"type": "expense", "amount": amount, "category": "Shopping", "description": description, "date": date}
+
+
+@pytest.fixture
+def archived(client):
+    """Two transactions from 2023 moved into the archive"""
+    ids = [client.post('/api/transactions', json=expense(date)).get_json()['id']
+           for date in ('2023-02-01', '2023-09-15')]
+    assert client.post('/api/archive', json={"before": "2024-01-01"}).get_json()['archived'] == 2
+    return ids
+
+
+def test_archived_rows_round_trip_through_the_segment(client, app_env, archived):
+    hot = {t['id'] for t in app_env.load_data()['transactions']}
+    assert not hot & set(archived)
+
+    segment = app_env.archive_store.segments()[0]
+    assert segment['year'] == 2023 and segment['rows'] == 2
+    restored = app_env.archive_store.read_segment(segment)
+    assert {t['id'] for t in restored} == set(archived)
+    assert [t['description'] for t in restored] == ['Old', 'Old']
+
+    listed = client.get('/api/transactions?start_date=2023-01-01&end_date=2023-12-31').get_json()['transactions']
+    assert {t['id'] for t in listed} == set(archived)
+
+
+def test_archived_rows_keep_counting_in_the_summary(client, archived):
+    summary = client.get('/api/transactions').get_json()['summary']
+    exported = client.get('/api/export').get_json()['data']['transactions']
+    assert summary['transaction_count'] == len(exported)
+    assert set(archived) <= {t['id'] for t in exported}
+
+
+def test_full_sync_includes_archived_rows(client, archived):
+    delta = client.get('/api/sync?since=0&limit=5000').get_json()
+    assert set(archived) <= {t['id'] for t in delta['transactions']}
+
+    version = delta['version']
+    assert client.get(f'/api/sync?since={version}').get_json()['transactions'] == []
+
+
+def test_incremental_sync_skips_segments_without_newer_rows(client, app_env, archived):
+    version = client.get('/api/sync?since=0&limit=5000').get_json()['version']
+    reads = app_env.archive_store.segments_read
+    app_env.archive_store._rows.clear()
+
+    client.get(f'/api/sync?since={version}')
+    assert app_env.archive_store.segments_read == reads
+
+
+def test_writes_to_archived_transactions_are_rejected(client, archived):
+    updated = client.put(f'/api/transactions/{archived[0]}', json={"amount": 99})
+    assert updated.status_code == 409
+    assert 'archived' in updated.get_json()['error']
+    assert client.delete(f'/api/transactions/{archived[0]}').status_code == 409
+    assert client.delete('/api/transactions/missing').status_code == 404
+
+
+def test_lookups_only_decompress_segments_whose_id_filter_matches(tmp_path):
+    store = ArchiveStore(str(tmp_path / 'archive'))
+    rows = [{"id": f"{year}-{i}", "type": "expense", "amount_cents": 100, "category": "Food",
+             "day": year_start(year) + i} for year in (2021, 2022, 2023) for i in range(50)]
+    store.archive(rows, year_start(2024))
+    store._rows.clear()
+
+    assert store.find("2022-7")['day'] == year_start(2022) + 7
+    assert store.segments_read == 1
+    misses = [store.find(f"missing-{i}") for i in range(20)]
+    assert misses == [None] * 20
+    assert store.segments_read <= 2
+    assert 'ids' not in store.summary()['segments'][0]
+
+
+def test_archiving_again_after_an_interrupted_run_does_not_duplicate_rows(tmp_path):
+    store = ArchiveStore(str(tmp_path / 'archive'))
+    rows = [{"id": str(i), "type": "expense", "amount_cents": 100, "category": "Food", "day": year_start(2023) + i,
+             "version": i + 1} for i in range(3)]
+    # The segment was published, but the process died before hot storage was rewritten
+    store.archive(rows[:2], year_start(2024))
+
+    kept, created = store.archive(rows, year_start(2024))
+    assert kept == []
+    assert [s['rows'] for s in created] == [1]
+    assert sorted(t['id'] for t in store.rows()) == ['0', '1', '2']
+    assert sum(count for *_, count in (d for s in store.segments() for d in s['daily'])) == 3
+
+    kept, created = store.archive(rows, year_start(2024))
+    assert (kept, created) == ([], [])
+    assert len(store.segments()) == 2
+
+
+def test_only_closed_years_are_archived_and_a_mid_year_date_rounds_down(client, app_env):
+    this_year = datetime.now().year
+    ids = [client.post('/api/transactions', json=expense(date)).get_json()['id']
+           for date in (f'{this_year - 2}-03-01', f'{this_year - 1}-03-01', f'{this_year - 1}-09-01',
+                        f'{this_year}-01-02')]
+
+    assert client.post('/api/archive', json={"before": f"{this_year - 1}-06-30"}).status_code == 200
+    assert {t['id'] for t in app_env.archive_store.rows()} == {ids[0]}
+    assert client.post('/api/archive', json={"before": f"{this_year}-06-30"}).status_code == 200
+    assert client.post('/api/archive', json={"before": f"{this_year + 1}-01-01"}).status_code == 400
+    assert client.post('/api/archive', json={"before": "2999-01-01"}).status_code == 400
+
+    hot = {t['id'] for t in app_env.load_data()['transactions']}
+    assert ids[3] in hot and not hot & set(ids[:3])
+
+
+def test_archive_jobs_cannot_archive_the_open_year(client, app_env, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'db_path', str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(job_queue, 'result_dir', str(tmp_path / 'job_results'))
+    monkeypatch.setattr(job_queue, 'max_workers', 0)
+    monkeypatch.setattr(job_queue, '_initialized', False)
+    monkeypatch.setattr(job_queue, '_pid', None)
+    hot = len(app_env.load_data()['transactions'])
+
+    job = client.post('/api/jobs', json={"kind": "archive", "params": {"before": "2999-01-01"}}).get_json()
+    job_queue.run_one()
+    failed = client.get(f"/api/jobs/{job['id']}").get_json()
+    assert (failed['status'], failed['error']) == ('failed', 'ValueError: Only closed years can be archived')
+    assert len(app_env.load_data()['transactions']) == hot
+    assert app_env.archive_store.segments() == []
@@ -0,0 +1,49 @@
+"""Tests for the synthetic ledger and the benchmark comparison"""
+
+import json
+from datetime import date
+
+import database as database_module
+from benchmarks.run import compare
+from benchmarks.synthetic import LedgerGenerator
+from change_feed import ChangeFeed
+from database import Database
+from money import to_cents
+
+
+def generator(size=300, seed=42):
+    return LedgerGenerator(size, seed=seed, start=date(2024, 1, 1), end=date(2024, 12, 31))
+
+
+def test_the_ledger_is_reproducible_from_its_seed():
+    rows = list(generator().transactions())
+    assert len(rows) == 300
+    assert rows == list(generator().transactions())
+    assert rows != list(generator(seed=7).transactions())
+    assert [t['day'] for t in rows] == sorted(t['day'] for t in rows)
+
+
+def test_the_json_and_sqlite_stores_hold_the_same_ledger(tmp_path, app_env, monkeypatch):
+    ledger = generator()
+    ledger.write_json(app_env.DATA_FILE)
+    monkeypatch.setattr(database_module, 'change_feed', ChangeFeed(str(tmp_path / 'sqlite-changes.log')))
+    db = Database(str(tmp_path / 'bench.db'))
+    ledger.load_sqlite(db)
+
+    transactions = app_env.load_data()['transactions']
+    summary = db.get_summary()
+    assert summary['transaction_count'] == len(transactions) == 300
+    assert to_cents(app_env.calculate_summary(transactions)['balance']) == summary['balance']
+    assert db.get_changes_since(0, limit=1)['version'] == app_env.load_data()['sync']['version']
+
+
+def test_compare_flags_only_slowdowns_past_the_threshold_and_the_noise_floor(tmp_path):
+    def row(name, median):
+        return {"group": "route", "name": name, "backend": "json", "size": 100, "median_ms": median}
+
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps({"results": [row("slower", 10.0), row("noise", 0.01), row("faster", 5.0)]}))
+    results = [row("slower", 13.0), row("noise", 0.05), row("faster", 4.0), row("new", 1.0)]
+
+    assert [r['name'] for r in compare(results, str(baseline), threshold=0.25)] == ["slower"]
+    assert results[0]['ratio'] == 1.3 and 'ratio' not in results[3]
@@ -0,0 +1,135 @@
+"""Tests for budget spend counters and threshold alerts"""
+
+import threading
+from datetime import date
+
+import pytest
+
+from budgets import BudgetEngine, budget_from_api
+
+TODAY = date.today().isoformat()
+
+
+def expense(amount, category='Food & Dining', day=TODAY):
+    return {"type": "expense", "amount": amount, "category": category, "description": "Test", "date": day}
+
+
+@pytest.fixture
+def budget(client):
+    return client.post('/api/budgets', json={"category": "Food & Dining", "amount": 100,
+                                             "thresholds": [0.5, 1]}).get_json()
+
+
+def spent(client, budget):
+    return client.get(f"/api/budgets/{budget['id']}").get_json()['spent']
+
+
+def test_spend_follows_inserts_updates_and_deletes(client, budget):
+    base = spent(client, budget)
+    added = client.post('/api/transactions', json=expense(20)).get_json()['id']
+    client.post('/api/transactions', json=expense(999, category='Shopping'))
+    assert spent(client, budget) == base + 20
+
+    client.put(f'/api/transactions/{added}', json={"amount": 35})
+    assert spent(client, budget) == base + 35
+    client.delete(f'/api/transactions/{added}')
+    assert spent(client, budget) == base
+
+
+def test_each_threshold_alerts_once_per_crossing(client):
+    budget = client.post('/api/budgets', json={"category": "Travel", "amount": 100,
+                                               "thresholds": [0.5, 1]}).get_json()
+    since = max([a['id'] for a in client.get('/api/budgets/alerts').get_json()], default=0)
+    client.post('/api/transactions', json=expense(40, category='Travel'))
+    client.post('/api/transactions', json=expense(20, category='Travel'))
+    client.post('/api/transactions', json=expense(5, category='Travel'))
+    client.post('/api/transactions', json=expense(50, category='Travel'))
+
+    alerts = client.get(f'/api/budgets/alerts?since={since}').get_json()
+    assert [(a['budget_id'], a['threshold']) for a in alerts] == [(budget['id'], 0.5), (budget['id'], 1)]
+    assert client.get(f"/api/budgets/{budget['id']}").get_json()['state'] == 'exceeded'
+
+
+def test_alerts_are_shared_by_every_worker(client, app_env, monkeypatch):
+    client.post('/api/budgets', json={"category": "Travel", "amount": 100, "thresholds": [0.5]})
+    client.post('/api/transactions', json=expense(60, category='Travel'))
+    alerts = client.get('/api/budgets/alerts').get_json()
+
+    # A worker that never saw the write serves the same alerts from the change feed
+    monkeypatch.setattr(app_env, 'budget_engine', BudgetEngine())
+    assert client.get('/api/budgets/alerts').get_json() == alerts
+    assert [a['threshold'] for a in alerts] == [0.5]
+    assert client.get(f"/api/budgets/alerts?since={alerts[-1]['id']}").get_json() == []
+    client.post('/api/transactions', json=expense(1))
+    assert client.get(f"/api/budgets/alerts?since={alerts[-1]['id']}").get_json() == []
+
+
+def test_concurrent_writes_keep_the_counters_exact(client, app_env, budget):
+    base = spent(client, budget)
+
+    def post_many():
+        thread_client = app_env.app.test_client()
+        for _ in range(5):
+            thread_client.post('/api/transactions', json=expense(1))
+
+    threads = [threading.Thread(target=post_many) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rebuilds = app_env.budget_engine.rebuilds
+    assert spent(client, budget) == base + 30
+    assert app_env.budget_engine.rebuilds == rebuilds
+
+
+def test_a_write_landing_just_before_the_read_is_counted(client, app_env, budget, monkeypatch):
+    base = spent(client, budget)
+    read_data_file = app_env.read_data_file
+
+    def racing_read():
+        # Another worker saves between the request starting and the data being read
+        monkeypatch.setattr(app_env, 'read_data_file', read_data_file)
+        data = app_env.load_data()
+        data['transactions'].insert(0, app_env.new_transaction_from_body(expense(7)))
+        app_env.save_data(data)
+        return read_data_file()
+
+    monkeypatch.setattr(app_env, 'read_data_file', racing_read)
+    client.post('/api/transactions', json=expense(25))
+
+    assert spent(client, budget) == base + 32
+
+
+def test_custom_budgets_only_count_their_window():
+    engine = BudgetEngine()
+    custom = budget_from_api({"category": "Travel", "amount": 500, "period": "custom",
+                              "start_date": "2025-06-01", "end_date": "2025-06-30"})
+    rows = [{"type": "expense", "amount_cents": cents, "category": "Travel", "day": date.fromisoformat(day).toordinal()}
+            for cents, day in ((10000, '2025-05-31'), (2500, '2025-06-01'), (4000, '2025-06-30'),
+                               (9900, '2025-07-01'))]
+    engine.rebuild([custom], rows, stamp='s')
+
+    status = engine.status(custom['id'], date(2025, 6, 15).toordinal())
+    assert status['spent'] == 65.0
+    assert status['active']
+    assert not engine.status(custom['id'], date(2025, 7, 15).toordinal())['active']
+
+
+def test_budget_validation():
+    with pytest.raises(ValueError):
+        budget_from_api({"amount": 0})
+    with pytest.raises(ValueError):
+        budget_from_api({"amount": 10, "period": "yearly"})
+    with pytest.raises(ValueError):
+        budget_from_api({"amount": 10, "period": "custom", "start_date": "2025-02-01", "end_date": "2025-01-01"})
+    for thresholds in (5, "0.5", [0], [0.5, 80], [True], {"0.5": 1}):
+        with pytest.raises(ValueError, match='Thresholds must be a list of fractions'):
+            budget_from_api({"amount": 10, "thresholds": thresholds})
+    assert budget_from_api({"amount": 10, "thresholds": [1, 0.25]})['thresholds'] == [0.25, 1]
+
+
+def test_invalid_thresholds_are_a_bad_request(client):
+    response = client.post('/api/budgets', json={"amount": 10, "thresholds": 5})
+    assert response.status_code == 400
+    assert 'Thresholds' in response.get_json()['error']
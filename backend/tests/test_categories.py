@@ -0,0 +1,96 @@
+"""Tests for categories referenced from transactions by integer key"""
+
+import sqlite3
+import uuid
+
+import pytest
+
+import database as database_module
+import migrations
+from change_feed import ChangeFeed
+from database import Database
+from dates import to_day
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database_module, 'change_feed', ChangeFeed(str(tmp_path / 'changes.log')))
+    return Database(str(tmp_path / 'expense_tracker.db'))
+
+
+def category_id(db, name):
+    return next(c['id'] for c in db.get_all_categories() if c['name'] == name)
+
+
+def add(db, category, amount_cents=1000):
+    return db.add_transaction({"id": str(uuid.uuid4()), "type": "expense", "amount_cents": amount_cents,
+                               "category": category, "description": "Keyed", "date": "2025-03-14",
+                               "created_at": "2025-03-14T12:00:00"})
+
+
+def test_a_rename_shows_on_every_transaction_without_rewriting_them(db):
+    stored = add(db, 'Shopping')
+    version = db.get_changes_since(0)['version']
+    renamed = db.rename_category(category_id(db, 'Shopping'), 'Retail')
+
+    assert db.get_transaction_by_id(stored['id'])['category'] == 'Retail'
+    delta = db.get_changes_since(version)
+    assert [c['name'] for c in delta['categories']] == ['Retail'] and delta['transactions'] == []
+    assert renamed['version'] == delta['version']
+    with pytest.raises(ValueError, match="already exists"):
+        db.rename_category(renamed['id'], 'Healthcare')
+    assert db.rename_category('missing', 'Anything') is None
+
+
+def test_merging_moves_transactions_and_tombstones_the_sources(db):
+    for category in ('Shopping', 'Entertainment', 'Shopping'):
+        add(db, category)
+    sources = [category_id(db, 'Shopping'), category_id(db, 'Entertainment')]
+    target = category_id(db, 'Other Expense')
+    version = db.get_changes_since(0)['version']
+
+    assert db.merge_categories(sources, target) == 3
+    assert {t['category'] for t in db.get_all_transactions()} == {'Other Expense'}
+    assert db.get_category_breakdown()['Other Expense']['expense'] == 3000
+    assert sorted(t['id'] for t in db.get_changes_since(version)['deleted']) == sorted(sources)
+    with pytest.raises(ValueError, match='Unknown category'):
+        db.merge_categories(['missing'], target)
+
+
+def test_a_used_category_is_deleted_only_with_a_replacement(db):
+    stored = add(db, 'Shopping')
+    shopping = category_id(db, 'Shopping')
+    with pytest.raises(ValueError, match='used by 1 transactions'):
+        db.delete_category(shopping)
+    with pytest.raises(ValueError, match='Cannot reassign'):
+        db.delete_category(shopping, reassign_to=shopping)
+
+    assert db.delete_category(shopping, reassign_to=category_id(db, 'Healthcare'))
+    assert db.get_transaction_by_id(stored['id'])['category'] == 'Healthcare'
+
+
+def test_unknown_names_become_categories_with_new_versions(db):
+    stored = add(db, 'Pet Care')
+    created = next(c for c in db.get_all_categories() if c['name'] == 'Pet Care')
+    assert db.get_transaction_by_id(stored['id'])['category'] == 'Pet Care'
+    assert created['version'] < db.get_transaction_by_id(stored['id'])['version']
+
+
+def test_categories_created_by_the_migration_reach_synced_clients(tmp_path, monkeypatch):
+    path = str(tmp_path / 'expense_tracker.db')
+    conn = sqlite3.connect(path)
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:-1])
+        patch.setattr(migrations, 'LATEST_VERSION', migrations.MIGRATIONS[-2][0])
+        migrations.migrate(conn)
+    conn.execute('''
+        INSERT INTO transactions (id, type, amount_cents, category, description, date, created_at, day)
+        VALUES ('a', 'expense', 500, 'Pet Care', 'Vet', '2025-03-14', '2025-03-14T12:00:00', ?)
+    ''', (to_day('2025-03-14'),))
+    conn.commit()
+    synced = conn.execute('SELECT version FROM sync_state').fetchone()[0]
+    conn.close()
+
+    delta = Database(path).get_changes_since(synced)
+    assert [c['name'] for c in delta['categories']] == ['Pet Care']
+    assert delta['version'] == synced + 1
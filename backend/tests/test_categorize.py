@@ -0,0 +1,62 @@
+"""Tests for auto-categorization and its input validation"""
+
+import pytest
+
+from categorize import Categorizer, rule_from_api
+
+
+def row(merchant, description='Card payment', category=None, kind='expense'):
+    return {"type": kind, "amount": 12, "merchant_name": merchant, "description": description,
+            "date": "2025-11-21", **({"category": category} if category else {})}
+
+
+def test_suggestions_follow_the_merchant_history(client):
+    for _ in range(3):
+        client.post('/api/transactions', json=row('Blue Bottle Coffee', category='Food & Dining'))
+    decisions = client.post('/api/categorize', json={"transactions": [row('BLUE BOTTLE COFFEE #12')]}).get_json()
+    assert decisions[0]['category'] == 'Food & Dining'
+
+
+def test_rules_win_over_history(client):
+    client.post('/api/transactions', json=row('Netflix', category='Shopping'))
+    assert client.post('/api/categorize/rules', json={"pattern": "netflix",
+                                                      "category": "Entertainment"}).status_code == 201
+    decisions = client.post('/api/categorize', json={"transactions": [row('NETFLIX.COM')]}).get_json()
+    assert decisions[0]['category'] == 'Entertainment'
+
+
+def test_batch_rows_without_a_category_are_categorized(client):
+    client.post('/api/categorize/rules', json={"pattern": "uber", "category": "Transportation"})
+    added = client.post('/api/transactions/batch', json={"transactions": [row('Uber Trip')]}).get_json()
+    assert added['categorized'] == 1
+    assert added['transactions'][0]['category'] == 'Transportation'
+
+
+@pytest.mark.parametrize('field, value', [('merchant_name', ['Uber']), ('description', {"text": "x"}),
+                                          ('merchant_name', 42)])
+def test_non_string_text_fields_are_rejected(client, field, value):
+    bad = {**row('Uber'), field: value}
+    categorize = client.post('/api/categorize', json={"transactions": [row('Uber'), bad]})
+    assert categorize.status_code == 400
+    assert categorize.get_json()['error'] == f"Transaction 1: {field} must be a string"
+
+    batch = client.post('/api/transactions/batch', json={"transactions": [bad]})
+    assert batch.status_code == 400
+    assert client.post('/api/transactions', json={**bad, "category": "Shopping"}).status_code == 400
+
+    stored = client.post('/api/transactions', json=row('Uber', category='Shopping')).get_json()['id']
+    assert client.put(f'/api/transactions/{stored}', json={field: value}).status_code == 400
+
+
+def test_a_non_string_type_is_categorized_as_an_expense():
+    decisions = Categorizer().categorize([{"type": ["income"], "merchant_name": "Shop"}], [])
+    assert decisions[0]['category'] == 'Other Expense'
+
+
+def test_rule_validation():
+    with pytest.raises(ValueError):
+        rule_from_api({"pattern": ["netflix"], "category": "Entertainment"})
+    with pytest.raises(ValueError):
+        rule_from_api({"pattern": "netflix", "category": ["Entertainment"]})
+    with pytest.raises(ValueError):
+        rule_from_api({"pattern": "netflix", "category": "Entertainment", "type": ["expense"]})
@@ -0,0 +1,102 @@
+"""Tests for the shared change log, its compaction and cursors"""
+
+import builtins
+import json
+import os
+import shutil
+import threading
+
+import change_feed as change_feed_module
+from change_feed import ChangeFeed, FeedCursor, aggregate_delta
+
+
+def logged_ids(feed):
+    with open(feed.path) as f:
+        return [json.loads(line)['id'] for line in f]
+
+
+def test_ids_increase_and_readers_resume_after_their_last_id(tmp_path):
+    feed = ChangeFeed(str(tmp_path / 'changes.log'))
+    assert [feed.publish('insert', 'transaction', {"n": n}) for n in range(3)] == [1, 2, 3]
+
+    events, reset = feed.read_since(1)
+    assert [e['id'] for e in events] == [2, 3]
+    assert not reset
+    assert feed.latest_id() == 3
+
+
+def test_compaction_keeps_the_newest_events_and_continues_the_ids(tmp_path):
+    feed = ChangeFeed(str(tmp_path / 'changes.log'), max_bytes=2000)
+    for n in range(60):
+        feed.publish('insert', 'transaction', {"n": n})
+
+    ids = logged_ids(feed)
+    assert feed.compactions >= 1
+    assert os.path.getsize(feed.path) <= 2000
+    assert ids == list(range(ids[0], 61))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_a_cursor_behind_the_compacted_log_gets_a_reset(tmp_path):
+    feed = ChangeFeed(str(tmp_path / 'changes.log'), max_bytes=2000)
+    feed.publish('insert', 'transaction')
+    cursor = FeedCursor(feed, 0)
+    assert [e['id'] for e in cursor.poll()] == [1]
+    for n in range(60):
+        feed.publish('insert', 'transaction', {"n": n})
+
+    events = cursor.poll()
+    assert events[0]['type'] == 'reset'
+    assert [e['id'] for e in events[1:]] == logged_ids(feed)
+
+
+def test_a_publisher_holding_the_replaced_log_reopens_it(tmp_path, monkeypatch):
+    feed = ChangeFeed(str(tmp_path / 'changes.log'))
+    feed.publish('insert', 'transaction')
+    opened = []
+
+    def stale_open(path, mode='r', *args, **kwargs):
+        f = builtins.open(path, mode, *args, **kwargs)
+        if not opened:
+            # Another worker compacts the log after this one opened it
+            shutil.copy(path, f"{path}.compacted")
+            os.replace(f"{path}.compacted", path)
+        opened.append(f)
+        return f
+
+    monkeypatch.setattr(change_feed_module, 'open', stale_open, raising=False)
+    assert feed.publish('insert', 'transaction') == 2
+    monkeypatch.undo()
+
+    assert len(opened) == 2
+    assert logged_ids(feed) == [1, 2]
+
+
+def test_concurrent_publishers_across_compactions_never_reuse_an_id(tmp_path):
+    path = str(tmp_path / 'changes.log')
+    published = []
+
+    def publish_many():
+        # One feed per thread, like separate workers; they only share the flock
+        feed = ChangeFeed(path, max_bytes=3000)
+        published.extend(feed.publish('insert', 'transaction', {"n": n}) for n in range(50))
+
+    threads = [threading.Thread(target=publish_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(published) == list(range(1, 201))
+    ids = logged_ids(ChangeFeed(path))
+    assert ids == list(range(ids[0], 201))
+
+
+def test_aggregate_delta_nets_removed_and_added_rows():
+    old = {"type": "expense", "amount_cents": 1000, "category": "Food", "day": 739000}
+    new = {**old, "amount_cents": 1500, "category": "Travel"}
+    delta = aggregate_delta(removed=[old], added=[new])
+
+    assert delta['summary'] == {"income": 0.0, "expense": 5.0, "count": 0}
+    assert delta['categories'] == {"Food": {"income": 0.0, "expense": -10.0, "count": -1},
+                                   "Travel": {"income": 0.0, "expense": 15.0, "count": 1}}
@@ -0,0 +1,43 @@
+"""Tests for gzip negotiation and ``fields=`` projections"""
+
+import gzip
+
+import pytest
+
+from compression import accepts_gzip
+
+
+@pytest.mark.parametrize('header, allowed', [
+    ('gzip', True), ('deflate, gzip;q=0.5', True), ('*', True), ('', False), ('br', False),
+    ('gzip;q=0', False), ('*, gzip;q=0', False), ('gzip;q=0, *', False), ('*;q=0', False), ('gzip;q=abc', False),
+])
+def test_accept_encoding_negotiation(header, allowed):
+    assert accepts_gzip(header) is allowed
+
+
+def test_large_responses_are_gzipped_for_clients_that_accept_it(client):
+    plain = client.get('/api/transactions')
+    zipped = client.get('/api/transactions', headers={"Accept-Encoding": "gzip"})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.data) == plain.data
+    assert 'Accept-Encoding' in zipped.headers['Vary'] and 'Accept-Encoding' in plain.headers['Vary']
+    small = client.get('/api/health', headers={"Accept-Encoding": "gzip"})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_fields_project_transactions(client):
+    full = client.get('/api/transactions').get_json()['transactions']
+    projected = client.get('/api/transactions?fields=id,amount').get_json()['transactions']
+
+    assert projected == [{"id": t['id'], "amount": t['amount']} for t in full]
+    exported = client.get('/api/export?fields=id,currency').get_json()['data']['transactions']
+    assert {frozenset(t) for t in exported} == {frozenset(("id", "currency"))}
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get('/api/transactions?fields=id,password')
+    assert response.status_code == 400
+    assert 'Unknown fields: password' in response.get_json()['error']
+    assert client.post('/api/jobs', json={"kind": "export", "params": {"fields": "id"}}).status_code == 400
@@ -0,0 +1,95 @@
+"""Tests for data.json persistence under concurrent writers"""
+
+import json
+import os
+import threading
+
+import pytest
+
+
+def body(description):
+    return {"type": "expense", "amount": 1, "category": "Shopping", "description": description,
+            "date": "2025-11-21"}
+
+
+def test_concurrent_writes_are_all_kept(client, app_env):
+    baseline = len(app_env.load_data()['transactions'])
+
+    def post_many(worker):
+        thread_client = app_env.app.test_client()
+        for i in range(5):
+            assert thread_client.post('/api/transactions', json=body(f"{worker}-{i}")).status_code == 201
+
+    threads = [threading.Thread(target=post_many, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    descriptions = [t['description'] for t in app_env.load_data()['transactions']]
+    assert len(descriptions) == baseline + 40
+    assert {f"{w}-{i}" for w in range(8) for i in range(5)} <= set(descriptions)
+
+
+def test_readers_never_see_a_partial_file(client, app_env):
+    first = client.post('/api/transactions', json=body('first')).get_json()['id']
+    stop = threading.Event()
+    seen = []
+
+    def read():
+        while not stop.is_set():
+            seen.append(any(t['id'] == first for t in app_env.load_data()['transactions']))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for i in range(20):
+        client.post('/api/transactions', json=body(f"write-{i}"))
+    stop.set()
+    reader.join()
+
+    assert seen and all(seen)
+
+
+def test_failed_save_keeps_the_previous_file(client, app_env, monkeypatch):
+    client.post('/api/transactions', json=body('kept'))
+    before = app_env.load_data()
+
+    def broken_dump(data, f, **kwargs):
+        f.write('{"transactions": [')
+        raise OSError('disk full')
+
+    data = app_env.load_data()
+    data['transactions'] = []
+    with monkeypatch.context() as patch:
+        patch.setattr(json, 'dump', broken_dump)
+        with pytest.raises(OSError):
+            app_env.save_data(data)
+
+    assert app_env.load_data() == before
+    directory = os.path.dirname(app_env.DATA_FILE)
+    assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+
+def test_old_schema_is_migrated_once(app_env):
+    os.makedirs(os.path.dirname(app_env.DATA_FILE), exist_ok=True)
+    with open(app_env.DATA_FILE, 'w') as f:
+        json.dump({"transactions": [{"id": "a", "type": "expense", "amount": 12.34, "category": "Shopping",
+                                     "description": "Old", "date": "2024-03-01"}],
+                   "categories": [], "budgets": []}, f)
+
+    data = app_env.load_data()
+    assert data['schema_version'] == app_env.DATA_SCHEMA_VERSION
+    assert data['transactions'][0]['amount_cents'] == 1234
+    with open(app_env.DATA_FILE) as f:
+        assert json.load(f)['schema_version'] == app_env.DATA_SCHEMA_VERSION
+
+
+def test_data_lock_is_reentrant_within_a_thread(app_env):
+    with app_env.data_lock():
+        with app_env.data_lock():
+            app_env.save_data(app_env.load_data())
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(app_env.data_lock().__enter__() is None))
+    thread.start()
+    thread.join(timeout=5)
+    assert acquired == [True]
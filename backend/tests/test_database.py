@@ -0,0 +1,67 @@
+"""Tests for the SQLite store and the events it publishes"""
+
+import uuid
+
+import pytest
+
+import database as database_module
+from change_feed import ChangeFeed
+from database import Database
+
+
+@pytest.fixture
+def feed(tmp_path, monkeypatch):
+    feed = ChangeFeed(str(tmp_path / 'changes.log'))
+    monkeypatch.setattr(database_module, 'change_feed', feed)
+    return feed
+
+
+@pytest.fixture
+def db(tmp_path, feed):
+    return Database(str(tmp_path / 'expense_tracker.db'))
+
+
+def transaction(**overrides):
+    return {"id": str(uuid.uuid4()), "type": "expense", "amount_cents": 1250, "category": "Food & Dining",
+            "description": "Lunch", "date": "2025-03-14", "created_at": "2025-03-14T12:00:00", **overrides}
+
+
+def test_writes_publish_events_with_their_aggregate_delta(db, feed):
+    added = db.add_transaction(transaction())
+    db.update_transaction(added['id'], {"amount_cents": 2000})
+    db.delete_transaction(added['id'])
+
+    events, _ = feed.read_since(0)
+    assert [(e['type'], e['store']) for e in events] == [('insert', 'sqlite'), ('update', 'sqlite'),
+                                                          ('delete', 'sqlite')]
+    assert [e['delta']['summary']['expense'] for e in events] == [12.5, 7.5, -20.0]
+
+
+def test_unsupported_currencies_are_rejected_before_writing(db, feed):
+    with pytest.raises(ValueError, match='No FX rates for EUR'):
+        db.add_transaction(transaction(currency='eur'))
+    stored = db.add_transaction(transaction())
+    with pytest.raises(ValueError, match='No FX rates for EUR'):
+        db.update_transaction(stored['id'], {"currency": "EUR"})
+
+    assert [t['id'] for t in db.get_all_transactions()] == [stored['id']]
+    assert db.get_transaction_by_id(stored['id'])['currency'] == 'USD'
+    assert feed.latest_id() == 1
+
+
+def test_currency_codes_are_normalized(db, eur_rates):
+    stored = db.add_transaction(transaction(currency='eur'))
+    assert db.get_transaction_by_id(stored['id'])['currency'] == 'EUR'
+
+
+def test_a_failing_publish_does_not_fail_the_committed_write(db, monkeypatch, caplog):
+    def broken_publish(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(database_module.change_feed, 'publish', broken_publish)
+    stored = db.add_transaction(transaction())
+    assert db.update_transaction(stored['id'], {"amount_cents": 99})['amount_cents'] == 99
+    assert db.delete_transaction(stored['id'])
+
+    assert db.get_all_transactions() == []
+    assert len([r for r in caplog.records if 'change feed' in r.getMessage()]) == 3
@@ -0,0 +1,52 @@
+"""Tests for day ordinals and period buckets"""
+
+import pytest
+
+from dates import GRANULARITIES, from_day, month_key, period_key, period_label, to_day, week_key
+
+
+def test_days_round_trip_through_ordinals():
+    assert from_day(to_day('2024-02-29')) == '2024-02-29'
+    assert to_day('2025-01-01') - to_day('2024-12-31') == 1
+
+
+@pytest.mark.parametrize('value', ['2025-13-01', '2025-02-30', '01/02/2025', '', None])
+def test_invalid_dates_are_rejected(value):
+    with pytest.raises(ValueError, match='expected YYYY-MM-DD'):
+        to_day(value)
+
+
+def test_weeks_start_on_monday():
+    monday, sunday = to_day('2025-06-02'), to_day('2025-06-08')
+    assert week_key(monday) == week_key(sunday) != week_key(sunday + 1)
+    assert period_label('week', week_key(sunday)) == '2025-06-02'
+
+
+@pytest.mark.parametrize('granularity, label', [
+    ('day', '2024-11-05'), ('week', '2024-11-04'), ('month', '2024-11'), ('quarter', '2024-Q4'), ('year', '2024'),
+])
+def test_period_labels(granularity, label):
+    assert period_label(granularity, period_key(granularity, to_day('2024-11-05'))) == label
+
+
+def test_period_keys_order_like_the_dates():
+    days = [to_day(d) for d in ('2023-12-31', '2024-01-01', '2024-03-31', '2024-04-01')]
+    for granularity in GRANULARITIES:
+        keys = [period_key(granularity, day) for day in days]
+        assert keys == sorted(keys)
+    assert month_key(days[1]) - month_key(days[0]) == 1
+    with pytest.raises(ValueError, match='Unknown granularity'):
+        period_key('decade', days[0])
+
+
+def test_the_api_stores_day_ordinals_and_rejects_invalid_dates(client, app_env):
+    created = client.post('/api/transactions', json={"type": "expense", "amount": 5, "category": "Shopping",
+                                                     "description": "Leap day", "date": "2024-02-29"})
+    assert created.get_json()['date'] == '2024-02-29'
+    stored = next(t for t in app_env.load_data()['transactions'] if t['id'] == created.get_json()['id'])
+    assert stored['day'] == to_day('2024-02-29')
+
+    invalid = client.post('/api/transactions', json={"type": "expense", "amount": 5, "category": "Shopping",
+                                                     "description": "Bad", "date": "2025-02-30"})
+    assert invalid.status_code == 400
+    assert client.get('/api/transactions?start_date=2025-02-30').status_code == 400
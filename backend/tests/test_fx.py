@@ -0,0 +1,84 @@
+"""Tests for the FX table and multi-currency amounts"""
+
+import json
+import os
+
+import pytest
+
+from dates import to_day
+from fx import FxTable, normalize_currency
+
+RATES = {"EUR": {"2024-01-01": 0.5, "2025-01-01": 0.8}, "GBP": {"2024-01-01": 0.25}}
+
+
+@pytest.fixture
+def table():
+    return FxTable(loader=lambda: RATES)
+
+
+def test_a_day_uses_the_latest_earlier_rate(table):
+    days = [to_day(d) for d in ('2023-06-01', '2024-01-01', '2024-12-31', '2025-01-01', '2030-01-01')]
+    assert table.rates('EUR', days).tolist() == [0.5, 0.5, 0.5, 0.8, 0.8]
+    assert table.rates('USD', days[:2]).tolist() == [1.0, 1.0]
+    with pytest.raises(ValueError, match='No FX rates for JPY'):
+        table.rates('JPY', days)
+
+
+def test_batch_conversion_matches_single_conversions(table):
+    amounts, currencies = [1000, 1000, 999, 333], ['EUR', 'EUR', 'USD', 'GBP']
+    days = [to_day('2024-06-01'), to_day('2025-06-01'), to_day('2025-06-01'), to_day('2025-06-01')]
+    for target in ('USD', 'EUR', 'GBP'):
+        assert table.convert(amounts, currencies, days, target).tolist() == [
+            table.convert_one(a, c, d, target) for a, c, d in zip(amounts, currencies, days)]
+    assert table.convert(amounts, currencies, days, 'USD').tolist() == [2000, 1250, 999, 1332]
+    # Between two non-base currencies through the base
+    assert table.convert_one(1000, 'EUR', days[1], 'GBP') == 312
+
+
+def test_currency_codes_are_validated():
+    assert normalize_currency('eur') == 'EUR'
+    for code in ('EURO', 'E1R', None, 978):
+        with pytest.raises(ValueError, match='Invalid currency'):
+            normalize_currency(code)
+
+
+def test_rates_file_is_reloaded_when_it_changes(tmp_path):
+    path = tmp_path / 'fx_rates.json'
+    path.write_text(json.dumps({"base": "USD", "rates": {"EUR": {"2024-01-01": 0.5}}}))
+    table = FxTable(str(path), ttl_seconds=0)
+    version = table.version
+    assert table.currencies() == ['EUR', 'USD']
+
+    path.write_text(json.dumps({"base": "USD", "rates": {"EUR": {"2024-01-01": 0.9}}}))
+    os.utime(path, ns=(1, os.stat(path).st_mtime_ns + 1))
+    assert table.rates('EUR', [to_day('2024-02-01')]).tolist() == [0.9]
+    assert table.version != version
+
+
+def test_converted_amounts_are_cached_per_data_stamp_and_rates_version(table):
+    rows = [{"amount_cents": 1000, "currency": "EUR", "day": to_day('2025-06-01')}]
+    assert table.converted(None, [{**rows[0], "currency": "USD"}], 'USD') is None
+    assert table.converted('stamp', rows, 'USD') == [1250]
+    rows[0]['amount_cents'] = 1
+    assert table.converted('stamp', rows, 'USD') == [1250]
+
+    table.set_rate('EUR', '2025-01-01', 0.5)
+    assert table.converted('stamp', rows, 'USD') == [2]
+
+
+def test_reports_and_summaries_convert_into_the_requested_currency(client, eur_rates):
+    for amount, date in ((100, '2025-06-01'), (10, '2024-06-01')):
+        created = client.post('/api/transactions', json={"type": "expense", "amount": amount, "currency": "eur",
+                                                         "category": "Travel", "description": "Trip", "date": date})
+        assert created.get_json()['currency'] == 'EUR'
+
+    in_usd = client.get('/api/transactions?start_date=2024-01-01&end_date=2025-10-31').get_json()['summary']
+    in_eur = client.get('/api/transactions?start_date=2024-01-01&end_date=2025-10-31&currency=EUR').get_json()
+    assert in_usd['total_expenses'] == 145.0
+    assert in_eur['summary']['total_expenses'] == 110.0
+
+    assert client.get('/api/reports?currency=JPY').status_code == 400
+    rejected = client.post('/api/transactions', json={"type": "expense", "amount": 1, "currency": "JPY",
+                                                      "category": "Travel", "description": "Trip",
+                                                      "date": "2025-06-01"})
+    assert rejected.status_code == 400
@@ -0,0 +1,77 @@
+"""Tests for integer-wei gas parsing and the gas spend rollups"""
+
+import pytest
+
+from blockchain_models import BlockchainTransaction
+from gas_analytics import GasRollups, format_wei, parse_gas_fee, parse_gas_used, timestamp_to_day
+
+PAYER = "0xAbC0000000000000000000000000000000000001"
+OTHER = "0xdef0000000000000000000000000000000000002"
+
+
+def transaction(fee, sender=PAYER, chain_id="1", timestamp="1700000000", category="Swap", gas_used="21000"):
+    return BlockchainTransaction(transaction_hash=f"0x{fee}{sender[-1]}{chain_id}", from_address=sender,
+                                 to_address=OTHER, amount=0.0, token_symbol="ETH", chain_id=chain_id,
+                                 timestamp=timestamp, status="confirmed", gas_used=gas_used, gas_fee=fee,
+                                 category=category)
+
+
+def test_gas_strings_parse_into_exact_integers():
+    assert parse_gas_used("0x5208") == parse_gas_used("21000") == 21000
+    assert parse_gas_used(None) == parse_gas_used(" ") == 0
+    for text in ("lots", "0xzz", "NaN", "Infinity", "1.5"):
+        with pytest.raises(ValueError, match='Invalid gas used'):
+            parse_gas_used(text)
+    assert parse_gas_fee("0.000000000000000001") == 1
+    assert parse_gas_fee("0.1") + parse_gas_fee("0.2") == parse_gas_fee("0.3")
+    assert format_wei(10 ** 18 + 1) == {"wei": "1000000000000000001", "eth": 1.0}
+
+
+def test_timestamps_become_utc_days():
+    assert timestamp_to_day("1700000000") == "2023-11-14"
+    assert timestamp_to_day("2024-02-29T23:59:59") == "2024-02-29"
+
+
+def test_rollups_attribute_gas_to_the_paying_address():
+    gas = GasRollups()
+    gas.add(transaction("0.1"))
+    gas.add(transaction("0.2", sender=PAYER.lower(), timestamp="1700086400", category=None))
+    gas.add(transaction("0.4", chain_id="10"))
+    gas.add(transaction("0.8", sender=OTHER))
+    gas.add(transaction("", gas_used=""))
+
+    assert gas.total(PAYER)['gas_fee']['wei'] == str(7 * 10 ** 17)
+    assert gas.total(PAYER)['count'] == 3
+    assert gas.total(chain_id="1")['gas_fee']['wei'] == str(11 * 10 ** 17)
+    assert gas.total()['count'] == 4
+    assert [(d['chain_id'], d['date'], d['count']) for d in gas.daily(PAYER)] == [
+        ("1", "2023-11-14", 1), ("10", "2023-11-14", 1), ("1", "2023-11-15", 1)]
+    assert gas.daily(start_date="2023-11-15") == [
+        {"chain_id": "1", "date": "2023-11-15", "gas_fee": format_wei(2 * 10 ** 17), "gas_used": 21000, "count": 1}]
+    assert set(gas.by_category(PAYER)) == {"Swap", "Uncategorized"}
+    assert gas.by_category(chain_id="10")['Swap']['count'] == 1
+
+
+def test_most_expensive_keeps_the_top_fees_per_address_and_chain():
+    gas = GasRollups(top_n=2)
+    for fee in ("0.3", "0.1", "0.5", "0.2"):
+        gas.add(transaction(fee))
+    gas.add(transaction("0.9", sender=OTHER))
+    for fee in ("0.01", "0.02"):
+        gas.add(transaction(fee, chain_id="10"))
+
+    assert [tx.gas_fee for tx in gas.most_expensive(limit=2)] == ["0.9", "0.5"]
+    assert [tx.gas_fee for tx in gas.most_expensive(PAYER.upper().replace("0X", "0x"), limit=2)] == ["0.5", "0.3"]
+    # Ranked within the chain, not filtered out of the overall top fees
+    assert [tx.gas_fee for tx in gas.most_expensive(chain_id="10", limit=2)] == ["0.02", "0.01"]
+    assert [tx.gas_fee for tx in gas.most_expensive(PAYER, chain_id="10", limit=1)] == ["0.02"]
+    assert gas.most_expensive(OTHER, chain_id="10", limit=2) == []
+    for limit in (0, -1, 3):
+        with pytest.raises(ValueError, match='Limit must be between 1 and 2'):
+            gas.most_expensive(limit=limit)
+
+
+def test_the_analytics_route_rejects_limits_outside_the_ranking(client):
+    assert client.get('/api/blockchain/gas/analytics?limit=50').status_code == 200
+    for limit in ('0', '-5', '51', 'ten'):
+        assert client.get(f'/api/blockchain/gas/analytics?limit={limit}').status_code == 400
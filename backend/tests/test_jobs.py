@@ -0,0 +1,121 @@
+"""Tests for the persistent background job queue"""
+
+import json
+import time
+
+import pytest
+
+from jobs import JobQueue, job_queue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    """A queue without worker threads; tests run jobs with ``run_one``"""
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'job_results'), max_workers=0)
+    queue.register('echo', lambda params, job: {"echo": params})
+    return queue
+
+
+def test_a_job_runs_once_and_its_result_is_kept(queue):
+    job = queue.submit('echo', {"n": 1})
+    assert job['status'] == 'queued'
+    assert queue.run_one()
+    assert not queue.run_one()
+
+    finished = queue.get(job['id'])
+    assert (finished['status'], finished['progress'], finished['has_result']) == ('succeeded', 1, True)
+    with open(queue.result_path(job['id'])) as f:
+        assert json.load(f) == {"echo": {"n": 1}}
+    with pytest.raises(ValueError, match="Unknown job kind: 'missing'"):
+        queue.submit('missing')
+
+
+def test_failures_and_cancellations_are_recorded(queue):
+    def cancelled_midway(params, job):
+        queue.cancel(job.job_id)
+        job.progress(0.5, "Halfway")
+        raise AssertionError("progress raises once the job is cancelled")
+
+    queue.register('broken', lambda params, job: 1 / 0)
+    queue.register('slow', cancelled_midway)
+    failed, running = queue.submit('broken'), queue.submit('slow')
+    queued = queue.submit('echo')
+    assert queue.cancel(queued['id'])['status'] == 'cancelled'
+    while queue.run_one():
+        pass
+
+    assert queue.get(failed['id'])['error'] == 'ZeroDivisionError: division by zero'
+    stopped = queue.get(running['id'])
+    assert (stopped['status'], stopped['message'], stopped['cancel_requested']) == ('cancelled', 'Halfway', True)
+    assert queue.result_path(queued['id']) is None
+
+
+def test_stale_running_jobs_are_requeued_and_expired_ones_purged(queue):
+    queue.stale_seconds = 0
+    job = queue.submit('echo')
+    queue._claim()
+    time.sleep(0.01)
+    assert queue.requeue_stale() == 1
+    assert queue.get(job['id'])['status'] == 'queued'
+
+    queue.run_one()
+    queue.ttl_seconds = -1
+    queue._finish(job['id'], 'succeeded')
+    assert queue.result_path(job['id']) is None
+    assert queue.purge_expired() == 1
+    assert queue.get(job['id']) is None
+
+
+def test_report_jobs_run_against_the_app_data(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'db_path', str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(job_queue, 'result_dir', str(tmp_path / 'job_results'))
+    monkeypatch.setattr(job_queue, 'max_workers', 0)
+    monkeypatch.setattr(job_queue, '_initialized', False)
+
+    assert client.post('/api/jobs', json={"kind": "report", "params": {"currency": "JPY"}}).status_code == 400
+    job = client.post('/api/jobs', json={"kind": "report", "params": {"period": "all"}}).get_json()
+    assert client.get(f"/api/jobs/{job['id']}/result").status_code == 409
+    assert job_queue.run_one()
+
+    result = client.get(f"/api/jobs/{job['id']}/result")
+    assert result.status_code == 200
+    assert json.loads(result.data)['summary'] == client.get('/api/reports?period=all').get_json()['summary']
+    assert client.get('/api/jobs/missing').status_code == 404
+
+
+def test_a_job_cancelled_before_it_starts_never_runs(queue, monkeypatch):
+    calls = []
+    queue.register('tracked', lambda params, job: calls.append(job.job_id))
+    claim = queue._claim
+
+    def claim_then_cancel():
+        row = claim()
+        queue.cancel(row['id'])
+        return row
+
+    monkeypatch.setattr(queue, '_claim', claim_then_cancel)
+    job = queue.submit('tracked')
+    assert queue.run_one()
+    assert calls == []
+    assert queue.get(job['id'])['status'] == 'cancelled'
+
+
+def test_recategorize_jobs_rerun_only_automatic_categories(client, app_env, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'db_path', str(tmp_path / 'jobs.db'))
+    monkeypatch.setattr(job_queue, 'result_dir', str(tmp_path / 'job_results'))
+    monkeypatch.setattr(job_queue, 'max_workers', 0)
+    monkeypatch.setattr(job_queue, '_initialized', False)
+    monkeypatch.setattr(job_queue, '_pid', None)
+    row = {"type": "expense", "amount": 12, "description": "Netflix subscription", "date": "2025-11-20"}
+    auto = client.post('/api/transactions/batch', json={"transactions": [row]}).get_json()['transactions'][0]
+    chosen = client.post('/api/transactions', json={**row, "category": "Food & Dining"}).get_json()
+    assert client.post('/api/categorize/rules', json={"pattern": "netflix", "category": "Shopping"}).status_code == 201
+    assert auto['category'] != 'Shopping'
+
+    job = client.post('/api/jobs', json={"kind": "recategorize"}).get_json()
+    assert job_queue.run_one()
+    result = client.get(f"/api/jobs/{job['id']}/result").get_json()
+    assert result == {"checked": 1, "recategorized": 1}
+    stored = {t['id']: t for t in app_env.load_data()['transactions']}
+    assert stored[auto['id']]['category'] == 'Shopping'
+    assert stored[chosen['id']]['category'] == 'Food & Dining'
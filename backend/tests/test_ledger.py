@@ -0,0 +1,118 @@
+"""Tests for the unified fiat + on-chain ledger"""
+
+import json
+
+import pytest
+
+from blockchain_database import BlockchainDatabase
+from blockchain_models import BlockchainTransaction
+from ledger import iter_stored
+
+WALLET = '0xaaa'
+
+
+@pytest.fixture
+def chain(app_env, monkeypatch):
+    chain_db = BlockchainDatabase()
+    monkeypatch.setattr(app_env, 'blockchain_db', chain_db)
+    for day, sender in (('2025-11-02', WALLET), ('2025-11-09', '0xbbb'), ('2025-11-30', WALLET)):
+        chain_db.add_blockchain_transaction(BlockchainTransaction(
+            transaction_hash=f"0x{day}", from_address=sender, to_address='0xccc', amount=1.5,
+            token_symbol='ETH', chain_id='1', timestamp=f"{day}T12:00:00Z", status='confirmed',
+            category='Transfers'))
+    return chain_db
+
+
+def add_expense(client, date, description='Test'):
+    response = client.post('/api/transactions', json={"type": "expense", "amount": 10, "category": "Shopping",
+                                                      "description": description, "date": date})
+    return response.get_json()['id']
+
+
+def test_json_store_transactions_show_up_in_the_ledger(client, chain):
+    added = add_expense(client, '2025-11-25', 'Shoes')
+    stored = client.get('/api/transactions').get_json()['transactions']
+
+    page = client.get('/api/ledger?limit=500').get_json()
+    fiat = [e for e in page['entries'] if e['source'] == 'fiat']
+    assert page['count'] == len(stored) + 3
+    assert {e['id'] for e in fiat} == {t['id'] for t in stored}
+    assert next(e for e in fiat if e['id'] == added)['description'] == 'Shoes'
+
+
+def test_ledger_is_newest_first_and_pages_without_gaps(client, chain):
+    for day in range(20, 27):
+        add_expense(client, f'2025-11-{day}')
+    expected = client.get('/api/ledger?limit=500').get_json()['entries']
+    dates = [e['date'] for e in expected]
+    assert dates == sorted(dates, reverse=True)
+
+    seen, cursor = [], None
+    while True:
+        page = client.get('/api/ledger', query_string={"limit": 4, **({"cursor": cursor} if cursor else {})})
+        body = page.get_json()
+        seen += body['entries']
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert [(e['source'], e['id']) for e in seen] == [(e['source'], e['id']) for e in expected]
+
+
+def test_address_filter_keeps_only_that_wallets_onchain_transactions(client, chain):
+    add_expense(client, '2025-11-25')
+    entries = client.get(f'/api/ledger?address={WALLET}').get_json()['entries']
+    assert [e['date'] for e in entries] == ['2025-11-30', '2025-11-02']
+    assert all(e['source'] == 'onchain' and e['details']['from_address'] == WALLET for e in entries)
+
+
+def test_archived_transactions_stay_in_the_ledger(client, chain):
+    old = add_expense(client, '2023-06-01', 'Archived')
+    assert client.post('/api/archive', json={"before": "2024-01-01"}).get_json()['archived'] == 1
+
+    page = client.get('/api/ledger?limit=500').get_json()
+    assert page['entries'][-1]['id'] == old
+    assert page['entries'][-1]['description'] == 'Archived'
+
+
+def test_streamed_ledger_matches_the_pages(client, chain):
+    add_expense(client, '2025-11-25')
+    streamed = client.get('/api/ledger?stream=true')
+    assert streamed.mimetype == 'application/x-ndjson'
+    entries = [json.loads(line) for line in streamed.get_data(as_text=True).splitlines()]
+    assert entries == client.get('/api/ledger?limit=500').get_json()['entries']
+
+
+def test_invalid_cursor_is_rejected(client, chain):
+    assert client.get('/api/ledger?cursor=nonsense').status_code == 400
+    assert client.get('/api/ledger?stream=true&cursor=2025-13-45|fiat|x').status_code == 400
+
+
+def test_pages_come_from_the_snapshot_without_parsing_the_data_file(client, app_env, chain, monkeypatch):
+    client.get('/api/ledger?limit=1')
+    kept = add_expense(client, '2025-11-25', 'Kept')
+    changed = add_expense(client, '2025-11-25', 'Changed')
+    client.put(f'/api/transactions/{changed}', json={"date": "2025-11-03"})
+    client.delete(f'/api/transactions/{add_expense(client, "2025-11-26")}')
+    expected = [t['id'] for t in iter_stored(app_env.load_data()['transactions'])]
+
+    def parse_data_file():
+        raise AssertionError("the ledger parsed data.json")
+
+    monkeypatch.setattr(app_env, 'load_data', parse_data_file)
+    seen, cursor = [], None
+    while True:
+        body = client.get('/api/ledger', query_string={"limit": 3, **({"cursor": cursor} if cursor else {})}).get_json()
+        seen += [e['id'] for e in body['entries'] if e['source'] == 'fiat']
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert seen == expected
+    assert kept in seen and app_env.snapshot_store.writes == 1
+
+
+def test_iter_stored_orders_by_date_then_id_after_the_cursor():
+    rows = [{"id": "b", "date": "2025-01-02"}, {"id": "a", "date": "2025-01-03"},
+            {"id": "c", "date": "2025-01-02"}, {"id": "a", "date": "2025-01-01"}]
+    assert [(r['date'], r['id']) for r in iter_stored(rows)] == [
+        ('2025-01-03', 'a'), ('2025-01-02', 'c'), ('2025-01-02', 'b'), ('2025-01-01', 'a')]
+    assert [r['id'] for r in iter_stored(rows, before=('2025-01-02', 'c'))] == ['b', 'a']
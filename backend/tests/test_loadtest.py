@@ -0,0 +1,39 @@
+"""Tests for the load-test harness, run against an in-process server"""
+
+import argparse
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from benchmarks.loadtest import DEFAULT_MIX, LoadTest, parse_mix, percentile
+
+
+@pytest.fixture
+def server(app_env):
+    server = make_server('127.0.0.1', 0, app_env.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join(5)
+
+
+def test_percentiles_and_mixes():
+    assert percentile([], 95) == 0.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 3.0
+    assert percentile([3.0, 1.0, 2.0, 4.0], 99) == 4.0
+    assert parse_mix("import=0,list=5") == {**{op: w for op, w in DEFAULT_MIX.items() if op != 'import'}, "list": 5}
+    with pytest.raises(argparse.ArgumentTypeError, match="unknown operation 'upload'"):
+        parse_mix("upload=1")
+
+
+def test_concurrent_writes_are_all_accounted_for(server):
+    load = LoadTest(server, clients=4, duration=0.5, mix=parse_mix("import=0"), seed=1)
+    elapsed = load.run()
+
+    report = load.report(elapsed)
+    assert report['requests'] > 0 and report['errors'] == 0
+    verified = load.verify()
+    assert verified['rows_tracked'] > 0
+    assert (verified['lost_writes'], verified['lost_updates'], verified['resurrected_deletes']) == (0, 0, 0)
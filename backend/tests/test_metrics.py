@@ -0,0 +1,88 @@
+"""Tests for request metrics, storage timings and the sampling profiler"""
+
+import sys
+
+import pytest
+from flask import Flask, jsonify
+
+import metrics
+from metrics import Histogram, MetricsRegistry, record_rows, timed
+
+
+@pytest.fixture
+def instrumented(tmp_path, monkeypatch):
+    """A bare app with the metrics middleware, a fresh registry and every request profiled"""
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, 'metrics', registry)
+    monkeypatch.setattr(metrics.profiler, 'sample_rate', 1.0)
+    monkeypatch.setattr(metrics.profiler, 'output_dir', str(tmp_path / 'profiles'))
+    app = Flask(__name__)
+    metrics.init_app(app)
+
+    @app.route('/ok')
+    def ok():
+        record_rows(scanned=10, serialized=2)
+        return jsonify({"ok": True})
+
+    @app.route('/boom')
+    def boom():
+        raise RuntimeError('boom')
+
+    return app, registry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [('0.1', 1), ('1.0', 3), ('+Inf', 4)]
+    assert histogram.count == 4
+    assert histogram.total == pytest.approx(6.25)
+
+
+def test_timed_records_storage_latency_even_when_the_call_fails(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, 'metrics', registry)
+
+    @timed('storage.fail')
+    def fail():
+        raise OSError('disk')
+
+    with pytest.raises(OSError):
+        fail()
+    assert registry.storage_latency['storage.fail'].count == 1
+
+
+def test_requests_are_recorded_per_route_with_row_counts(instrumented):
+    app, registry = instrumented
+    client = app.test_client()
+    client.get('/ok')
+    client.get('/ok')
+
+    assert registry.request_count[('/ok', 'GET', 200)] == 2
+    assert registry.request_latency[('/ok', 'GET')].count == 2
+    assert registry.rows_scanned['/ok'] == 20
+    assert registry.rows_serialized['/ok'] == 4
+    rendered = client.get('/api/metrics').get_data(as_text=True)
+    assert 'expense_http_requests_total{route="/ok",method="GET",status="200"} 2' in rendered
+    assert 'expense_rows_scanned_total{route="/ok"} 20' in rendered
+
+
+def test_profiler_is_stopped_when_the_view_raises(instrumented, tmp_path):
+    app, _ = instrumented
+    # Propagated errors skip after_request hooks entirely
+    app.config['PROPAGATE_EXCEPTIONS'] = True
+    with pytest.raises(RuntimeError):
+        app.test_client().get('/boom')
+
+    assert sys.getprofile() is None
+    assert metrics.profiler.captured >= 1
+    assert any(p.name.endswith('.prof') and 'boom' in p.name for p in (tmp_path / 'profiles').iterdir())
+
+
+def test_gauges_are_rendered_at_scrape_time():
+    registry = MetricsRegistry()
+    value = [1]
+    registry.register_gauges(lambda: {"expense_test_gauge": value[0]})
+    value[0] = 7
+    assert 'expense_test_gauge 7' in registry.render()
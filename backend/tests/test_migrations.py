@@ -0,0 +1,66 @@
+"""Tests for upgrading databases through the versioned migrations"""
+
+import sqlite3
+
+import pytest
+
+from database import Database
+from dates import month_key, to_day
+from migrations import DEFAULT_CATEGORIES, LATEST_VERSION, MIGRATIONS, migrate, schema_version
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """A database as the original schema left it: REAL amounts and category names"""
+    path = str(tmp_path / 'expense_tracker.db')
+    conn = sqlite3.connect(path)
+    MIGRATIONS[0][2](conn.cursor())
+    conn.executemany('''
+        INSERT INTO transactions (id, type, amount, category, description, date, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [("a", "expense", 19.99, "Food & Dining", "Lunch", "2024-02-29", "2024-02-29T12:00:00"),
+          ("b", "income", 0.1 + 0.2, "Side Hustle", "Tips", "2024-03-01", "2024-03-01T08:00:00")])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_a_baseline_database_is_upgraded_to_the_latest_schema(baseline_db):
+    db = Database(baseline_db)
+
+    assert [(t['id'], t['amount_cents'], t['category']) for t in
+            sorted(db.get_all_transactions(), key=lambda t: t['id'])] == [("a", 1999, "Food & Dining"),
+                                                                          ("b", 30, "Side Hustle")]
+    conn = sqlite3.connect(baseline_db)
+    assert schema_version(conn) == LATEST_VERSION
+    assert [row[0] for row in conn.execute('SELECT version FROM schema_migrations ORDER BY version')] == [
+        version for version, _, _ in MIGRATIONS]
+    assert conn.execute("SELECT day, month_key FROM transactions WHERE id = 'a'").fetchone() == (
+        to_day('2024-02-29'), month_key(to_day('2024-02-29')))
+    # The name only transactions used became a category of its own
+    assert conn.execute("SELECT type FROM categories WHERE name = 'Side Hustle'").fetchone() == ("income",)
+    assert conn.execute('SELECT COUNT(*) FROM categories').fetchone()[0] == len(DEFAULT_CATEGORIES) + 1
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+
+
+def test_a_current_database_runs_no_migrations(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'expense_tracker.db'))
+    assert migrate(conn) == [version for version, _, _ in MIGRATIONS]
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    assert migrate(conn) == []
+    assert statements == ['PRAGMA user_version']
+
+
+def test_a_failing_migration_leaves_the_database_untouched(baseline_db, monkeypatch):
+    def broken(cursor):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    monkeypatch.setattr('migrations.MIGRATIONS', [*MIGRATIONS[:-1], (LATEST_VERSION, "broken", broken)])
+    conn = sqlite3.connect(baseline_db)
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn)
+
+    assert schema_version(conn) == 0
+    assert conn.execute('SELECT amount FROM transactions ORDER BY id').fetchall() == [(19.99,), (0.1 + 0.2,)]
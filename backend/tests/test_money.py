@@ -0,0 +1,47 @@
+"""Tests for exact integer-cent amounts"""
+
+import json
+
+import pytest
+
+from dates import to_day
+from money import from_cents, savings_rate, to_cents
+
+
+def test_amounts_convert_through_their_decimal_text():
+    assert to_cents(0.1 + 0.2) == 30
+    assert to_cents("19.99") == 1999
+    assert to_cents(1.005) == 101
+    assert to_cents(7) == 700
+    assert from_cents(1999) == 19.99
+
+
+@pytest.mark.parametrize('value', [True, "abc", "NaN", "Infinity", None])
+def test_non_numeric_amounts_are_rejected(value):
+    with pytest.raises(ValueError):
+        to_cents(value)
+
+
+def test_savings_rate_uses_the_exact_totals():
+    assert savings_rate(0, 500) == 0
+    assert savings_rate(30000, 10001) == 66.7
+    assert savings_rate(1000, 1500) == -50.0
+
+
+def test_the_api_stores_cents_and_sums_them_exactly(client, app_env):
+    for amount in (0.1, 0.2, "19.99"):
+        client.post('/api/transactions', json={"type": "expense", "amount": amount, "category": "Shopping",
+                                               "description": "Cents", "date": "2019-05-01"})
+    client.post('/api/transactions', json={"type": "income", "amount": 100, "category": "Salary",
+                                           "description": "Pay", "date": "2019-05-01"})
+
+    with open(app_env.DATA_FILE) as f:
+        stored = json.load(f)['transactions']
+    assert sorted(t['amount_cents'] for t in stored if t['day'] == to_day('2019-05-01')) == [10, 20, 1999, 10000]
+    assert all('amount' not in t for t in stored)
+
+    summary = client.get('/api/transactions?start_date=2019-05-01&end_date=2019-05-01').get_json()['summary']
+    assert summary['total_expenses'] == 20.29
+    assert summary['balance'] == 79.71
+    assert client.post('/api/transactions', json={"type": "expense", "amount": -1, "category": "Shopping",
+                                                  "description": "Refund", "date": "2019-05-01"}).status_code == 400
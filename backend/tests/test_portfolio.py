@@ -0,0 +1,76 @@
+"""Tests for token amounts, the cached price table and portfolio valuation"""
+
+import json
+
+import pytest
+
+from portfolio import PortfolioBook, PriceTable, format_units, parse_units
+
+WALLET = "0xAAA0000000000000000000000000000000000001"
+OTHER = "0xbbb0000000000000000000000000000000000002"
+USDC = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+
+
+def test_token_amounts_round_trip_through_base_units():
+    assert parse_units("1.5", 18) == 1500000000000000000
+    assert parse_units("", 6) == 0
+    assert format_units(parse_units("0.000001", 6), 6) == "0.000001"
+    for amount in ("1,5", "Infinity", "-inf", "NaN", "sNaN"):
+        with pytest.raises(ValueError, match='Invalid token amount'):
+            parse_units(amount, 18)
+
+
+def test_address_prices_win_over_symbols(tmp_path):
+    path = tmp_path / 'prices.json'
+    path.write_text(json.dumps({"prices": {"usdc": 1.0, f"1:{USDC}": 0.99}}))
+    prices = PriceTable(str(path))
+
+    assert prices.get("USDC", "1", USDC) == 0.99
+    assert prices.get("USDC", "137", USDC) == 1.0
+    assert prices.get("DAI") is None
+
+
+def test_prices_are_reloaded_only_after_the_ttl():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"ETH": 2000 + len(calls)}
+
+    prices = PriceTable(loader=loader, ttl_seconds=3600)
+    assert prices.get("eth") == 2001
+    assert prices.get("ETH") == 2001
+    assert prices.refresh(force=True) == {"ETH": 2002.0}
+    assert len(calls) == 2
+
+
+def test_valuation_totals_by_wallet_chain_and_token():
+    book = PortfolioBook(capacity=1)
+    book.upsert(WALLET, "1", "0xeth", "ETH", parse_units("2", 18), 18)
+    book.upsert(WALLET, "1", USDC, "USDC", parse_units("100", 6), 6)
+    book.upsert(OTHER, "137", "0xmatic", "MATIC", parse_units("50", 18), 18)
+    # Replaces the first balance instead of adding a row
+    book.upsert(WALLET.lower(), "1", "0xETH", "eth", parse_units("3", 18), 18)
+    prices = PriceTable(loader=lambda: {"ETH": 2000.0, "USDC": 1.0})
+
+    valuation = book.value(prices)
+    assert len(book) == 3
+    assert valuation['total_value_usd'] == 6100.0
+    assert valuation['by_wallet'] == {WALLET.lower(): 6100.0, OTHER: 0.0}
+    assert valuation['by_chain'] == {"1": 6100.0, "137": 0.0}
+    assert valuation['by_token']["1:ETH"]['amount'] == 3.0
+    assert valuation['by_token']["137:MATIC"]['price_usd'] is None
+    assert valuation['unpriced_tokens'] == ["MATIC"]
+
+
+def test_valuation_filters_by_wallet_and_chain():
+    book = PortfolioBook()
+    book.upsert(WALLET, "1", "0xeth", "ETH", parse_units("1", 18), 18)
+    book.upsert(OTHER, "1", "0xeth", "ETH", parse_units("4", 18), 18)
+    book.upsert(OTHER, "10", "0xeth", "ETH", parse_units("8", 18), 18)
+    prices = PriceTable(loader=lambda: {"ETH": 10.0})
+
+    assert book.value(prices, wallets=[OTHER.upper().replace("0X", "0x")])['total_value_usd'] == 120.0
+    assert book.value(prices, chain_id="1")['total_value_usd'] == 50.0
+    unknown = book.value(prices, wallets=["0xnobody"])
+    assert (unknown['total_value_usd'], unknown['balance_count'], unknown['by_wallet']) == (0.0, 0, {})
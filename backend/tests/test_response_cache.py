@@ -0,0 +1,85 @@
+"""Tests for the LRU + TTL response cache and the cached_response decorator"""
+
+import time
+
+from response_cache import ResponseCache
+
+
+def test_lru_evicts_least_recently_used_to_fit_max_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.set('a', b'xxxx')
+    cache.set('b', b'xxxx')
+    assert cache.get('a') == (b'xxxx', 200)
+    cache.set('c', b'xxxx')
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size_bytes'] == 8
+
+
+def test_bodies_larger_than_the_cache_are_not_stored():
+    cache = ResponseCache(max_bytes=4)
+    cache.set('a', b'12345')
+    assert cache.get('a') is None
+    assert cache.stats()['size_bytes'] == 0
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = ResponseCache(default_ttl=30)
+    cache.set('default', b'x')
+    cache.set('short', b'y', ttl=5)
+
+    now[0] += 10
+    assert cache.get('short') is None
+    assert cache.get('default') == (b'x', 200)
+    now[0] += 30
+    assert cache.get('default') is None
+    assert cache.stats()['expirations'] == 2
+    assert cache.stats()['size_bytes'] == 0
+
+
+def test_invalidate_drops_tagged_entries_and_bumps_versions():
+    cache = ResponseCache()
+    cache.set('txns', b'1', tags=('transactions',))
+    cache.set('cats', b'2', tags=('categories',))
+    cache.invalidate('transactions')
+
+    assert cache.get('txns') is None
+    assert cache.get('cats') == (b'2', 200)
+    assert cache.version('transactions') == 1
+    assert cache.version('categories') == 0
+
+
+def test_responses_are_cached_per_tenant(client):
+    assert client.get('/api/categories').headers['X-Cache'] == 'MISS'
+    assert client.get('/api/categories').headers['X-Cache'] == 'HIT'
+    other = client.get('/api/categories', headers={'X-Tenant-ID': 'other'})
+    assert other.headers['X-Cache'] == 'MISS'
+    assert client.get('/api/categories', headers={'X-Tenant-ID': 'other'}).headers['X-Cache'] == 'HIT'
+
+
+def test_responses_are_cached_per_query(client):
+    client.get('/api/transactions')
+    assert client.get('/api/transactions').headers['X-Cache'] == 'HIT'
+    narrowed = client.get('/api/transactions?fields=id,amount')
+    assert narrowed.headers['X-Cache'] == 'MISS'
+    assert set(narrowed.get_json()['transactions'][0]) == {'id', 'amount'}
+
+
+def test_writes_invalidate_cached_responses(client):
+    before = client.get('/api/transactions').get_json()['summary']['transaction_count']
+    client.post('/api/transactions', json={"type": "expense", "amount": 3, "category": "Shopping",
+                                           "description": "Socks", "date": "2025-11-21"})
+
+    response = client.get('/api/transactions')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.get_json()['summary']['transaction_count'] == before + 1
+
+
+def test_error_responses_are_not_cached(client):
+    assert client.get('/api/transactions?currency=XXX').status_code == 400
+    assert client.get('/api/transactions?currency=XXX').headers['X-Cache'] == 'MISS'
@@ -0,0 +1,43 @@
+"""Tests for the /api/timeseries rollups and how writes carry them forward"""
+
+NOVEMBER = {"granularity": "month", "start_date": "2025-11-01", "end_date": "2025-11-30"}
+
+
+def expense(amount, description='Test'):
+    return {"type": "expense", "amount": amount, "category": "Shopping", "description": description,
+            "date": "2025-11-21"}
+
+
+def november_expense(client):
+    return client.get('/api/timeseries', query_string=NOVEMBER).get_json()['totals']['expense']
+
+
+def test_writes_are_carried_into_the_rollups(client):
+    client.post('/api/transactions', json=expense(10))
+    spent = november_expense(client)
+    added = client.post('/api/transactions', json=expense(25)).get_json()['id']
+    assert november_expense(client) == spent + 25
+
+    client.put(f'/api/transactions/{added}', json={"amount": 40})
+    assert november_expense(client) == spent + 40
+    client.delete(f'/api/transactions/{added}')
+    assert november_expense(client) == spent
+
+
+def test_a_write_landing_just_before_the_read_is_not_lost(client, app_env, monkeypatch):
+    client.post('/api/transactions', json=expense(10))
+    spent = november_expense(client)
+    read_data_file = app_env.read_data_file
+
+    def racing_read():
+        # Another worker saves between the request starting and the data being read
+        monkeypatch.setattr(app_env, 'read_data_file', read_data_file)
+        data = app_env.load_data()
+        data['transactions'].insert(0, app_env.new_transaction_from_body(expense(7, 'Elsewhere')))
+        app_env.save_data(data)
+        return read_data_file()
+
+    monkeypatch.setattr(app_env, 'read_data_file', racing_read)
+    client.post('/api/transactions', json=expense(25))
+
+    assert november_expense(client) == spent + 7 + 25
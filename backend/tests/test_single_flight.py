@@ -0,0 +1,115 @@
+"""Tests for coalescing identical in-flight computations"""
+
+import fcntl
+import threading
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def started_leader(flight, key, release, **kwargs):
+    """Run a leader in a thread that blocks until ``release`` is set"""
+    running = threading.Event()
+    results = []
+
+    def compute():
+        running.set()
+        release.wait(5)
+        return b'{"total": 1}', 200
+
+    thread = threading.Thread(target=lambda: results.append(flight.do(key, compute, **kwargs)))
+    thread.start()
+    assert running.wait(5)
+    return thread, results
+
+
+def follow(flight, key, fn, **kwargs):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(flight.do(key, fn, **kwargs)))
+    thread.start()
+    return thread, results
+
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("timed out")
+
+
+def test_concurrent_callers_share_the_leaders_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader, leader_results = started_leader(flight, 'report', release)
+    followers = [follow(flight, 'report', lambda: pytest.fail("followers must not compute")) for _ in range(3)]
+    wait_for(lambda: flight.followers == 3)
+    release.set()
+    for thread, _ in [(leader, None), *followers]:
+        thread.join(5)
+
+    assert leader_results == [(b'{"total": 1}', 200)]
+    assert [results for _, results in followers] == [leader_results] * 3
+    assert flight.stats() == {"leaders": 1, "followers": 3, "shared_hits": 0, "in_flight": 0}
+
+
+def test_followers_get_the_leaders_error_and_the_next_call_recomputes():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError('boom')
+
+    def call():
+        try:
+            flight.do('report', failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: flight.followers == 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert flight.do('report', lambda: (b'ok', 200)) == (b'ok', 200)
+
+
+def test_a_worker_waiting_on_the_shared_lock_reuses_the_result(tmp_path, monkeypatch):
+    # Two instances over one directory stand in for two gunicorn workers
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    locking = []
+    real_flock = fcntl.flock
+
+    def flock(f, operation):
+        if operation == fcntl.LOCK_EX:
+            locking.append(f)
+        real_flock(f, operation)
+
+    monkeypatch.setattr(fcntl, 'flock', flock)
+    release = threading.Event()
+    leader, leader_results = started_leader(first, 'report', release, shared_key='/api/reports', fingerprint=(1, 2))
+    waiter, waiter_results = follow(second, 'report', lambda: pytest.fail("the result is shared"),
+                                    shared_key='/api/reports', fingerprint=(1, 2))
+    wait_for(lambda: len(locking) == 2)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert waiter_results == leader_results == [(b'{"total": 1}', 200)]
+    assert second.shared_hits == 1
+
+
+def test_shared_results_from_before_the_call_or_for_other_data_are_recomputed(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    flight.do('report', lambda: (b'old', 200), shared_key='/api/reports', fingerprint=(1, 2))
+
+    assert flight.do('report', lambda: (b'new', 200), shared_key='/api/reports', fingerprint=(1, 2)) == (b'new', 200)
+    assert flight.do('report', lambda: (b'other', 200), shared_key='/api/reports', fingerprint=(3, 4)) == (b'other', 200)
+    assert flight.shared_hits == 0
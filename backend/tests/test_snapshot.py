@@ -0,0 +1,138 @@
+"""Tests for the columnar snapshot and the write journal laid over it"""
+
+import os
+
+import pytest
+
+from dates import to_day
+from response_cache import response_cache
+from snapshot import Snapshot, SnapshotStore, write_snapshot
+
+
+def expense(amount, date='2025-11-21', category='Shopping'):
+    return {"type": "expense", "amount": amount, "category": category, "description": f"Spent {amount}",
+            "date": date}
+
+
+def report(client):
+    response_cache.clear()
+    return client.get('/api/reports?period=all').get_json()
+
+
+def report_from_rows(client, app_env, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(app_env, 'current_snapshot', lambda *args: None)
+        return report(client)
+
+
+def test_writes_are_laid_over_the_snapshot_without_rewriting_it(client, app_env, monkeypatch):
+    first = client.post('/api/transactions', json=expense(111)).get_json()['id']
+    report(client)
+    store = app_env.snapshot_store
+    assert store.writes == 1
+
+    added = client.post('/api/transactions', json=expense(4321, category='Travel')).get_json()['id']
+    client.put(f'/api/transactions/{first}', json={"amount": 222})
+    client.put(f'/api/transactions/{added}', json={"amount": 5432})
+    client.post('/api/budgets', json={"amount": 500})
+    client.delete(f'/api/transactions/{first}')
+    overlaid = report(client)
+
+    assert store.writes == 1
+    assert store.overlays >= 1
+    assert overlaid == report_from_rows(client, app_env, monkeypatch)
+    assert overlaid['top_expenses'][0]['id'] == added
+    assert overlaid['top_expenses'][0]['amount'] == 5432
+
+
+def test_a_write_missing_from_the_journal_rewrites_the_snapshot(client, app_env, monkeypatch):
+    client.post('/api/transactions', json=expense(10))
+    report(client)
+    data = app_env.load_data()
+    data['transactions'].insert(0, app_env.new_transaction_from_body(expense(77)))
+    # Saved without a delta, like an import or migration
+    app_env.save_data(data)
+
+    assert report(client) == report_from_rows(client, app_env, monkeypatch)
+    assert app_env.snapshot_store.writes == 2
+
+
+def test_a_large_delta_is_compacted_in_the_background(client, app_env, monkeypatch):
+    store = SnapshotStore(app_env.snapshot_store.path, max_delta_rows=2)
+    monkeypatch.setattr(app_env, 'snapshot_store', store)
+    client.post('/api/transactions', json=expense(10))
+    report(client)
+    for amount in (1, 2, 3):
+        client.post('/api/transactions', json=expense(amount))
+    report(client)
+    store._compaction.join(timeout=10)
+
+    assert store.writes == 2
+    assert os.path.getsize(store.journal_path) == 0
+    assert report(client) == report_from_rows(client, app_env, monkeypatch)
+    assert store.stats()['delta_rows'] == 0
+
+
+def test_archiving_rewrites_the_snapshot(client, app_env):
+    client.post('/api/transactions', json=expense(10, date='2023-05-01'))
+    report(client)
+    client.post('/api/archive', json={"before": "2024-01-01"})
+    snapshot = Snapshot(app_env.snapshot_store.path)
+    assert snapshot.fingerprint == app_env.data_fingerprint()
+    assert snapshot.count == len(app_env.load_data()['transactions'])
+
+
+def test_too_many_currencies_for_the_column_is_a_clear_error(tmp_path):
+    rows = [{"id": str(i), "type": "expense", "amount_cents": 1, "category": "Food", "day": 739000,
+             "currency": f"C{i:03d}"} for i in range(257)]
+    with pytest.raises(ValueError, match='at most 256 distinct values of currency'):
+        write_snapshot(str(tmp_path / 'data.snapshot'), rows, (1, 1))
+    write_snapshot(str(tmp_path / 'data.snapshot'), rows[:256], (1, 1))
+    assert Snapshot(str(tmp_path / 'data.snapshot')).count == 256
+
+
+def test_reports_fall_back_to_rows_when_the_snapshot_cannot_hold_the_data(client, app_env, monkeypatch):
+    client.post('/api/transactions', json=expense(10))
+    expected = report(client)
+
+    def overflow(*args):
+        raise ValueError('A snapshot holds at most 65536 distinct values of category')
+
+    monkeypatch.setattr(app_env.snapshot_store, 'get', overflow)
+    assert report(client) == expected
+
+
+def test_overlaid_rows_are_converted_like_snapshot_rows(client, app_env, monkeypatch, eur_rates):
+    client.post('/api/transactions', json={**expense(100), "currency": "EUR"})
+    report(client)
+    client.post('/api/transactions', json={**expense(333), "currency": "EUR"})
+    client.post('/api/transactions', json=expense(50, date='2024-06-01'))
+
+    overlaid = report(client)
+    assert app_env.snapshot_store.writes == 1
+    assert overlaid == report_from_rows(client, app_env, monkeypatch)
+
+
+def test_partials_sum_in_exact_cents_past_float_precision(tmp_path):
+    big = 2 ** 53 + 1
+    rows = [{"id": str(i), "type": "expense", "amount_cents": big, "category": "Food", "day": 739000 + i}
+            for i in range(3)]
+    write_snapshot(str(tmp_path / 'data.snapshot'), rows, (1, 1))
+
+    partial = Snapshot(str(tmp_path / 'data.snapshot')).partial(0, 'USD')
+    assert partial['expense'] == 3 * big
+    assert partial['categories']['Food'] == [0, 3 * big, 3]
+    assert [totals[1] for totals in partial['months'].values()] == [3 * big]
+
+
+def test_the_date_index_pages_newest_first_after_a_cursor(tmp_path):
+    rows = [{"id": row_id, "type": "expense", "amount_cents": 1, "category": "Food", "day": day,
+             "date": f"day-{day}"} for row_id, day in (("b", 739001), ("a", 739002), ("c", 739001), ("a", 739000))]
+    write_snapshot(str(tmp_path / 'data.snapshot'), rows, (1, 1))
+    snapshot = Snapshot(str(tmp_path / 'data.snapshot'))
+
+    assert [(t['day'], t['id']) for t in snapshot.iter_by_date()] == [
+        (739002, 'a'), (739001, 'c'), (739001, 'b'), (739000, 'a')]
+    cursor = ('2024-04-25', 'c')
+    assert to_day(cursor[0]) == 739001
+    assert [t['id'] for t in snapshot.iter_by_date(cursor)] == ['b', 'a']
@@ -0,0 +1,73 @@
+"""Tests for delta sync: row versions, paging and tombstones"""
+
+import sync as sync_module
+from sync import changes_page, init_sync, tombstone
+
+
+def expense(amount=10, description='Synced'):
+    return {"type": "expense", "amount": amount, "category": "Shopping", "description": description,
+            "date": "2025-10-01"}
+
+
+def full_sync(client, limit):
+    """Page through a sync from scratch, returning the rows and the version to resume from"""
+    since, pages, rows = 0, 0, []
+    while True:
+        page = client.get(f'/api/sync?since={since}&limit={limit}').get_json()
+        rows.extend(page['transactions'] + page['categories'])
+        pages += 1
+        since = page['next_since']
+        if not page['has_more']:
+            return rows, since, pages
+
+
+def test_paging_from_scratch_returns_every_row_once(client, app_env):
+    data = app_env.load_data()
+    rows, version, pages = full_sync(client, limit=7)
+
+    assert sorted(r['id'] for r in rows) == sorted(r['id'] for r in data['transactions'] + data['categories'])
+    assert pages > 1
+    assert version == client.get('/api/sync?since=0&limit=1').get_json()['version']
+
+
+def test_incremental_sync_returns_writes_and_deletes_since_the_cursor(client):
+    _, version, _ = full_sync(client, limit=1000)
+    added = client.post('/api/transactions', json=expense()).get_json()['id']
+    removed = client.post('/api/transactions', json=expense(description='Gone')).get_json()['id']
+    client.delete(f'/api/transactions/{removed}')
+
+    delta = client.get(f'/api/sync?since={version}').get_json()
+    assert [t['id'] for t in delta['transactions']] == [added]
+    assert [(t['resource'], t['id']) for t in delta['deleted']] == [('transaction', removed)]
+    assert delta['categories'] == []
+    assert client.get(f"/api/sync?since={delta['next_since']}").get_json()['transactions'] == []
+
+
+def test_clients_ahead_of_the_store_or_behind_an_import_are_reset(client):
+    _, version, _ = full_sync(client, limit=1000)
+    assert client.get(f'/api/sync?since={version + 1}').get_json()['reset']
+
+    client.post('/api/import', json=client.get('/api/export').get_json())
+    delta = client.get(f'/api/sync?since={version}').get_json()
+    assert delta['reset'] and delta['next_since'] == 0
+    assert not client.get('/api/sync?since=0&limit=1').get_json()['reset']
+
+
+def test_pages_are_never_cut_between_rows_of_the_same_version():
+    changed = [('transaction', {"id": str(i), "version": version}) for i, version in enumerate([1, 2, 2, 2, 3])]
+    page = changes_page(0, 3, 0, changed, [], limit=2)
+    assert [t['version'] for t in page['transactions']] == [1, 2, 2, 2]
+    assert (page['next_since'], page['has_more']) == (2, True)
+
+
+def test_purged_tombstones_reset_clients_that_missed_them(monkeypatch):
+    monkeypatch.setattr(sync_module, 'MAX_TOMBSTONES', 2)
+    data = {"transactions": [{"id": "a"}], "categories": []}
+    init_sync(data)
+    first = tombstone(data, 'transaction', 'x')
+    for row_id in ('y', 'z'):
+        tombstone(data, 'transaction', row_id)
+
+    assert [t['id'] for t in data['sync']['tombstones']] == ['y', 'z']
+    assert changes_page(first - 1, data['sync']['version'], data['sync']['purged_through'], [], [], 10)['reset']
+    assert not changes_page(first, data['sync']['version'], data['sync']['purged_through'], [], [], 10)['reset']